@@ -0,0 +1,10 @@
+"""
+Benchmark suite for the VitroScience pipeline (synthetic KAME data).
+
+Modules:
+- synthetic: deterministic ventas / CxC / CxP / stock generators (10k → 10M lines).
+- stages: the timed pipeline stages and dashboard queries.
+- run: CLI runner, pytest-benchmark style stats + JSON results and comparison.
+
+Run: python -m benchmarks.run --size 10k 100k
+"""
@@ -0,0 +1,226 @@
+# === benchmarks/run.py ===
+"""
+Benchmark runner: time every pipeline stage on synthetic data and store
+pytest-benchmark style JSON so runs can be compared.
+
+Usage (from the repo root):
+    python -m benchmarks.run --size 10k 100k
+    python -m benchmarks.run --size 1m --stages ventas.clean ventas.save_to_sqlite --rounds 3
+    python -m benchmarks.run --size 100k --compare benchmarks/results/baseline.json
+
+- Inputs are generated once per size into VS_BENCH_DIR/<size> (default
+  data/bench) and reused while the (rows, seed) manifest matches
+- Each round runs the stage's untimed setup, then times the stage call
+  (gc collected before, stdout silenced unless --verbose)
+- Results: benchmarks/results/<timestamp>.json (or --output); benchmark
+  names carry the size like pytest params, e.g. "ventas.clean[100k]"
+- --compare prints mean-time changes against a previous results file
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import gc
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.stages import STAGES, Context  # noqa: E402
+from benchmarks.synthetic import SIZES, prepare  # noqa: E402
+
+BENCH_DIR = Path(os.getenv("VS_BENCH_DIR", ROOT_DIR / "data" / "bench")).resolve()
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+DEFAULT_ROUNDS = 5
+
+
+def compute_stats(timings):
+    """pytest-benchmark style statistics (seconds) for one stage."""
+    timings = sorted(timings)
+    n = len(timings)
+    mean = statistics.fmean(timings)
+    q1, _, q3 = statistics.quantiles(timings, n=4) if n > 1 else (timings[0],) * 3
+    return {
+        "min": timings[0],
+        "max": timings[-1],
+        "mean": mean,
+        "stddev": statistics.stdev(timings) if n > 1 else 0.0,
+        "median": statistics.median(timings),
+        "q1": q1,
+        "q3": q3,
+        "iqr": q3 - q1,
+        "rounds": n,
+        "total": sum(timings),
+        "ops": 1 / mean if mean else None,
+        "data": timings,
+    }
+
+
+def time_stage(prepare_stage, ctx, rounds, warmup, verbose):
+    """Run setup + timed call `warmup + rounds` times; return the timed rounds."""
+    timings = []
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        for i in range(warmup + rounds):
+            fn = prepare_stage(ctx)
+            gc.collect()
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            if i >= warmup:
+                timings.append(elapsed)
+    return timings
+
+
+def select_stages(patterns):
+    """Stage names matching any of the glob patterns (all when none given)."""
+    if not patterns:
+        return list(STAGES)
+    selected = [name for name in STAGES if any(fnmatch.fnmatch(name, p) for p in patterns)]
+    if not selected:
+        raise SystemExit(f"❌ No stage matches {patterns}. Available: {', '.join(STAGES)}")
+    return selected
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info():
+    return {
+        "node": platform.node(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "system": f"{platform.system()} {platform.release()}",
+        "python_version": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+def commit_info():
+    return {
+        "id": _git("rev-parse", "HEAD"),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def run_size(label, stage_names, rounds, warmup, seed, regenerate, verbose):
+    """Benchmark `stage_names` on one synthetic size; returns the result entries."""
+    rows = SIZES[label]
+    workdir = BENCH_DIR / label
+    workdir.mkdir(parents=True, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        ctx = Context(prepare(label, rows, seed, force=regenerate))
+        results = []
+        for name in stage_names:
+            group, prepare_stage = STAGES[name]
+            print(f"⏱️ {name}[{label}] ...", end=" ", flush=True)
+            try:
+                timings = time_stage(prepare_stage, ctx, rounds, warmup, verbose)
+            except Exception as e:
+                print(f"❌ failed: {e}")
+                continue
+            stats = compute_stats(timings)
+            print(f"mean {stats['mean']:.3f}s ± {stats['stddev']:.3f}s ({rows / stats['mean']:,.0f} rows/s)")
+            results.append(
+                {
+                    "group": group,
+                    "name": f"{name}[{label}]",
+                    "fullname": f"benchmarks/stages.py::{name}[{label}]",
+                    "params": {"size": label, "rows": rows, "seed": seed},
+                    "stats": stats,
+                    "extra_info": {"rows_per_s": rows / stats["mean"]},
+                }
+            )
+        return results
+    finally:
+        os.chdir(cwd)
+
+
+def compare(results, baseline_path, threshold=0.10):
+    """Print mean-time changes vs a previous results file (slower beyond `threshold` flagged)."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    before = {b["name"]: b["stats"]["mean"] for b in baseline["benchmarks"]}
+    print(f"\n📊 Compared with {baseline_path} ({baseline.get('commit_info', {}).get('id')})")
+    print(f"{'benchmark':<44} {'before':>10} {'now':>10} {'change':>9}")
+    for b in results:
+        old, new = before.get(b["name"]), b["stats"]["mean"]
+        if old is None:
+            print(f"{b['name']:<44} {'—':>10} {new:>9.3f}s {'new':>9}")
+            continue
+        change = (new - old) / old
+        flag = "⚠️" if change > threshold else ("🚀" if change < -threshold else "")
+        print(f"{b['name']:<44} {old:>9.3f}s {new:>9.3f}s {change:>+8.1%} {flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the VitroScience pipeline on synthetic data.")
+    parser.add_argument("--size", nargs="+", default=["10k"], choices=list(SIZES))
+    parser.add_argument("--stages", nargs="+", help="stage names or globs, e.g. 'ventas.*' (default: all)")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed rounds before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the synthetic inputs")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--list", action="store_true", help="list the stages and exit")
+    parser.add_argument("--verbose", action="store_true", help="keep the stages' own output")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (group, _) in STAGES.items():
+            print(f"{group:<10} {name}")
+        return None
+
+    stage_names = select_stages(args.stages)
+    started = datetime.now()
+    benchmarks = []
+    for label in args.size:
+        benchmarks += run_size(
+            label, stage_names, args.rounds, args.warmup, args.seed, args.regenerate, args.verbose
+        )
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started:%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "machine_info": machine_info(),
+        "commit_info": commit_info(),
+        "datetime": started.isoformat(timespec="seconds"),
+        "params": {"sizes": args.size, "rounds": args.rounds, "warmup": args.warmup, "seed": args.seed},
+        "benchmarks": benchmarks,
+    }
+    output.write_text(json.dumps(report, indent=2))
+    print(f"💾 Results saved → {output}")
+
+    if args.compare:
+        compare(benchmarks, args.compare)
+    return output
+
+
+if __name__ == "__main__":
+    main()
+# === END benchmarks/run.py ===
@@ -0,0 +1,330 @@
+# === benchmarks/stages.py ===
+"""
+Benchmarked pipeline stages.
+
+STAGES maps a stage name to (group, prepare). `prepare(ctx)` does the
+untimed setup for one round (fresh copies of the input, a clean database,
+...) and returns the zero-argument callable that is timed.
+
+Groups:
+- ventas: cleaning (in memory and chunked), both enrichers, save_to_sqlite
+- cxc: cleaning, update_status_db reconciliation, snapshot save + history
+- cxp / stock: cleaning and loading into SQLite
+- dashboard: the dashboard's own loaders (clients_view, the sales/CxC
+  tabs, db_utils) on a cache miss: DB_PATH is pointed at the benchmark
+  database and the st.cache_data caches are cleared before every round
+
+Everything runs inside the benchmark work directory, so the modules' own
+relative paths (data/vitroscience.db, data/lake, test/...) point at the
+synthetic copies, never at the real ones.
+"""
+
+import importlib
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from data_zone import read_table
+from db import connect
+
+# The pipeline modules write to this relative path (not VS_DB_PATH)
+BENCH_DB = Path("data/vitroscience.db")
+CXC_CLEAN = Path("data/lake/clean/cuentas_por_cobrar/latest.parquet")
+CXC_PREVIOUS_CLEAN = Path("data/lake/clean/cuentas_por_cobrar/previous.parquet")
+
+# Dashboard modules that import DB_PATH by name; pointed at BENCH_DB
+DASHBOARD_MODULES = (
+    "dashboard.utils.db_utils",
+    "dashboard.clients_view",
+    "dashboard.tabs.statistics.sales_wheeler_analysis",
+    "dashboard.tabs.statistics.cta_por_cobrar_wheeler_analysis",
+)
+DASHBOARD_PERIOD = ("2024-01-01", "2024-12-31")
+
+
+class Context:
+    """Synthetic inputs (the prepare() manifest) plus lazily built intermediates."""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.rows = manifest["rows"]
+        self._cache = {}
+        self.db_ready = False
+
+    def cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def ventas_raw(self):
+        return self.cached("ventas_raw", lambda: read_table(self.manifest["ventas"]))
+
+    def ventas_clean(self):
+        from pipeline import run_clean_sales_pipeline
+
+        return self.cached(
+            "ventas_clean",
+            lambda: run_clean_sales_pipeline(df=self.ventas_raw().copy(), save_output=False),
+        )
+
+    def ventas_located(self):
+        from pipeline import add_location_info
+
+        return self.cached(
+            "ventas_located",
+            lambda: add_location_info(
+                self.ventas_clean().copy(), mapping_path=self.manifest["location_mapping"]
+            ),
+        )
+
+    def ventas_enriched(self):
+        return self.cached("ventas_enriched", lambda: _add_product(self, self.ventas_located().copy()))
+
+    def cxc_clean(self, which="cxc"):
+        from cobrar.clean_cta_por_cobrar import clean_cta_por_cobrar
+
+        output = CXC_CLEAN if which == "cxc" else CXC_PREVIOUS_CLEAN
+        return self.cached(
+            f"{which}_clean",
+            lambda: clean_cta_por_cobrar(input_path=self.manifest[which], output_path=str(output)),
+        )
+
+
+def _add_product(ctx, df):
+    from pipeline import add_product_info
+
+    return add_product_info(
+        df,
+        product_path=ctx.manifest["product_mapping"],
+        unmatched_output="data/unmatched_skus.csv",
+    )
+
+
+def _reset_db(ctx):
+    """Delete the benchmark database (and its WAL files)."""
+    ctx.db_ready = False
+    for suffix in ("", "-wal", "-shm"):
+        path = Path(f"{BENCH_DB}{suffix}")
+        if path.exists():
+            path.unlink()
+
+
+def _ensure_db(ctx):
+    """Database with the enriched ventas and both CxC snapshots, built once."""
+    if ctx.db_ready:
+        return
+    from cobrar.cta_por_cobrar_save_db import save_cta_por_cobrar_to_db
+    from pipeline import save_to_sqlite
+
+    _reset_db(ctx)
+    save_to_sqlite(df=ctx.ventas_enriched())
+    ctx.cxc_clean("cxc_previous")
+    save_cta_por_cobrar_to_db(input_path=str(CXC_PREVIOUS_CLEAN))
+    ctx.cxc_clean("cxc")
+    save_cta_por_cobrar_to_db(input_path=str(CXC_CLEAN))
+    ctx.db_ready = True
+
+
+def _drop_table(table):
+    conn = connect(BENCH_DB)
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {table};")
+    conn.close()
+
+
+# === ventas ===
+def _ventas_clean(ctx):
+    from pipeline import run_clean_sales_pipeline
+
+    df = ctx.ventas_raw().copy()
+    return lambda: run_clean_sales_pipeline(df=df, save_output=False)
+
+
+def _ventas_clean_chunked(ctx):
+    from pipeline import run_clean_sales_pipeline
+    from pipeline.clean_sales_main import CLEAN_CHUNK_ROWS
+
+    source = ctx.manifest["ventas"]
+    return lambda: run_clean_sales_pipeline(source_path=source, chunksize=CLEAN_CHUNK_ROWS)
+
+
+def _ventas_location(ctx):
+    from pipeline import add_location_info
+
+    df = ctx.ventas_clean().copy()
+    mapping = ctx.manifest["location_mapping"]
+    return lambda: add_location_info(df, mapping_path=mapping)
+
+
+def _ventas_product(ctx):
+    df = ctx.ventas_located().copy()
+    return lambda: _add_product(ctx, df)
+
+
+def _ventas_save(ctx):
+    from pipeline import save_to_sqlite
+
+    df = ctx.ventas_enriched()
+    _reset_db(ctx)
+    return lambda: save_to_sqlite(df=df)
+
+
+# === cxc ===
+def _cxc_clean(ctx):
+    from cobrar.clean_cta_por_cobrar import clean_cta_por_cobrar
+
+    source = ctx.manifest["cxc"]
+    return lambda: clean_cta_por_cobrar(input_path=source, output_path=str(CXC_CLEAN))
+
+
+def _cxc_update_status(ctx):
+    """Reconcile the current snapshot against a status table holding the previous one."""
+    import cta_por_cobrar_baseline as baseline
+
+    previous, current = ctx.cxc_clean("cxc_previous"), ctx.cxc_clean("cxc")
+    _drop_table("cuentas_por_cobrar_status")
+    baseline.update_status_db(previous)
+    return lambda: baseline.update_status_db(current)
+
+
+def _cxc_save(ctx):
+    """Swap in the current snapshot + history events on top of the previous run."""
+    from cobrar.cta_por_cobrar_save_db import save_cta_por_cobrar_to_db
+
+    ctx.cxc_clean("cxc_previous")
+    ctx.cxc_clean("cxc")
+    _reset_db(ctx)
+    save_cta_por_cobrar_to_db(input_path=str(CXC_PREVIOUS_CLEAN))
+    return lambda: save_cta_por_cobrar_to_db(input_path=str(CXC_CLEAN))
+
+
+# === cxp / stock ===
+def _cxp_clean(ctx):
+    from pagar.clean_pagar import clean_pagar
+
+    source = ctx.manifest["cxp"]
+    return lambda: clean_pagar(input_path=source)
+
+
+def _cxp_load(ctx):
+    from pagar import create_cta_pagar_db
+
+    if not os.path.exists(create_cta_pagar_db.CSV_PATH):
+        _cxp_clean(ctx)()
+    _drop_table(create_cta_pagar_db.TABLE_NAME)
+    return create_cta_pagar_db.create_cta_por_pagar_table
+
+
+def _stock_clean(ctx):
+    # Module-level paths (test/stock/...) resolve inside the work directory
+    from inventory.clean_inventory import clean_inventory
+
+    return clean_inventory
+
+
+def _stock_load(ctx):
+    from inventory import create_inventory_db
+
+    if not os.path.exists(create_inventory_db.CSV_PATH):
+        _stock_clean(ctx)()
+    _drop_table(create_inventory_db.TABLE_NAME)
+    return create_inventory_db.create_inventory_table
+
+
+# === dashboard ===
+def _use_bench_db():
+    """Point the dashboard data layer at BENCH_DB and empty its caches."""
+    bench_db = BENCH_DB.resolve()
+    for name in DASHBOARD_MODULES:
+        importlib.import_module(name).DB_PATH = bench_db
+    from dashboard.utils import db_utils
+
+    db_utils._read_sql_cached.clear()
+    db_utils._load_cuentas_por_cobrar_cached.clear()
+
+
+def _dashboard(prepare_call):
+    def prepare(ctx):
+        _ensure_db(ctx)
+        _use_bench_db()
+        return prepare_call(ctx)
+
+    return prepare
+
+
+def _sales_monthly_rollup(ctx):
+    from dashboard.tabs.statistics.sales_wheeler_analysis import get_monthly_sales
+
+    return get_monthly_sales
+
+
+def _sales_period_sum(ctx):
+    from dashboard.tabs.sales_analysis_tab import _query_sum
+
+    start, end = (pd.Timestamp(day) for day in DASHBOARD_PERIOD)
+    return lambda: _query_sum(start, end, "Total")
+
+
+def _client_list(ctx):
+    from dashboard.clients_view import get_client_list
+
+    return get_client_list
+
+
+def _sales_summary(ctx):
+    from dashboard.clients_view import get_sales_summary
+
+    return lambda: get_sales_summary(*DASHBOARD_PERIOD)
+
+
+def _recent_purchases(ctx):
+    from dashboard.clients_view import get_recent_purchases
+
+    ruts = [ctx.manifest["sample_rut"]]
+    return lambda: get_recent_purchases(ruts)
+
+
+def _cxc_pending(ctx):
+    from dashboard.clients_view import get_cta_por_cobrar
+
+    return get_cta_por_cobrar
+
+
+def _cxc_table(ctx):
+    from dashboard.utils.db_utils import load_cuentas_por_cobrar
+
+    return load_cuentas_por_cobrar
+
+
+def _cxc_monthly_history(ctx):
+    from dashboard.tabs.statistics.cta_por_cobrar_wheeler_analysis import (
+        get_monthly_cta_por_cobrar,
+    )
+
+    return get_monthly_cta_por_cobrar
+
+
+STAGES = {
+    "ventas.clean": ("ventas", _ventas_clean),
+    "ventas.clean_chunked": ("ventas", _ventas_clean_chunked),
+    "ventas.location": ("ventas", _ventas_location),
+    "ventas.product": ("ventas", _ventas_product),
+    "ventas.save_to_sqlite": ("ventas", _ventas_save),
+    "cxc.clean": ("cxc", _cxc_clean),
+    "cxc.update_status_db": ("cxc", _cxc_update_status),
+    "cxc.save_db": ("cxc", _cxc_save),
+    "cxp.clean": ("cxp", _cxp_clean),
+    "cxp.load": ("cxp", _cxp_load),
+    "stock.clean": ("stock", _stock_clean),
+    "stock.load": ("stock", _stock_load),
+    "dashboard.sales_monthly_rollup": ("dashboard", _dashboard(_sales_monthly_rollup)),
+    "dashboard.sales_period_sum": ("dashboard", _dashboard(_sales_period_sum)),
+    "dashboard.client_list": ("dashboard", _dashboard(_client_list)),
+    "dashboard.sales_summary": ("dashboard", _dashboard(_sales_summary)),
+    "dashboard.recent_purchases": ("dashboard", _dashboard(_recent_purchases)),
+    "dashboard.cxc_pending": ("dashboard", _dashboard(_cxc_pending)),
+    "dashboard.cxc_table": ("dashboard", _dashboard(_cxc_table)),
+    "dashboard.cxc_monthly_history": ("dashboard", _dashboard(_cxc_monthly_history)),
+}
+# === END benchmarks/stages.py ===
@@ -0,0 +1,395 @@
+# === benchmarks/synthetic.py ===
+"""
+Synthetic KAME datasets for the benchmarks (no API access needed).
+
+Generates records shaped like the real API output, with realistic
+distributions (repeated clients/SKUs, multi-line documents, accents in
+names, a few unmatched comunas/SKUs and empty SKUs):
+- ventas: Informe de Ventas lines, streamed in batches into the raw zone
+  with the fixed raw schema (so 10M lines never sit in memory)
+- cxc: Cuentas por Cobrar, a previous and a current snapshot (some
+  invoices paid, some balances changed, some new)
+- cxp: Cuentas por Pagar (CSV, like test/pagar/raw)
+- stock: inventory stock per SKU (CSV, like test/stock/raw)
+- the comunas and product mapping CSVs used by the enrichers
+
+Everything is deterministic for a given (rows, seed). Paths are relative:
+prepare() is meant to run inside the benchmark work directory.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_zone import ZoneWriter, write_zone
+from get_ventas import RAW_VENTAS_FIELDS, RAW_VENTAS_SCHEMA
+from pipeline.text_normalize import strip_accents
+
+SIZES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+BATCH_ROWS = 250_000
+
+START_DATE = pd.Timestamp("2023-01-01")
+DAYS = 3 * 365
+
+VENTAS_DATASET = "ventas_bench"
+CXC_DATASET = "cuentas_por_cobrar_bench"
+LOCATION_MAPPING = Path("data/comunas_provincia_servicio_region(003).csv")
+PRODUCT_MAPPING = Path("data/lista_articulos_clean.csv")
+CXP_RAW = Path("test/pagar/raw/cuentas_por_pagar_full.csv")
+STOCK_RAW = Path("test/stock/raw/inventario_stock_sample.csv")
+MANIFEST = Path("synthetic.json")
+
+# (Comuna, Ciudad, Region, ServicioSalud)
+COMUNAS = [
+    ("Santiago", "Santiago", "Metropolitana", "SS Metropolitano Central"),
+    ("Providencia", "Santiago", "Metropolitana", "SS Metropolitano Oriente"),
+    ("Ñuñoa", "Santiago", "Metropolitana", "SS Metropolitano Oriente"),
+    ("Las Condes", "Santiago", "Metropolitana", "SS Metropolitano Oriente"),
+    ("Maipú", "Santiago", "Metropolitana", "SS Metropolitano Central"),
+    ("Puente Alto", "Santiago", "Metropolitana", "SS Metropolitano Sur Oriente"),
+    ("Melipilla", "Santiago", "Metropolitana", "SS Metropolitano Occidente"),
+    ("Valparaíso", "Valparaíso", "Valparaíso", "SS Valparaíso San Antonio"),
+    ("Viña del Mar", "Viña del Mar", "Valparaíso", "SS Viña del Mar Quillota"),
+    ("Quillota", "Quillota", "Valparaíso", "SS Viña del Mar Quillota"),
+    ("Rancagua", "Rancagua", "O'Higgins", "SS O'Higgins"),
+    ("Talca", "Talca", "Maule", "SS Maule"),
+    ("Chillán", "Chillán", "Ñuble", "SS Ñuble"),
+    ("Concepción", "Concepción", "Biobío", "SS Concepción"),
+    ("Los Ángeles", "Los Ángeles", "Biobío", "SS Biobío"),
+    ("Temuco", "Temuco", "Araucanía", "SS Araucanía Sur"),
+    ("Valdivia", "Valdivia", "Los Ríos", "SS Valdivia"),
+    ("Osorno", "Osorno", "Los Lagos", "SS Osorno"),
+    ("Puerto Montt", "Puerto Montt", "Los Lagos", "SS Reloncaví"),
+    ("Coyhaique", "Coyhaique", "Aysén", "SS Aysén"),
+    ("Punta Arenas", "Punta Arenas", "Magallanes", "SS Magallanes"),
+    ("La Serena", "La Serena", "Coquimbo", "SS Coquimbo"),
+    ("Vicuña", "Vicuña", "Coquimbo", "SS Coquimbo"),
+    ("Copiapó", "Copiapó", "Atacama", "SS Atacama"),
+    ("Antofagasta", "Antofagasta", "Antofagasta", "SS Antofagasta"),
+    ("Calama", "Calama", "Antofagasta", "SS Antofagasta"),
+    ("Iquique", "Iquique", "Tarapacá", "SS Iquique"),
+    ("Arica", "Arica", "Arica y Parinacota", "SS Arica"),
+]
+UNKNOWN_COMUNAS = ["Isla de Pascua", "Juan Fernández"]  # not in the mapping
+
+DOCUMENTOS = [
+    ("Factura Electrónica", 0.80),
+    ("Nota de Crédito Electrónica", 0.08),
+    ("Guía de Despacho Electrónica", 0.07),
+    ("Factura Exenta Electrónica", 0.05),
+]
+VENDEDORES = [
+    "Felipe Riquelme",
+    "María José Núñez",
+    "Andrés Muñoz",
+    "Camila Peña",
+    "Sebastián Ibáñez",
+    "Oficina",
+]
+CLIENT_KINDS = ["Hospital", "Clínica", "Laboratorio", "Centro Médico", "Servicio de Salud"]
+FAMILIAS = ["Diagnóstico Rápido", "Microbiología", "Hematología", "Inmunología", "Insumos", "Equipos"]
+UNEGOCIOS = ["Compra Externa", "Distribución", "Servicio Técnico"]
+UNIDADES = ["Kit", "Unidad", "Caja", "Test"]
+CONDICIONES = ["Crédito 30 días", "Crédito 60 días", "Contado", "Crédito 90 días"]
+
+
+def rut(i):
+    """Deterministic RUT-like identifier for client/supplier `i`."""
+    base = 60_000_000 + i * 7919
+    return f"{base // 1_000_000}.{base // 1000 % 1000:03d}.{base % 1000:03d}-{i % 10}"
+
+
+def _pool(values):
+    return np.array(values, dtype=object)
+
+
+def _clients(n_clients):
+    """Client master: Rut, RznSocial, Comuna index (a few outside the mapping), vendedor."""
+    idx = np.arange(n_clients)
+    names = [
+        f"{CLIENT_KINDS[i % len(CLIENT_KINDS)]} {COMUNAS[i % len(COMUNAS)][0]} {i}"
+        for i in idx
+    ]
+    comunas = [c for c, *_ in COMUNAS] + UNKNOWN_COMUNAS
+    comuna_idx = np.where(idx % 50 == 49, len(COMUNAS) + idx % 2, idx % len(COMUNAS))
+    return {
+        "Rut": _pool([rut(i) for i in idx]),
+        "RznSocial": _pool(names),
+        "Comuna": _pool(comunas)[comuna_idx],
+        "Ciudad": _pool([c for _, c, *_ in COMUNAS] + UNKNOWN_COMUNAS)[comuna_idx],
+        "NombreVendedor": _pool(VENDEDORES)[idx % len(VENDEDORES)],
+    }
+
+
+def _products(n_skus):
+    idx = np.arange(n_skus)
+    return {
+        "SKU": _pool([f"VS-{i:05d}" for i in idx]),
+        "Descripcion": _pool([f"Test {FAMILIAS[i % len(FAMILIAS)]} N° {i} (20 pcs x kit)" for i in idx]),
+        "Familia": _pool(FAMILIAS)[idx % len(FAMILIAS)],
+        "NombreUNegocio": _pool(UNEGOCIOS)[idx % len(UNEGOCIOS)],
+        "UnidadMedida": _pool(UNIDADES)[idx % len(UNIDADES)],
+        "Precio": np.round(np.exp(np.random.default_rng(n_skus).normal(10.5, 0.8, n_skus)), -1),
+    }
+
+
+def _sizes(rows):
+    """Master-data sizes that grow with the line count."""
+    return max(100, rows // 200), max(200, rows // 1000)
+
+
+def iter_ventas_batches(rows, seed=0, batch_rows=BATCH_ROWS):
+    """
+    Yield raw ventas DataFrames (RAW_VENTAS_FIELDS order) totalling `rows`
+    lines. Documents have 1-8 lines, dates increase over 2023-2025.
+    """
+    rng = np.random.default_rng(seed)
+    n_clients, n_skus = _sizes(rows)
+    clients = _clients(n_clients)
+    products = _products(n_skus)
+    doc_names = _pool([name for name, _ in DOCUMENTOS])
+    doc_weights = [w for _, w in DOCUMENTOS]
+
+    done, folio = 0, 1000
+    while done < rows:
+        b = min(batch_rows, rows - done)
+
+        # Documents: geometric line counts, cut to fill the batch exactly
+        lengths = np.minimum(rng.geometric(0.35, size=b), 8)
+        lengths = lengths[: np.searchsorted(np.cumsum(lengths), b) + 1]
+        lengths[-1] -= lengths.sum() - b
+        n_docs = len(lengths)
+        doc = np.repeat(np.arange(n_docs), lengths)
+
+        doc_type = rng.choice(len(doc_names), size=n_docs, p=doc_weights)
+        client = rng.integers(0, n_clients, size=n_docs)
+        day = (done + np.cumsum(lengths) - lengths) * DAYS // rows
+        fecha = np.asarray(
+            (START_DATE + pd.to_timedelta(day, unit="D")).strftime("%Y-%m-%dT00:00:00"),
+            dtype=object,
+        )
+
+        sku = rng.integers(0, n_skus, size=b)
+        sku_code = products["SKU"][sku].copy()
+        roll = rng.random(b)
+        sku_code[roll < 0.02] = ""  # lines without SKU (services, freight)
+        unmatched = (roll >= 0.02) & (roll < 0.04)
+        sku_code[unmatched] = np.char.add("XX-", sku[unmatched].astype(str)).astype(object)
+
+        sign = np.where(doc_names[doc_type[doc]] == "Nota de Crédito Electrónica", -1.0, 1.0)
+        cantidad = rng.integers(1, 21, size=b) * sign
+        precio = products["Precio"][sku] * rng.uniform(0.9, 1.1, size=b).round(2)
+        precio = precio.round(0) * sign
+        porc_desc = np.where(rng.random(b) < 0.1, rng.choice([5.0, 10.0, 15.0], size=b), 0.0)
+        descuento = (np.abs(cantidad * precio) * porc_desc / 100).round(0)
+        total = cantidad * precio - descuento * sign
+        costo_unit = (np.abs(precio) * rng.uniform(0.55, 0.9, size=b)).round(0)
+        costo_total = costo_unit * np.abs(cantidad)
+        margen = total - costo_total * sign
+        with np.errstate(divide="ignore", invalid="ignore"):
+            porc_margen = np.where(total != 0, margen / total * 100, 0.0)
+            sobre_costo = np.where(costo_total != 0, margen / costo_total * 100, 0.0)
+
+        oc = rng.integers(1_000_000, 9_999_999, size=n_docs).astype(str)
+        has_oc = rng.random(n_docs) < 0.6
+        comentario = np.where(has_oc, np.char.add("Orden de Compra ", oc), "").astype(object)
+        c = client[doc]
+        empty = np.full(b, "", dtype=object)
+        null = np.full(b, None, dtype=object)
+
+        batch = {
+            "Rut": clients["Rut"][c],
+            "RznSocial": clients["RznSocial"][c],
+            "Fecha": fecha[doc],
+            "NombreDocumento": doc_names[doc_type][doc],
+            "Folio": (folio + doc).astype(float),
+            "NombreSucursal": empty,
+            "Direccion": np.char.add("Av. Principal N°", (c % 2000).astype(str)).astype(object),
+            "Comuna": clients["Comuna"][c],
+            "Ciudad": clients["Ciudad"][c],
+            "NombreVendedor": clients["NombreVendedor"][c],
+            "EsInventariable": np.where(sku_code == "", "N", "S").astype(object),
+            "Descripcion": products["Descripcion"][sku],
+            "NombreUNegocio": products["NombreUNegocio"][sku],
+            "FamiliaNombre": products["Familia"][sku],
+            "SKU": sku_code,
+            "UnidadMedida": products["UnidadMedida"][sku],
+            "FactorUnidadEquivalente": np.zeros(b),
+            "Cantidad": cantidad,
+            "FechaVencimientoLote": null,
+            "Comentario": comentario[doc],
+            "PrecioUnitario": precio,
+            "Descuento": descuento,
+            "PorcDescuento": porc_desc,
+            "Total": total,
+            "CostoVentaUnitario": costo_unit,
+            "CostoVentaTotal": costo_total,
+            "MargenContrib": margen,
+            "PorcMargenContrib": porc_margen,
+            "MargenVentasSobreCosto": sobre_costo,
+            "NombreRef1": np.where(has_oc, "Orden de Compra  ", "").astype(object)[doc],
+            "FechaRef1": np.where(has_oc, fecha, None)[doc],
+            "FolioRef1": np.where(has_oc, oc, "").astype(object)[doc],
+            "FechaRef2": null,
+            "FechaRef3": null,
+        }
+        yield pd.DataFrame({name: batch.get(name, empty) for name in RAW_VENTAS_FIELDS})
+        done += b
+        folio += n_docs
+
+
+def write_ventas(rows, partition, seed=0):
+    """Stream `rows` synthetic lines into raw/ventas_bench/<partition>. Returns the path."""
+    with ZoneWriter("raw", VENTAS_DATASET, partition, RAW_VENTAS_SCHEMA) as writer:
+        for batch in iter_ventas_batches(rows, seed):
+            writer.write(batch)
+    return writer.path
+
+
+def write_mappings(rows):
+    """Comunas → Region/ServicioSalud and SKU → Familia lookup CSVs."""
+    LOCATION_MAPPING.parent.mkdir(parents=True, exist_ok=True)
+    comunas = pd.DataFrame(COMUNAS, columns=["Comuna", "Ciudad", "Region", "ServicioSalud"])
+    # Keys without accents, like the real mapping (the cleaner strips them from ventas)
+    comunas["Comuna"] = strip_accents(comunas["Comuna"])
+    comunas.to_csv(LOCATION_MAPPING, index=False)
+    products = _products(_sizes(rows)[1])
+    pd.DataFrame(
+        {k: products[k] for k in ["SKU", "Descripcion", "Familia", "UnidadMedida"]}
+    ).to_csv(PRODUCT_MAPPING, index=False)
+
+
+def make_cxc(rows, seed=0):
+    """One CxC snapshot: `rows` pending invoices (API field names, amounts as numbers)."""
+    rng = np.random.default_rng(seed)
+    n_clients, _ = _sizes(rows)
+    clients = _clients(n_clients)
+    c = rng.integers(0, n_clients, size=rows)
+    fecha = START_DATE + pd.to_timedelta(np.sort(rng.integers(0, DAYS, size=rows)), unit="D")
+    total = np.round(np.exp(rng.normal(13, 1, rows)), -1)
+    saldo = np.where(rng.random(rows) < 0.8, total, (total * rng.uniform(0.1, 0.9, rows)).round(-1))
+    return pd.DataFrame(
+        {
+            "Rut": clients["Rut"][c],
+            "RznSocial": clients["RznSocial"][c],
+            "NombreVendedor": clients["NombreVendedor"][c],
+            "Documento": _pool(["Factura Electrónica", "Factura Exenta Electrónica"])[
+                (rng.random(rows) < 0.05).astype(int)
+            ],
+            "FolioDocumento": (np.arange(rows) + 1000).astype(float),
+            "Fecha": fecha.strftime("%Y-%m-%dT00:00:00"),
+            "FechaVencimiento": (fecha + pd.Timedelta(days=30)).strftime("%Y-%m-%dT00:00:00"),
+            "CondicionVenta": _pool(CONDICIONES)[rng.integers(0, len(CONDICIONES), rows)],
+            "Total": total,
+            "TotalCP": total,
+            "Saldo": saldo,
+            "NombreCuenta": "Clientes Nacionales",
+            "MonthFetched": fecha.strftime("%Y-%m"),
+            "SnapshotDate": "2025-12-30",
+        }
+    )
+
+
+def evolve_cxc(previous, seed=1):
+    """
+    Next snapshot of `previous`: ~3% of invoices paid (gone), ~5% with a new
+    Saldo and ~2% new invoices.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(previous)
+    current = previous[rng.random(n) >= 0.03].copy()
+    changed = rng.random(len(current)) < 0.05
+    current.loc[changed, "Saldo"] = (current.loc[changed, "Saldo"] * 0.5).round(-1)
+    new = make_cxc(max(1, n // 50), seed + 100)
+    new["FolioDocumento"] += previous["FolioDocumento"].max() + 1
+    current = pd.concat([current, new], ignore_index=True)
+    current["SnapshotDate"] = "2025-12-31"
+    return current
+
+
+def make_cxp(rows, seed=0):
+    """Cuentas por Pagar (suppliers), amounts as text like the raw CSV."""
+    rng = np.random.default_rng(seed)
+    n_suppliers = max(20, rows // 500)
+    s = rng.integers(0, n_suppliers, size=rows)
+    fecha = START_DATE + pd.to_timedelta(rng.integers(0, DAYS, size=rows), unit="D")
+    total = np.round(np.exp(rng.normal(13.5, 1.2, rows)), 0).astype(int)
+    return pd.DataFrame(
+        {
+            "Rut": _pool([rut(10_000 + i) for i in range(n_suppliers)])[s],
+            "RznSocial": _pool([f"Proveedor Diagnóstica {i} Ltda." for i in range(n_suppliers)])[s],
+            "MultiDirNombre": "",
+            "Documento": "Factura de Compra Electrónica",
+            "FolioDocumento": (np.arange(rows) + 1).astype(float),
+            "Fecha": fecha.strftime("%Y-%m-%d"),
+            "FechaVencimiento": (fecha + pd.Timedelta(days=60)).strftime("%Y-%m-%d"),
+            "Total": total.astype(str),
+            "TotalCP": total.astype(str),
+            "Saldo": (total * (rng.random(rows) < 0.4)).astype(str),
+        }
+    )
+
+
+def make_stock(rows, seed=0):
+    """Inventory stock, one row per SKU (SKU is the table key)."""
+    rng = np.random.default_rng(seed)
+    idx = np.arange(rows)
+    costo = np.round(np.exp(rng.normal(10, 0.8, rows)), 2)
+    return pd.DataFrame(
+        {
+            "SKU": _pool([f"VS-{i:07d}" for i in idx]),
+            "descripcion": _pool([f"Artículo {FAMILIAS[i % len(FAMILIAS)]} {i}" for i in idx]),
+            "descripcionDetallada": "",
+            "bodega": _pool(["Bodega Central", "Bodega Tránsito"])[idx % 2],
+            "unidad": _pool(UNIDADES)[idx % len(UNIDADES)],
+            "saldo": rng.integers(0, 500, size=rows).astype(float),
+            "costoPromedio": costo,
+            "precioVentaNeto": np.round(costo * rng.uniform(1.2, 1.8, rows), 0),
+        }
+    )
+
+
+def prepare(label, rows, seed=0, force=False):
+    """
+    Write every synthetic input for one size into the current directory
+    (skipped if the manifest says it's already there). Returns the manifest.
+    """
+    key = {"label": label, "rows": rows, "seed": seed}
+    if MANIFEST.exists() and not force:
+        manifest = json.loads(MANIFEST.read_text())
+        if {k: manifest.get(k) for k in key} == key:
+            return manifest
+
+    print(f"🧪 Generating synthetic datasets ({label}: {rows:,} rows, seed {seed}) ...")
+    write_mappings(rows)
+    ventas = write_ventas(rows, label, seed)
+    previous = make_cxc(rows, seed)
+    cxc_prev = write_zone(previous, "raw", CXC_DATASET, f"{label}_previous")
+    cxc = write_zone(evolve_cxc(previous, seed + 1), "raw", CXC_DATASET, label)
+    del previous
+    CXP_RAW.parent.mkdir(parents=True, exist_ok=True)
+    make_cxp(rows, seed).to_csv(CXP_RAW, index=False)
+    STOCK_RAW.parent.mkdir(parents=True, exist_ok=True)
+    make_stock(rows, seed).to_csv(STOCK_RAW, index=False)
+
+    manifest = {
+        **key,
+        "ventas": str(ventas),
+        "cxc_previous": str(cxc_prev),
+        "cxc": str(cxc),
+        "cxp": str(CXP_RAW),
+        "stock": str(STOCK_RAW),
+        "location_mapping": str(LOCATION_MAPPING),
+        "product_mapping": str(PRODUCT_MAPPING),
+        "sample_rut": rut(0),
+    }
+    MANIFEST.write_text(json.dumps(manifest, indent=2))
+    return manifest
+# === END benchmarks/synthetic.py ===
@@ -2,12 +2,14 @@
 import os
 
 import pandas as pd
-from unidecode import unidecode
+
+from data_zone import read_table, write_table
+from pipeline.text_normalize import strip_accents
 
 
 def clean_cta_por_cobrar(
-    input_path="test/cobranza/raw/cuentas_por_cobrar_monthly_from_Jan_023.csv",
-    output_path="test/cobranza/clean/cuentas_por_cobrar_clean.csv",
+    input_path="data/lake/raw/cuentas_por_cobrar/from_2023-01-01.parquet",
+    output_path="data/lake/clean/cuentas_por_cobrar/latest.parquet",
 ):
     """
     Clean and standardize 'Cuentas por Cobrar' dataset fetched from KAME API.
@@ -18,14 +20,14 @@ def clean_cta_por_cobrar(
     - Converts numeric columns to integers
     - Parses and standardizes date columns
     - Removes trailing ".0" from FolioDocumento
-    - Saves UTF-8 with BOM for Excel & DB compatibility
+    - Saves by extension: Parquet (data zone) or UTF-8 CSV with BOM for Excel
     """
 
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"❌ Input file not found: {input_path}")
 
     print(f"🧹 Cleaning file: {input_path}")
-    df = pd.read_csv(input_path, dtype=str)
+    df = read_table(input_path, dtype=str)
 
     # === Drop unnecessary column ===
     drop_cols = ["NombreCuenta"]
@@ -44,7 +46,7 @@ def clean_cta_por_cobrar(
     text_cols = ["RznSocial", "NombreVendedor", "Documento", "CondicionVenta"]
     for col in text_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).fillna("").apply(unidecode).str.strip()
+            df[col] = strip_accents(df[col].astype(str).fillna("")).str.strip()
 
     # === Convert numeric columns to integers ===
     num_cols = ["Total", "TotalCP", "Saldo"]
@@ -67,8 +69,7 @@ def clean_cta_por_cobrar(
             df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%Y-%m-%d")
 
     # === Save cleaned file ===
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    write_table(df, output_path)
 
     print(f"✅ Cleaned data saved successfully: {output_path}")
     print(f"🧾 Rows: {len(df):,}")
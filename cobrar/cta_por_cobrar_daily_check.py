@@ -5,6 +5,8 @@ from datetime import datetime, date
 import streamlit as st
 from pathlib import Path
 
+from db import connect
+
 DB_PATH = Path(__file__).parent.parent / "data" / "vitroscience.db"
 LOG_PATH = Path(__file__).parent.parent / "data" / "update_log.txt"
 
@@ -15,10 +17,14 @@ def check_cta_cobrar_update():
         st.error(f"❌ Database not found at {DB_PATH}")
         return False
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH, read_only=True)
     cur = conn.cursor()
-    cur.execute("SELECT MAX(snapshot_date) FROM cuentas_por_cobrar_history;")
-    last_update = cur.fetchone()[0]
+    try:
+        # One row per update run (see cobrar/cta_por_cobrar_history.py)
+        cur.execute("SELECT MAX(snapshot_date) FROM cuentas_por_cobrar_runs;")
+        last_update = cur.fetchone()[0]
+    except sqlite3.OperationalError:
+        last_update = None
     conn.close()
 
     if not last_update:
@@ -0,0 +1,311 @@
+# === cobrar/cta_por_cobrar_history.py ===
+"""
+CxC history as change events (SCD-style) instead of appended snapshots.
+
+Tables:
+- cuentas_por_cobrar_events: one row per change of an invoice (Rut, FolioDocumento)
+    - first_seen     invoice appears for the first time
+    - saldo_changed  Saldo differs from its last recorded value
+    - paid           invoice no longer pending (last known values kept)
+    - reopened       a paid invoice shows up as pending again
+- cuentas_por_cobrar_runs: one row per update run (pending count + open
+  balance + event counts), written by record_events
+
+Views:
+- cuentas_por_cobrar_history: legacy-compatible rows (status / last_updated /
+  snapshot_date / paid_date), so existing `WHERE status='paid'` readers work
+- cuentas_por_cobrar_monthly: open balance + invoice count as of the last
+  run of each month, read from the runs table (no event scan)
+
+Any other snapshot: snapshot_as_of(conn, "YYYY-MM-DD HH:MM:SS").
+A legacy cuentas_por_cobrar_history *table* is replayed into events once.
+"""
+
+import pandas as pd
+
+EVENTS_TABLE = "cuentas_por_cobrar_events"
+RUNS_TABLE = "cuentas_por_cobrar_runs"
+HISTORY_VIEW = "cuentas_por_cobrar_history"
+MONTHLY_VIEW = "cuentas_por_cobrar_monthly"
+
+KEY = ["Rut", "FolioDocumento"]
+ATTRS = [
+    "RznSocial",
+    "NombreVendedor",
+    "Documento",
+    "Fecha",
+    "FechaVencimiento",
+    "CondicionVenta",
+    "Total",
+    "TotalCP",
+    "Saldo",
+    "MonthFetched",
+    "SnapshotDate",
+]
+AMOUNTS = ["Total", "TotalCP", "Saldo"]
+EVENT_TYPES = ["first_seen", "saldo_changed", "paid", "reopened"]
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {EVENTS_TABLE} (
+    event_id INTEGER PRIMARY KEY,
+    Rut TEXT NOT NULL,
+    FolioDocumento TEXT NOT NULL,
+    event TEXT NOT NULL CHECK (event IN ('first_seen', 'saldo_changed', 'paid', 'reopened')),
+    event_at TEXT NOT NULL,
+    event_date TEXT NOT NULL,
+    RznSocial TEXT,
+    NombreVendedor TEXT,
+    Documento TEXT,
+    Fecha TEXT,
+    FechaVencimiento TEXT,
+    CondicionVenta TEXT,
+    Total INTEGER,
+    TotalCP INTEGER,
+    Saldo INTEGER,
+    MonthFetched TEXT,
+    SnapshotDate TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cxc_events_key ON {EVENTS_TABLE}(Rut, FolioDocumento, event_at);
+CREATE INDEX IF NOT EXISTS idx_cxc_events_at ON {EVENTS_TABLE}(event_at);
+
+CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+    run_at TEXT PRIMARY KEY,
+    snapshot_date TEXT NOT NULL,
+    pending INTEGER NOT NULL,
+    saldo_pendiente INTEGER,
+    first_seen INTEGER NOT NULL DEFAULT 0,
+    saldo_changed INTEGER NOT NULL DEFAULT 0,
+    paid INTEGER NOT NULL DEFAULT 0,
+    reopened INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+VIEWS = f"""
+CREATE VIEW IF NOT EXISTS {HISTORY_VIEW} AS
+SELECT
+    Rut, RznSocial, NombreVendedor, Documento, FolioDocumento,
+    Fecha, FechaVencimiento, CondicionVenta, Total, TotalCP, Saldo,
+    MonthFetched, SnapshotDate,
+    CASE WHEN event = 'paid' THEN 'paid' ELSE 'pending' END AS status,
+    event_at AS last_updated,
+    event_date AS snapshot_date,
+    event_at AS inserted_at,
+    CASE WHEN event = 'paid' THEN event_at END AS paid_date,
+    event
+FROM {EVENTS_TABLE};
+
+DROP VIEW IF EXISTS {MONTHLY_VIEW};
+CREATE VIEW {MONTHLY_VIEW} AS
+SELECT Mes, TotalPendiente, FacturasPendientes
+FROM (
+    SELECT
+        substr(snapshot_date, 1, 7) AS Mes,
+        COALESCE(saldo_pendiente, 0) AS TotalPendiente,
+        pending AS FacturasPendientes,
+        ROW_NUMBER() OVER (
+            PARTITION BY substr(snapshot_date, 1, 7) ORDER BY run_at DESC
+        ) AS rn
+    FROM {RUNS_TABLE}
+)
+WHERE rn = 1
+ORDER BY Mes;
+"""
+
+LATEST_SQL = f"""
+SELECT * FROM (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY Rut, FolioDocumento ORDER BY event_at DESC, event_id DESC
+    ) AS rn
+    FROM {EVENTS_TABLE}
+    WHERE event_at <= ?
+)
+WHERE rn = 1;
+"""
+
+
+def _object_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?;", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _normalize(df):
+    """Keyed, de-duplicated frame with every ATTR column and integer amounts."""
+    df = df.copy()
+    for col in KEY + ATTRS:
+        if col not in df.columns:
+            df[col] = None
+    for col in KEY:
+        df[col] = df[col].astype(str).str.strip()
+    for col in AMOUNTS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+    return df[KEY + ATTRS].drop_duplicates(subset=KEY, keep="last")
+
+
+def diff_events(latest, current):
+    """
+    Vectorized comparison of the last recorded state with the current
+    pending set. `latest` has KEY + ATTRS + event (one row per invoice);
+    `current` is the pending set. Returns KEY + ATTRS + event rows.
+    """
+    current = _normalize(current)
+    if latest is None or latest.empty:
+        return current.assign(event="first_seen")
+
+    prev = latest[KEY + ["event", "Saldo"]].rename(
+        columns={"event": "prev_event", "Saldo": "prev_saldo"}
+    )
+    merged = current.merge(prev, on=KEY, how="left")
+    was_open = merged["prev_event"].notna() & (merged["prev_event"] != "paid")
+
+    merged["event"] = None
+    merged.loc[merged["prev_event"].isna(), "event"] = "first_seen"
+    merged.loc[merged["prev_event"] == "paid", "event"] = "reopened"
+    merged.loc[was_open & (merged["Saldo"] != merged["prev_saldo"]), "event"] = "saldo_changed"
+    changed = merged[merged["event"].notna()][KEY + ATTRS + ["event"]]
+
+    open_prev = latest[latest["event"] != "paid"]
+    gone = open_prev.merge(current[KEY], on=KEY, how="left", indicator=True)
+    paid = gone[gone["_merge"] == "left_only"][KEY + ATTRS].assign(event="paid")
+
+    return pd.concat([changed, paid], ignore_index=True)
+
+
+def latest_state(conn, as_of="9999-12-31"):
+    """Last event per invoice at or before `as_of` (includes paid ones)."""
+    df = pd.read_sql(LATEST_SQL, conn, params=(as_of,))
+    return df.drop(columns=["rn"])
+
+
+def snapshot_as_of(conn, as_of):
+    """Pending invoices (with their balances) as of a timestamp."""
+    df = latest_state(conn, as_of)
+    return df[df["event"] != "paid"].reset_index(drop=True)
+
+
+def _insert_events(conn, events, timestamp):
+    if events.empty:
+        return
+    rows = events.assign(event_at=timestamp, event_date=timestamp[:10])
+    cols = KEY + ["event", "event_at", "event_date"] + ATTRS
+    rows = rows[cols].astype(object).where(rows[cols].notna(), None)
+    placeholders = ", ".join("?" for _ in cols)
+    conn.executemany(
+        f"INSERT INTO {EVENTS_TABLE} ({', '.join(cols)}) VALUES ({placeholders});",
+        rows.itertuples(index=False, name=None),
+    )
+
+
+def _insert_run(conn, timestamp, df_pending, events):
+    """Runs row: event counts plus the pending set's size and open balance."""
+    counts = events["event"].value_counts() if not events.empty else pd.Series(dtype=int)
+    summary = {name: int(counts.get(name, 0)) for name in EVENT_TYPES}
+    current = _normalize(df_pending)
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO {RUNS_TABLE}
+            (run_at, snapshot_date, pending, saldo_pendiente,
+             first_seen, saldo_changed, paid, reopened)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+        """,
+        (
+            timestamp,
+            timestamp[:10],
+            len(current),
+            int(current["Saldo"].sum()),
+            *(summary[name] for name in EVENT_TYPES),
+        ),
+    )
+    return summary
+
+
+def _migrate_legacy_table(conn):
+    """
+    Replay a legacy snapshot-append cuentas_por_cobrar_history table into
+    events (each inserted_at batch = one run), then drop it for the view.
+    """
+    legacy = pd.read_sql(f"SELECT * FROM {HISTORY_VIEW};", conn)
+    print(f"🔁 Migrating {len(legacy):,} legacy CxC history rows to change events...")
+
+    if not legacy.empty:
+        run_at = legacy["inserted_at"].fillna(legacy["snapshot_date"])
+        pending = legacy[legacy["status"] != "paid"]
+        state = pd.DataFrame(columns=KEY + ATTRS + ["event"])
+        for snapshot_at, df_run in pending.groupby(run_at[pending.index], sort=True):
+            events = diff_events(state, df_run)
+            _insert_events(conn, events, str(snapshot_at))
+            _insert_run(conn, str(snapshot_at), df_run, events)
+            if not events.empty:
+                state = pd.concat(
+                    [state.merge(events[KEY], on=KEY, how="left", indicator=True)
+                     .query("_merge == 'left_only'").drop(columns="_merge"), events],
+                    ignore_index=True,
+                )
+
+    conn.execute(f"DROP TABLE {HISTORY_VIEW};")
+    n_events = conn.execute(f"SELECT COUNT(*) FROM {EVENTS_TABLE};").fetchone()[0]
+    print(f"✅ Legacy history replaced by {n_events:,} events")
+
+
+def _backfill_run_balances(conn):
+    """
+    Fill saldo_pendiente for runs recorded before the column existed
+    (one-time: replays the events up to each such run).
+    """
+    runs = [
+        r[0]
+        for r in conn.execute(
+            f"SELECT run_at FROM {RUNS_TABLE} WHERE saldo_pendiente IS NULL ORDER BY run_at;"
+        )
+    ]
+    if not runs:
+        return
+    print(f"🔁 Computing the open balance of {len(runs)} earlier CxC run(s)...")
+    for run_at in runs:
+        pending = snapshot_as_of(conn, run_at)
+        conn.execute(
+            f"UPDATE {RUNS_TABLE} SET pending = ?, saldo_pendiente = ? WHERE run_at = ?;",
+            (len(pending), int(pd.to_numeric(pending["Saldo"]).fillna(0).sum()), run_at),
+        )
+
+
+def ensure_history_schema(conn):
+    """
+    Create events/runs tables and views; migrate a legacy history table once
+    and fill the open balance of runs recorded before it was stored.
+    """
+    with conn:
+        conn.executescript(DDL)
+        columns = [r[1] for r in conn.execute(f"PRAGMA table_info({RUNS_TABLE});")]
+        if "saldo_pendiente" not in columns:
+            conn.execute(f"ALTER TABLE {RUNS_TABLE} ADD COLUMN saldo_pendiente INTEGER;")
+    if _object_type(conn, HISTORY_VIEW) == "table":
+        with conn:
+            _migrate_legacy_table(conn)
+    with conn:
+        _backfill_run_balances(conn)
+    with conn:
+        conn.executescript(VIEWS)
+
+
+def record_events(conn, df_pending, timestamp):
+    """
+    Diff the pending set against the last state and insert only the change
+    events plus a runs row. The caller owns the transaction (schema must
+    already exist, see ensure_history_schema). Returns the event counts.
+    """
+    events = diff_events(latest_state(conn), df_pending)
+    _insert_events(conn, events, timestamp)
+    summary = _insert_run(conn, timestamp, df_pending, events)
+    print(
+        "📜 History events → "
+        + ", ".join(f"{name}: {summary[name]}" for name in EVENT_TYPES)
+    )
+    return summary
+
+
+def record_run(conn, df_pending, timestamp):
+    """Record one update run in its own transaction. Returns the event counts."""
+    ensure_history_schema(conn)
+    with conn:
+        return record_events(conn, df_pending, timestamp)
+# === END cobrar/cta_por_cobrar_history.py ===
@@ -1,28 +1,112 @@
 # === cobrar/cta_por_cobrar_save_db.py (final version with INTEGER fields for amounts) ===
 import os
-import sqlite3
 from datetime import datetime
 
 import pandas as pd
 
+from cobrar.cta_por_cobrar_history import ensure_history_schema, record_events
+from data_zone import read_table
+from db import connect
+
 DB_PATH = "data/vitroscience.db"
-CLEAN_PATH = "test/cobranza/clean/cuentas_por_cobrar_clean.csv"
+CLEAN_PATH = "data/lake/clean/cuentas_por_cobrar/latest.parquet"
+
+LIVE_TABLE = "cuentas_por_cobrar"
+SHADOW_TABLE = "cuentas_por_cobrar__new"
+
+LIVE_COLUMNS = [
+    ("Rut", "TEXT NOT NULL"),
+    ("RznSocial", "TEXT"),
+    ("NombreVendedor", "TEXT"),
+    ("Documento", "TEXT"),
+    ("FolioDocumento", "TEXT NOT NULL"),
+    ("Fecha", "TEXT"),
+    ("FechaVencimiento", "TEXT"),
+    ("CondicionVenta", "TEXT"),
+    ("Total", "INTEGER"),
+    ("TotalCP", "INTEGER"),
+    ("Saldo", "INTEGER"),
+    ("MonthFetched", "TEXT"),
+    ("SnapshotDate", "TEXT"),
+    ("status", "TEXT"),
+    ("last_updated", "TEXT"),
+]
+LIVE_INDEXES = {
+    "idx_cxc_rut": "Rut",
+    "idx_cxc_month": "MonthFetched",
+}
+
+
+def _table_info(conn, table):
+    return [tuple(r[1:]) for r in conn.execute(f"PRAGMA table_info({table});")]
+
+
+def swap_in_live_snapshot(conn, df):
+    """
+    Replace cuentas_por_cobrar with `df` atomically. Caller owns the transaction.
+
+    - Rows are loaded into a shadow table first
+    - Same schema as the live table: DELETE + INSERT ... SELECT from the shadow,
+      so the existing indexes are kept (no rebuild)
+    - Schema changed (or no live table yet): drop the live table, rename the
+      shadow into place and build the indexes
+    Readers see either the old or the new snapshot, never a partial one.
+    """
+    names = [name for name, _ in LIVE_COLUMNS]
+    df = df.copy()
+    for col in names:
+        if col not in df.columns:
+            df[col] = None
+    df[["Rut", "FolioDocumento"]] = df[["Rut", "FolioDocumento"]].fillna("")
+    df = df[names].drop_duplicates(subset=["Rut", "FolioDocumento"], keep="last")
+
+    conn.execute(f"DROP TABLE IF EXISTS {SHADOW_TABLE};")
+    conn.execute(
+        f"""
+        CREATE TABLE {SHADOW_TABLE} (
+            {", ".join(f"{name} {decl}" for name, decl in LIVE_COLUMNS)},
+            PRIMARY KEY (Rut, FolioDocumento)
+        );
+        """
+    )
+    conn.executemany(
+        f"INSERT INTO {SHADOW_TABLE} VALUES ({', '.join('?' for _ in names)});",
+        df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
+    )
+
+    if _table_info(conn, LIVE_TABLE) == _table_info(conn, SHADOW_TABLE):
+        conn.execute(f"DELETE FROM {LIVE_TABLE};")
+        conn.execute(f"INSERT INTO {LIVE_TABLE} SELECT * FROM {SHADOW_TABLE};")
+        conn.execute(f"DROP TABLE {SHADOW_TABLE};")
+    else:
+        print(f"🔧 {LIVE_TABLE} schema changed → swapping in the new table")
+        conn.execute(f"DROP TABLE IF EXISTS {LIVE_TABLE};")
+        conn.execute(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {LIVE_TABLE};")
+
+    for index, column in LIVE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {LIVE_TABLE}({column});")
+    return len(df)
 
 
 def save_cta_por_cobrar_to_db(input_path=CLEAN_PATH, db_path=DB_PATH):
     """
     Save cleaned 'Cuentas por Cobrar' data into SQLite database.
 
-    - Rebuilds schema for cuentas_por_cobrar and cuentas_por_cobrar_history
+    - Swaps the new snapshot into cuentas_por_cobrar in one transaction
+      (no DROP/rebuild unless the schema changed)
+    - Records change events in the CxC history instead of wiping it
     - Numeric fields (Total, TotalCP, Saldo) stored as INTEGER
     - Dates stored as TEXT (ISO 'YYYY-MM-DD')
+    - `input_path` must hold a complete snapshot (the fetchers raise
+      IncompleteFetchError and the pipelines stop before writing it);
+      invoices missing from it are recorded as paid
     """
 
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"❌ Cleaned file not found: {input_path}")
 
     print(f"💾 Loading cleaned file: {input_path}")
-    df = pd.read_csv(input_path, dtype=str)
+    df = read_table(input_path, dtype=str)
     if df.empty:
         print("⚠️ Clean file is empty, nothing to save.")
         return
@@ -39,120 +123,23 @@ def save_cta_por_cobrar_to_db(input_path=CLEAN_PATH, db_path=DB_PATH):
 
     df["status"] = "pending"
     df["last_updated"] = timestamp
-    df["snapshot_date"] = snapshot_date
-    df["inserted_at"] = timestamp
-
-    # Ensure DB directory exists
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-    # Connect to database
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    # Connect to database (WAL: readers keep the old snapshot until commit)
+    conn = connect(db_path)
     print(f"🗃️ Connected to database: {db_path}")
 
-    # === Drop existing tables (to avoid legacy schema conflicts) ===
-    cur.executescript(
-        """
-        DROP TABLE IF EXISTS cuentas_por_cobrar;
-        DROP TABLE IF EXISTS cuentas_por_cobrar_history;
-        DROP INDEX IF EXISTS idx_cxc_rut;
-        DROP INDEX IF EXISTS idx_cxc_month;
-        DROP INDEX IF EXISTS idx_cxc_hist_snapshot_date;
-        DROP INDEX IF EXISTS idx_cxc_hist_rut_date;
-    """
-    )
-
-    # === Create tables with correct numeric and date types ===
-    cur.executescript(
-        """
-        CREATE TABLE cuentas_por_cobrar (
-            Rut TEXT,
-            RznSocial TEXT,
-            NombreVendedor TEXT,
-            Documento TEXT,
-            FolioDocumento TEXT PRIMARY KEY,
-            Fecha TEXT,
-            FechaVencimiento TEXT,
-            CondicionVenta TEXT,
-            Total INTEGER,
-            TotalCP INTEGER,
-            Saldo INTEGER,
-            MonthFetched TEXT,
-            SnapshotDate TEXT,
-            status TEXT,
-            last_updated TEXT
-        );
-
-        CREATE TABLE cuentas_por_cobrar_history (
-            Rut TEXT,
-            RznSocial TEXT,
-            NombreVendedor TEXT,
-            Documento TEXT,
-            FolioDocumento TEXT,
-            Fecha TEXT,
-            FechaVencimiento TEXT,
-            CondicionVenta TEXT,
-            Total INTEGER,
-            TotalCP INTEGER,
-            Saldo INTEGER,
-            MonthFetched TEXT,
-            SnapshotDate TEXT,
-            status TEXT,
-            last_updated TEXT,
-            snapshot_date TEXT,
-            inserted_at TEXT
-        );
-    """
-    )
-
-    # Align DataFrame columns to schema
-    expected_cols = [
-        "Rut",
-        "RznSocial",
-        "NombreVendedor",
-        "Documento",
-        "FolioDocumento",
-        "Fecha",
-        "FechaVencimiento",
-        "CondicionVenta",
-        "Total",
-        "TotalCP",
-        "Saldo",
-        "MonthFetched",
-        "SnapshotDate",
-        "status",
-        "last_updated",
-        "snapshot_date",
-        "inserted_at",
-    ]
-    df = df[[c for c in df.columns if c in expected_cols]]
-
-    # === Save snapshot ===
-    df_latest = df.drop(columns=["snapshot_date", "inserted_at"], errors="ignore")
-    df_latest.to_sql("cuentas_por_cobrar", conn, if_exists="replace", index=False)
-    print(f"✅ Latest snapshot saved → cuentas_por_cobrar ({len(df_latest)} rows)")
-
-    # === Append to history ===
-    df.to_sql("cuentas_por_cobrar_history", conn, if_exists="append", index=False)
-    print(
-        f"📜 Historical log updated → cuentas_por_cobrar_history ({len(df)} rows appended)"
-    )
-
-    # === Create indexes ===
-    cur.executescript(
-        """
-        CREATE INDEX IF NOT EXISTS idx_cxc_rut ON cuentas_por_cobrar(Rut);
-        CREATE INDEX IF NOT EXISTS idx_cxc_month ON cuentas_por_cobrar(MonthFetched);
-        CREATE INDEX IF NOT EXISTS idx_cxc_hist_snapshot_date ON cuentas_por_cobrar_history(snapshot_date);
-        CREATE INDEX IF NOT EXISTS idx_cxc_hist_rut_date ON cuentas_por_cobrar_history(Rut, snapshot_date);
-    """
-    )
+    ensure_history_schema(conn)
 
-    conn.commit()
+    # === Snapshot swap + history events, one transaction ===
+    with conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        rows = swap_in_live_snapshot(conn, df)
+        record_events(conn, df, timestamp)
     conn.close()
 
-    print(f"✅ Database rebuilt successfully on {snapshot_date}")
-    print("📦 Tables: cuentas_por_cobrar, cuentas_por_cobrar_history"ry")
+    print(f"✅ Latest snapshot saved → {LIVE_TABLE} ({rows} rows)")
+    print(f"✅ Database updated successfully on {snapshot_date}")
+    print("📦 Tables: cuentas_por_cobrar, cuentas_por_cobrar_events")
     print(f"🧾 Total invoices processed: {len(df)}")
 
 
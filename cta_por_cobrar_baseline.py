@@ -5,10 +5,12 @@ from datetime import datetime
 
 import pandas as pd
 
-from cobrar.clean_collection import clean_collection
+from cobrar.clean_cta_por_cobrar import clean_cta_por_cobrar
+from db import connect
 
 # === Imports from existing working modules ===
 from get_cta_por_cobrar import get_cuentas_por_cobrar, save_if_changed
+from kame_client import IncompleteFetchError
 
 # === Paths ===
 DB_PATH = "data/vitroscience.db"
@@ -27,15 +29,6 @@ def ensure_dirs():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 
-def _table_exists(conn, table_name: str) -> bool:
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name=?;",
-        (table_name,),
-    )
-    return cur.fetchone() is not None
-
-
 def _create_status_table(conn: sqlite3.Connection):
     """Create the cuentas_por_cobrar_status table if it doesn't exist."""
     conn.execute(
@@ -68,141 +61,110 @@ def _now():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-def build_key(df: pd.DataFrame):
-    """Return list of composite keys (Rut, FolioDocumento)."""
-    for c in ["Rut", "FolioDocumento"]:
+BASE_COLS = [
+    "Rut",
+    "RznSocial",
+    "NombreVendedor",
+    "Documento",
+    "FolioDocumento",
+    "Fecha",
+    "FechaVencimiento",
+    "CondicionVenta",
+    "Total",
+    "TotalCP",
+    "Saldo",
+]
+KEY_COLS = ["Rut", "FolioDocumento"]
+TRACKED_COLS = [c for c in BASE_COLS if c not in KEY_COLS]
+
+
+def _load_current_batch(conn: sqlite3.Connection, df_clean: pd.DataFrame):
+    """Load this run's pending set into a keyed TEMP table (cxc_current)."""
+    df = df_clean.copy()
+    for c in BASE_COLS:
         if c not in df.columns:
-            df[c] = ""
-    return list(
-        zip(
-            df["Rut"].astype(str).fillna(""),
-            df["FolioDocumento"].astype(str).fillna(""),
-            strict=False,
-        )
+            df[c] = None
+    for c in KEY_COLS:
+        df[c] = df[c].fillna("").astype(str)
+    # TEXT columns: bind amounts as text so unchanged balances compare equal
+    for c in ["Total", "TotalCP", "Saldo"]:
+        df[c] = df[c].where(df[c].isna(), df[c].astype(str))
+    df = df[BASE_COLS].drop_duplicates(subset=KEY_COLS, keep="last")
+
+    conn.execute("DROP TABLE IF EXISTS temp.cxc_current;")
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE cxc_current (
+            {", ".join(f"{c} TEXT" for c in BASE_COLS)},
+            PRIMARY KEY (Rut, FolioDocumento)
+        );
+        """
+    )
+    conn.executemany(
+        f"INSERT INTO cxc_current VALUES ({', '.join('?' for _ in BASE_COLS)});",
+        df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
     )
 
 
 # === Core reconciliation logic ===
 def update_status_db(df_clean: pd.DataFrame):
     """
-    Core reconciliation:
-    - First run: create baseline (all pending)
-    - Later runs: mark missing ones as paid, update timestamps
-    - Keeps full combined dataset in DB
+    Core reconciliation, done set-based in SQLite (one transaction):
+    - New invoices are inserted as pending (first run = full baseline)
+    - Present invoices are upserted only if their status or any value changed
+      (paid → pending again, new Saldo, ...)
+    - Invoices missing from this run are marked paid in one bulk UPDATE
+    Unchanged rows are not written; for them last_seen/last_updated keep
+    the time of their last change.
+    Returns the full status table.
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     _create_status_table(conn)
     now = _now()
 
-    # Load previous data
-    if _table_exists(conn, "cuentas_por_cobrar_status"):
-        df_db = pd.read_sql("SELECT * FROM cuentas_por_cobrar_status;", conn)
-    else:
-        df_db = pd.DataFrame()
-
-    # Ensure all base columns exist
-    base_cols = [
-        "Rut",
-        "RznSocial",
-        "NombreVendedor",
-        "Documento",
-        "FolioDocumento",
-        "Fecha",
-        "FechaVencimiento",
-        "CondicionVenta",
-        "Total",
-        "TotalCP",
-        "Saldo",
-    ]
-    for c in base_cols:
-        if c not in df_clean.columns:
-            df_clean[c] = None
-
-    current_keys = set(build_key(df_clean))
-
-    # === Initial baseline ===
-    if df_db.empty:
-        df_clean = df_clean.copy()
-        df_clean["status"] = "pending"
-        df_clean["first_seen"] = now
-        df_clean["last_seen"] = now
-        df_clean["paid_date"] = None
-        df_clean["last_updated"] = now
-
-        conn.execute("DELETE FROM cuentas_por_cobrar_status;")
-        df_clean[
-            base_cols
-            + ["status", "first_seen", "last_seen", "paid_date", "last_updated"]
-        ].to_sql("cuentas_por_cobrar_status", conn, if_exists="append", index=False)
-        conn.commit()
-        conn.close()
-        return df_clean  # all pending baseline
-
-    # === Update logic ===
-    df_db = df_db.copy()
-    db_keys = set(build_key(df_db))
-    db_idx = {(r["Rut"], r["FolioDocumento"]): r for _, r in df_db.iterrows()}
-    updated_records = {}
-
-    # 1) Handle invoices still present (pending)
-    for _, row in df_clean.iterrows():
-        key = (str(row.get("Rut", "") or ""), str(row.get("FolioDocumento", "") or ""))
-        prev = db_idx.get(key)
-        rec = {c: row.get(c, None) for c in base_cols}
-        rec["last_updated"] = now
-        rec["last_seen"] = now
-
-        if prev is None:
-            rec["status"] = "pending"
-            rec["first_seen"] = now
-            rec["paid_date"] = None
-        else:
-            rec["first_seen"] = prev.get("first_seen")
-            if (prev.get("status") or "").lower() == "paid":
-                rec["status"] = "pending"
-                rec["paid_date"] = None
-            else:
-                rec["status"] = "pending"
-                rec["paid_date"] = prev.get("paid_date")
-        updated_records[key] = rec
-
-    # 2) Mark disappeared invoices as paid
-    disappeared = db_keys - current_keys
-    if disappeared:
-        for key in disappeared:
-            prev = db_idx[key]
-            rec = {c: prev.get(c, None) for c in base_cols}
-            rec["status"] = "paid"
-            rec["first_seen"] = prev.get("first_seen")
-            rec["last_seen"] = prev.get("last_seen")
-            rec["paid_date"] = (
-                now if not prev.get("paid_date") else prev.get("paid_date")
-            )
-            rec["last_updated"] = now
-            updated_records[key] = rec
-
-    # 3) Fallback: keep untouched records as-is
-    leftovers = db_keys - (disappeared | current_keys)
-    for key in leftovers:
-        prev = db_idx[key]
-        rec = {c: prev.get(c, None) for c in base_cols}
-        rec["status"] = prev.get("status")
-        rec["first_seen"] = prev.get("first_seen")
-        rec["last_seen"] = prev.get("last_seen")
-        rec["paid_date"] = prev.get("paid_date")
-        rec["last_updated"] = now
-        updated_records[key] = rec
-
-    df_final = pd.DataFrame(updated_records.values())
-
-    # Replace data atomically
-    conn.execute("DELETE FROM cuentas_por_cobrar_status;")
-    df_final[
-        base_cols + ["status", "first_seen", "last_seen", "paid_date", "last_updated"]
-    ].to_sql("cuentas_por_cobrar_status", conn, if_exists="append", index=False)
-    conn.commit()
+    changed = " OR ".join(
+        f"cuentas_por_cobrar_status.{c} IS NOT excluded.{c}" for c in TRACKED_COLS
+    )
+    with conn:
+        _load_current_batch(conn, df_clean)
+        before = conn.total_changes
+        conn.execute(
+            f"""
+            INSERT INTO cuentas_por_cobrar_status
+                ({", ".join(BASE_COLS)}, status, first_seen, last_seen, paid_date, last_updated)
+            SELECT {", ".join(BASE_COLS)}, 'pending', :now, :now, NULL, :now
+            FROM cxc_current WHERE true
+            ON CONFLICT (Rut, FolioDocumento) DO UPDATE SET
+                {", ".join(f"{c} = excluded.{c}" for c in TRACKED_COLS)},
+                status = 'pending',
+                paid_date = NULL,
+                last_seen = excluded.last_seen,
+                last_updated = excluded.last_updated
+            WHERE cuentas_por_cobrar_status.status = 'paid' OR {changed};
+            """,
+            {"now": now},
+        )
+        upserted = conn.total_changes - before
+        paid = conn.execute(
+            """
+            UPDATE cuentas_por_cobrar_status
+            SET status = 'paid',
+                paid_date = COALESCE(paid_date, :now),
+                last_updated = :now
+            WHERE status = 'pending'
+              AND NOT EXISTS (
+                  SELECT 1 FROM cxc_current c
+                  WHERE c.Rut = cuentas_por_cobrar_status.Rut
+                    AND c.FolioDocumento = cuentas_por_cobrar_status.FolioDocumento
+              );
+            """,
+            {"now": now},
+        ).rowcount
+        conn.execute("DROP TABLE temp.cxc_current;")
+
+    print(f"🔁 Reconciled: {upserted} new/changed | {paid} newly paid")
+    df_final = pd.read_sql("SELECT * FROM cuentas_por_cobrar_status;", conn)
     conn.close()
-
     return df_final
 
 
@@ -214,7 +176,11 @@ def main():
     today = datetime.today().strftime("%Y-%m-%d")
 
     # Step 1: Fetch all data since 2023-01-01
-    df_raw = get_cuentas_por_cobrar(fecha_desde="2023-01-01", fecha_hasta=today)
+    try:
+        df_raw = get_cuentas_por_cobrar(fecha_desde="2023-01-01", fecha_hasta=today)
+    except IncompleteFetchError as e:
+        print(f"❌ Incomplete fetch ({e}). Exiting without saving.")
+        return
     if df_raw.empty:
         print("⚠️ No data fetched from API. Exiting.")
         return
@@ -223,7 +189,7 @@ def main():
     save_if_changed(df_raw, RAW_PATH)
 
     # Step 3: Clean data
-    df_clean = clean_collection(input_path=RAW_PATH, output_path=CLEAN_PATH)
+    df_clean = clean_cta_por_cobrar(input_path=RAW_PATH, output_path=CLEAN_PATH)
 
     # Step 4: Reconcile & update database
     df_combined = update_status_db(df_clean)
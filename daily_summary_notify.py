@@ -8,12 +8,13 @@ Daily summary notifier for VitroScience.
 Schedule via LaunchAgent (com.vitroscience.dailynotify).
 """
 
-import sqlite3
 import subprocess
 from datetime import datetime, timedelta
 from pathlib import Path
 import csv
 
+from db import connect
+
 DB_PATH = Path("data/vitroscience.db")
 LOG_DIR = Path("data")
 LOG_PATH = LOG_DIR / "daily_summary_log.csv"
@@ -22,12 +23,12 @@ LOG_PATH = LOG_DIR / "daily_summary_log.csv"
 def get_new_ventas_count():
     if not DB_PATH.exists():
         return None
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH, read_only=True)
     cur = conn.cursor()
-    # last 24h window (use ISO for SQLite string compare)
-    since = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S")
+    # last 24h window (FechaISO is YYYY-MM-DD, indexed)
+    since = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
     cur.execute(
-        "SELECT COUNT(*) FROM ventas_enriched_product WHERE Fecha >= ?;", (since,)
+        "SELECT COUNT(*) FROM ventas_enriched_product WHERE FechaISO >= ?;", (since,)
     )
     count = cur.fetchone()[0]
     conn.close()
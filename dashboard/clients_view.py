@@ -1,7 +1,7 @@
 # === dashboard/tabs/clients_view.py ===
-import sqlite3
 import sys
-from datetime import date, datetime
+from calendar import monthrange
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
@@ -12,149 +12,201 @@ ROOT_DIR = Path(__file__).resolve().parent.parent  # points to VS_KAME_APP
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-DB_PATH = ROOT_DIR / "data" / "vitroscience.db"
-
-# === Import Wheeler charts ===
+# === Import Wheeler charts and the cached data layer ===
 from dashboard.tabs.statistics.clients_wheeler_analysis import (
     show_cta_por_cobrar_wheeler_analysis,
     show_sales_wheeler_analysis,
 )
+from dashboard.utils.db_utils import DB_PATH, read_sql
 
 # === Constants ===
 START_2023 = pd.Timestamp("2023-01-01")
+START_2023_ISO = START_2023.strftime("%Y-%m-%d")
+VENTAS = "ventas_enriched_product"
 
 
 # === Helpers ===
-def get_client_data():
-    """Fetch client sales and payment data from the database."""
-    if not DB_PATH.exists():
-        st.error(f"❌ Database not found at {DB_PATH}")
-        return pd.DataFrame()
-
-    conn = sqlite3.connect(DB_PATH)
-    df_sales = pd.read_sql("SELECT * FROM ventas_enriched_product;", conn)
-    conn.close()
-
-    df_sales["Fecha"] = pd.to_datetime(df_sales["Fecha"], errors="coerce")
+# All reads are parameterised SQL through the cached data layer. Sales filter
+# on Rut/FechaISO (idx_ventas_rut, idx_ventas_fecha), so only the selected
+# client's rows or the aggregates ever reach pandas.
+def _period_bounds(year, month=None):
+    """ISO (start, end) for a whole year or a single month."""
+    if month:
+        last_day = monthrange(year, month)[1]
+        return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
+    return f"{year}-01-01", f"{year}-12-31"
 
-    if "FechaPago" in df_sales.columns:
-        df_sales["FechaPago"] = pd.to_datetime(df_sales["FechaPago"], errors="coerce")
 
-    df_sales = df_sales.dropna(subset=["Fecha"])
-    return df_sales
+def _rut_clause(ruts):
+    """SQL fragment + params restricting to `ruts` (None = all clients)."""
+    if not ruts:
+        return "", ()
+    return f" AND Rut IN ({', '.join('?' for _ in ruts)})", tuple(ruts)
 
 
-def get_cta_por_cobrar(year=None, month=None):
-    """
-    Fetch pending balances and counts per client from cuentas_por_cobrar.
-    Filters by Fecha for current year (and month if provided),
-    and also computes YTD totals since 2023-01-01.
-    Returns tuple: (df_current, df_ytd)
-    """
+def get_client_list():
+    """Distinct (RznSocial, Rut) pairs for the client selector."""
     if not DB_PATH.exists():
-        return pd.DataFrame(), pd.DataFrame()
-
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        df_cxc = pd.read_sql("SELECT Rut, Fecha, Saldo FROM cuentas_por_cobrar;", conn)
-    except Exception as e:
-        st.warning(f"⚠️ Could not load 'cuentas_por_cobrar' table: {e}")
-        df_cxc = pd.DataFrame(columns=["Rut", "Fecha", "Saldo"])
-    finally:
-        conn.close()
-
-    if df_cxc.empty:
-        return df_cxc, df_cxc
+        st.error(f"❌ Database not found at {DB_PATH}")
+        return pd.DataFrame(columns=["RznSocial", "Rut"])
+    return read_sql(
+        f"""
+        SELECT DISTINCT RznSocial, Rut
+        FROM {VENTAS}
+        WHERE RznSocial IS NOT NULL
+        ORDER BY RznSocial;
+        """
+    )
 
-    # --- Normalize types ---
-    df_cxc["Saldo"] = pd.to_numeric(df_cxc["Saldo"], errors="coerce").fillna(0)
-    df_cxc["Fecha"] = pd.to_datetime(df_cxc["Fecha"], errors="coerce")
-    df_cxc = df_cxc.dropna(subset=["Fecha"])
 
-    # --- Filter Current Year (and Month if selected) ---
-    df_current = df_cxc[df_cxc["Fecha"].dt.year == year] if year else df_cxc.copy()
-    if month:
-        df_current = df_current[df_current["Fecha"].dt.month == month]
+def _has_fecha_pago():
+    cols = read_sql(f"PRAGMA table_info({VENTAS});")
+    return "FechaPago" in cols["name"].tolist()
 
-    # --- YTD since 2023-01-01 ---
-    df_ytd = df_cxc[df_cxc["Fecha"] >= START_2023].copy()
 
-    # --- Aggregate ---
-    df_curr_summary = df_current.groupby("Rut", as_index=False).agg(
-        SaldoTotal=("Saldo", "sum"), FacturasPendientes=("Saldo", "count")
+def get_sales_summary(start, end=None, ruts=None):
+    """
+    Sales aggregates between ISO dates `start` and `end` (open-ended if None):
+    total sales, distinct invoices and, when FechaPago exists, avg days to pay.
+    """
+    end = end or "9999-12-31"
+    rut_sql, rut_params = _rut_clause(ruts)
+    avg_days_sql = (
+        "AVG(julianday(FechaPago) - julianday(FechaISO))"
+        if _has_fecha_pago()
+        else "NULL"
     )
-    df_ytd_summary = df_ytd.groupby("Rut", as_index=False).agg(
-        SaldoTotal=("Saldo", "sum"), FacturasPendientes=("Saldo", "count")
+    df = read_sql(
+        f"""
+        SELECT COALESCE(SUM(Total), 0) AS total_sales,
+               COUNT(DISTINCT Folio) AS facturas,
+               {avg_days_sql} AS avg_days
+        FROM {VENTAS}
+        WHERE FechaISO BETWEEN ? AND ?{rut_sql};
+        """,
+        params=(start, end) + rut_params,
     )
-    return df_curr_summary, df_ytd_summary
+    row = df.iloc[0]
+    return {
+        "total_sales": float(row["total_sales"]),
+        "facturas": int(row["facturas"]),
+        "avg_days": None if pd.isna(row["avg_days"]) else float(row["avg_days"]),
+    }
 
 
-def filter_by_period(df, year, month=None):
-    """Filter sales by selected year or YTD."""
-    if month:
-        mask = (df["Fecha"].dt.year == year) & (df["Fecha"].dt.month == month)
-    else:
-        mask = df["Fecha"].dt.year == year
-    return df.loc[mask].copy()
-
-
-def get_kpis(df_current, df_previous, df_pending_current=None, df_pending_ytd=None):
-    """Compute KPIs for period."""
-    total_sales = df_current["Total"].sum()
-    facturas = df_current["Folio"].nunique() if "Folio" in df_current.columns else 0
-    total_sales_prev = df_previous["Total"].sum()
-    facturas_prev = (
-        df_previous["Folio"].nunique() if "Folio" in df_previous.columns else 0
+def get_monthly_sales(start, end=None, ruts=None):
+    """Monthly Total (Fecha = first of month) from the daily rollup."""
+    end = end or "9999-12-31"
+    rut_sql, rut_params = _rut_clause(ruts)
+    try:
+        df = read_sql(
+            f"""
+            SELECT substr(FechaISO, 1, 7) || '-01' AS Fecha, SUM(Total) AS Total
+            FROM ventas_daily_rollup
+            WHERE FechaISO BETWEEN ? AND ?{rut_sql}
+            GROUP BY substr(FechaISO, 1, 7)
+            ORDER BY Fecha;
+            """,
+            params=(start, end) + rut_params,
+            parse_dates=["Fecha"],
+        )
+    except pd.errors.DatabaseError:
+        st.warning("⚠️ Sales rollups not found — run the sales pipeline once to build them.")
+        return pd.DataFrame(columns=["Fecha", "Total"])
+    return df
+
+
+def get_recent_purchases(ruts, limit=3):
+    """Lines of the client's `limit` most recent invoices."""
+    rut_sql, rut_params = _rut_clause(ruts)
+    return read_sql(
+        f"""
+        SELECT FechaISO AS Fecha, Folio, Descripcion, Total
+        FROM {VENTAS}
+        WHERE 1 = 1{rut_sql}
+          AND Folio IN (
+              SELECT Folio FROM {VENTAS}
+              WHERE 1 = 1{rut_sql}
+              GROUP BY Folio
+              ORDER BY MAX(FechaISO) DESC
+              LIMIT ?
+          );
+        """,
+        params=rut_params + rut_params + (limit,),
+        parse_dates=["Fecha"],
     )
 
-    # Pending from cuentas_por_cobrar
-    pending = pending_invoices = 0
-    pending_ytd = pending_invoices_ytd = 0
 
-    if df_pending_current is not None and not df_pending_current.empty:
-        pending = df_pending_current["SaldoTotal"].sum()
-        pending_invoices = df_pending_current["FacturasPendientes"].sum()
-    if df_pending_ytd is not None and not df_pending_ytd.empty:
-        pending_ytd = df_pending_ytd["SaldoTotal"].sum()
-        pending_invoices_ytd = df_pending_ytd["FacturasPendientes"].sum()
+def get_cta_por_cobrar(year=None, month=None, ruts=None):
+    """
+    Pending balance and invoice count from cuentas_por_cobrar.
+    - current: Fecha in the selected year (and month if provided)
+    - ytd: Fecha since 2023-01-01
+    Returns tuple of dicts: (current, ytd), each {SaldoTotal, FacturasPendientes}.
+    """
+    empty = {"SaldoTotal": 0.0, "FacturasPendientes": 0}
+    if not DB_PATH.exists():
+        return empty, empty
+
+    rut_sql, rut_params = _rut_clause(ruts)
+    start, end = _period_bounds(year, month) if year else ("0000-01-01", "9999-12-31")
+    query = f"""
+        SELECT COALESCE(SUM(CAST(Saldo AS REAL)), 0) AS SaldoTotal,
+               COUNT(Saldo) AS FacturasPendientes
+        FROM cuentas_por_cobrar
+        WHERE substr(Fecha, 1, 10) BETWEEN ? AND ?{rut_sql};
+    """
+    try:
+        df_curr = read_sql(query, params=(start, end) + rut_params)
+        df_ytd = read_sql(query, params=(START_2023_ISO, "9999-12-31") + rut_params)
+    except Exception as e:
+        st.warning(f"⚠️ Could not load 'cuentas_por_cobrar' table: {e}")
+        return empty, empty
+    return df_curr.iloc[0].to_dict(), df_ytd.iloc[0].to_dict()
+
+
+def get_kpis(current, previous, pending_current=None, pending_ytd=None):
+    """Compute KPIs for period from get_sales_summary / get_cta_por_cobrar results."""
+    pending_current = pending_current or {}
+    pending_ytd = pending_ytd or {}
 
     def pct_change(current, prev):
         if prev == 0:
             return 0
         return ((current - prev) / prev) * 100
 
-    avg_days = None
-    if "FechaPago" in df_current.columns:
-        mask_paid = df_current["FechaPago"].notna()
-        if mask_paid.any():
-            avg_days = (
-                df_current.loc[mask_paid, "FechaPago"]
-                - df_current.loc[mask_paid, "Fecha"]
-            ).dt.days.mean()
-
     return {
-        "facturas": (facturas, pct_change(facturas, facturas_prev)),
-        "total_sales": (total_sales, pct_change(total_sales, total_sales_prev)),
-        "pending": pending,
-        "pending_invoices": pending_invoices,
-        "pending_ytd": pending_ytd,
-        "pending_invoices_ytd": pending_invoices_ytd,
-        "avg_days": avg_days,
+        "facturas": (
+            current["facturas"], pct_change(current["facturas"], previous["facturas"])
+        ),
+        "total_sales": (
+            current["total_sales"],
+            pct_change(current["total_sales"], previous["total_sales"]),
+        ),
+        "pending": pending_current.get("SaldoTotal", 0),
+        "pending_invoices": pending_current.get("FacturasPendientes", 0),
+        "pending_ytd": pending_ytd.get("SaldoTotal", 0),
+        "pending_invoices_ytd": pending_ytd.get("FacturasPendientes", 0),
+        "avg_days": current["avg_days"],
     }
 
 
-def get_cta_por_cobrar_raw():
-    """Return raw cuentas_por_cobrar data with Fecha and Saldo for Wheeler analysis."""
+def get_cta_por_cobrar_monthly(start, end):
+    """Monthly Saldo from cuentas_por_cobrar (Fecha = first of month) for Wheeler analysis."""
     if not DB_PATH.exists():
         return pd.DataFrame()
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        df = pd.read_sql("SELECT Fecha, Saldo FROM cuentas_por_cobrar;", conn)
-    finally:
-        conn.close()
-    df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-    df["Saldo"] = pd.to_numeric(df["Saldo"], errors="coerce").fillna(0)
-    return df.dropna(subset=["Fecha"])
+    return read_sql(
+        """
+        SELECT substr(Fecha, 1, 7) || '-01' AS Fecha,
+               COALESCE(SUM(CAST(Saldo AS REAL)), 0) AS Saldo
+        FROM cuentas_por_cobrar
+        WHERE substr(Fecha, 1, 10) BETWEEN ? AND ?
+        GROUP BY substr(Fecha, 1, 7)
+        ORDER BY Fecha;
+        """,
+        params=(start, end),
+        parse_dates=["Fecha"],
+    )
 
 
 # === Main View ===
@@ -162,12 +214,11 @@ def show_clients_view():
     """Main Streamlit view for client-level analysis."""
     st.title("👥 Client Overview")
 
-    # === Load data ===
-    df_sales = get_client_data()
+    # === Load client list ===
+    df_clients = get_client_list()
     current_year = date.today().year
-    df_pending, df_pending_ytd = get_cta_por_cobrar(year=current_year)
 
-    if df_sales.empty:
+    if df_clients.empty:
         st.warning("No client sales data available.")
         return
 
@@ -177,12 +228,13 @@ def show_clients_view():
     selected_month = None if month == "YTD" else month
 
     # === Compute KPIs first (GLOBAL/YTD) ===
-    df_current = filter_by_period(df_sales, year, selected_month)
-    df_since_2023_sales = df_sales[df_sales["Fecha"] >= START_2023]
-    df_previous = filter_by_period(df_sales, year - 1, selected_month)
+    sales_current = get_sales_summary(*_period_bounds(year, selected_month))
+    sales_since_2023 = get_sales_summary(START_2023_ISO)
+    sales_previous = get_sales_summary(*_period_bounds(year - 1, selected_month))
+    pending, pending_ytd = get_cta_por_cobrar(year=current_year)
 
-    kpis_selected = get_kpis(df_current, df_previous, df_pending, df_pending_ytd)
-    kpis_ytd = get_kpis(df_since_2023_sales, df_previous, df_pending, df_pending_ytd)
+    kpis_selected = get_kpis(sales_current, sales_previous, pending, pending_ytd)
+    kpis_ytd = get_kpis(sales_since_2023, sales_previous, pending, pending_ytd)
 
     # === KPI SECTION (kept exactly as you had it) ===
     st.subheader(
@@ -236,7 +288,7 @@ def show_clients_view():
 
     c1, c2, c3 = st.columns([2, 1, 1])
     # 🔹 Minimal change: prepend "All"
-    all_clients = ["All"] + sorted(df_sales["RznSocial"].dropna().unique())
+    all_clients = ["All"] + df_clients["RznSocial"].drop_duplicates().tolist()
 
     search_client = c1.text_input("🔍 Search Client")
     filtered_clients = [c for c in all_clients if search_client.lower() in c.lower()]
@@ -254,17 +306,17 @@ def show_clients_view():
     # Save selections
     st.session_state["selected_year"] = new_year
     st.session_state["selected_month"] = new_month
-
-    # === Refresh Data ===
-    df_current = filter_by_period(
-        df_sales, new_year, None if new_month == "YTD" else new_month
-    )
-    df_since_2023_sales = df_sales[df_sales["Fecha"] >= START_2023]
-    df_previous = filter_by_period(
-        df_sales, new_year - 1, None if new_month == "YTD" else new_month
-    )
-    df_pending, df_pending_ytd = get_cta_por_cobrar(
-        year=new_year, month=None if new_month == "YTD" else new_month
+    new_selected_month = None if new_month == "YTD" else new_month
+    sel_start, sel_end = _period_bounds(new_year, new_selected_month)
+    prev_start, prev_end = _period_bounds(new_year - 1, new_selected_month)
+
+    # === CxC months for the Wheeler charts ===
+    cxc_ytd_bounds = _period_bounds(current_year)
+    df_cxc_ytd = get_cta_por_cobrar_monthly(*cxc_ytd_bounds)
+    df_cxc_selected = (
+        pd.DataFrame()
+        if new_month == "YTD"
+        else get_cta_por_cobrar_monthly(sel_start, sel_end)
     )
 
     st.divider()
@@ -272,19 +324,12 @@ def show_clients_view():
     # === Show GLOBAL Wheeler when "All" is selected (KPIs above remain visible) ===
     if selected_client == "All":
         # Ventas (All clients)
-        show_sales_wheeler_analysis(df_since_2023_sales, df_current)
+        show_sales_wheeler_analysis(
+            get_monthly_sales(START_2023_ISO), get_monthly_sales(sel_start, sel_end)
+        )
 
         # Cuentas por Cobrar (All clients)
-        df_cxc_raw = get_cta_por_cobrar_raw()
-        if not df_cxc_raw.empty:
-            df_cxc_ytd = df_cxc_raw[df_cxc_raw["Fecha"].dt.year == current_year]
-            if new_month == "YTD":
-                df_cxc_selected = pd.DataFrame()
-            else:
-                df_cxc_selected = df_cxc_raw[
-                    (df_cxc_raw["Fecha"].dt.year == new_year)
-                    & (df_cxc_raw["Fecha"].dt.month == new_month)
-                ]
+        if not df_cxc_ytd.empty:
             show_cta_por_cobrar_wheeler_analysis(df_cxc_ytd, df_cxc_selected)
 
         # Stop here—skip client-specific section
@@ -292,50 +337,30 @@ def show_clients_view():
 
     # === Client Details ===
     if selected_client and selected_client != "All":  # 🔹 Prevent running for "All"
-        df_client = df_sales[df_sales["RznSocial"] == selected_client].copy()
-        df_client.sort_values("Fecha", ascending=False, inplace=True)
+        ruts = (
+            df_clients.loc[df_clients["RznSocial"] == selected_client, "Rut"]
+            .dropna()
+            .tolist()
+        )
 
         # === Last 3 Purchases ===
         st.markdown(f"### 🧾 Últimas 3 Compras — {selected_client}")
 
-        latest_folios = (
-            df_client.sort_values("Fecha", ascending=False)["Folio"]
-            .drop_duplicates()
-            .head(3)
-            .tolist()
-        )
-
-        df_recent = df_client[df_client["Folio"].isin(latest_folios)].copy()
-        df_recent["Fecha"] = pd.to_datetime(df_recent["Fecha"], errors="coerce")
-
-        product_col = "Descripcion" if "Descripcion" in df_recent.columns else None
-        if product_col is None:
-            for c in ["DescripcionDetallada", "NombreProducto"]:
-                if c in df_recent.columns:
-                    product_col = c
-                    break
-
-        if product_col:
-            df_recent_products = (
-                df_recent.sort_values(["Fecha", "Folio"])
-                .groupby("Folio", as_index=False)
-                .agg(
-                    Fecha=("Fecha", lambda s: s.max().date()),
-                    Total=("Total", "sum"),
-                    Productos=(
-                        product_col,
-                        lambda s: ", ".join(
-                            dict.fromkeys([str(x) for x in s.dropna().tolist()])
-                        ),
-                    ),
-                )
-            )
-        else:
-            df_recent_products = df_recent.groupby("Folio", as_index=False).agg(
+        df_recent = get_recent_purchases(ruts, limit=3)
+        df_recent_products = (
+            df_recent.sort_values(["Fecha", "Folio"])
+            .groupby("Folio", as_index=False)
+            .agg(
                 Fecha=("Fecha", lambda s: s.max().date()),
                 Total=("Total", "sum"),
+                Productos=(
+                    "Descripcion",
+                    lambda s: ", ".join(
+                        dict.fromkeys([str(x) for x in s.dropna().tolist()])
+                    ),
+                ),
             )
-            df_recent_products["Productos"] = "(sin descripción)"
+        )
 
         df_recent_products = df_recent_products.sort_values("Fecha", ascending=False)
         df_recent_products["Total"] = df_recent_products["Total"].apply(
@@ -348,34 +373,15 @@ def show_clients_view():
         )
 
         # === Client KPIs ===
-        df_client_sel = df_current[df_current["RznSocial"] == selected_client]
-        df_client_ytd = df_since_2023_sales[
-            df_since_2023_sales["RznSocial"] == selected_client
-        ]
-        df_client_prev = df_previous[df_previous["RznSocial"] == selected_client]
-
-        rut_cliente = (
-            df_client_sel["Rut"].iloc[0]
-            if "Rut" in df_client_sel.columns and not df_client_sel.empty
-            else None
-        )
-        df_client_pending = (
-            df_pending[df_pending["Rut"] == rut_cliente]
-            if rut_cliente
-            else pd.DataFrame(columns=["SaldoTotal", "FacturasPendientes"])
-        )
-        df_client_pending_ytd = (
-            df_pending_ytd[df_pending_ytd["Rut"] == rut_cliente]
-            if rut_cliente
-            else pd.DataFrame(columns=["SaldoTotal", "FacturasPendientes"])
+        client_sel = get_sales_summary(sel_start, sel_end, ruts)
+        client_ytd = get_sales_summary(START_2023_ISO, ruts=ruts)
+        client_prev = get_sales_summary(prev_start, prev_end, ruts)
+        client_pending, client_pending_ytd = get_cta_por_cobrar(
+            year=new_year, month=new_selected_month, ruts=ruts
         )
 
-        kpi_sel = get_kpis(
-            df_client_sel, df_client_prev, df_client_pending, df_client_pending_ytd
-        )
-        kpi_ytd = get_kpis(
-            df_client_ytd, df_client_prev, df_client_pending, df_client_pending_ytd
-        )
+        kpi_sel = get_kpis(client_sel, client_prev, client_pending, client_pending_ytd)
+        kpi_ytd = get_kpis(client_ytd, client_prev, client_pending, client_pending_ytd)
 
         st.markdown(f"### 📈 Desempeño del Cliente — {new_year}")
         c1, c2, c3, c4, c5 = st.columns(5)
@@ -407,18 +413,12 @@ def show_clients_view():
         st.divider()
 
         # === Wheeler-style charts ===
-        show_sales_wheeler_analysis(df_client_ytd, df_client_sel)
-
-        df_cxc_raw = get_cta_por_cobrar_raw()
-        if not df_cxc_raw.empty:
-            df_cxc_ytd = df_cxc_raw[df_cxc_raw["Fecha"].dt.year == current_year]
-            if new_month == "YTD":
-                df_cxc_selected = pd.DataFrame()
-            else:
-                df_cxc_selected = df_cxc_raw[
-                    (df_cxc_raw["Fecha"].dt.year == new_year)
-                    & (df_cxc_raw["Fecha"].dt.month == new_month)
-                ]
+        show_sales_wheeler_analysis(
+            get_monthly_sales(START_2023_ISO, ruts=ruts),
+            get_monthly_sales(sel_start, sel_end, ruts),
+        )
+
+        if not df_cxc_ytd.empty:
             show_cta_por_cobrar_wheeler_analysis(df_cxc_ytd, df_cxc_selected)
 
 
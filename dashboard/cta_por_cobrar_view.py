@@ -1,15 +1,10 @@
 # === dashboard/cta_por_cobrar_view.py ===
-import sqlite3
 from datetime import datetime
-from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
-
-
-# === Paths ===
-DB_PATH = Path(__file__).parent.parent / "data" / "vitroscience.db"
+from dashboard.utils.db_utils import DB_PATH, load_cuentas_por_cobrar, read_sql
 
 
 def show_cta_cobrar():
@@ -22,22 +17,13 @@ def show_cta_cobrar():
         )
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql("SELECT * FROM cuentas_por_cobrar;", conn)
+    # === Load (cached until the DB changes; types already converted) ===
+    df = load_cuentas_por_cobrar()
 
     if df.empty:
         st.warning("⚠️ No se encontraron registros de cuentas por cobrar.")
-        conn.close()
         return
 
-    # === Convert types ===
-    for col in ["Saldo", "Total", "TotalCP"]:
-        df[col] = (
-            df[col].astype(str).str.replace(",", "").replace("", "0").astype(float)
-        )
-    for col in ["Fecha", "FechaVencimiento"]:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
-
     # === Filtros ===
     st.sidebar.header("🔍 Filtros")
     vendedores = ["Todos"] + sorted(df["NombreVendedor"].dropna().unique().tolist())
@@ -121,14 +107,11 @@ def show_cta_cobrar():
     st.subheader("🏆 Ranking de Clientes por Tiempo Promedio de Pago")
 
     try:
-        df_hist = pd.read_sql(
-            "SELECT * FROM cuentas_por_cobrar_history WHERE status='paid';", conn
+        df_hist = read_sql(
+            "SELECT * FROM cuentas_por_cobrar_history WHERE status='paid';",
+            parse_dates=["Fecha", "last_updated"],
         )
         if not df_hist.empty:
-            df_hist["Fecha"] = pd.to_datetime(df_hist["Fecha"], errors="coerce")
-            df_hist["last_updated"] = pd.to_datetime(
-                df_hist["last_updated"], errors="coerce"
-            )
             df_hist["dias_pago"] = (df_hist["last_updated"] - df_hist["Fecha"]).dt.days
 
             ranking = (
@@ -170,9 +153,6 @@ def show_cta_cobrar():
     except Exception as e:
         st.error(f"❌ Error cargando análisis Wheeler: {e}")
 
-    finally:
-        conn.close()
-
     st.markdown("---")
     st.caption(
         "📊 Datos desde cuentas_por_cobrar y cuentas_por_cobrar_history en vitroscience.db."
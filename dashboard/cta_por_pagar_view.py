@@ -1,6 +1,6 @@
 # dashboard/cta_por_cobrar_view.py
 import streamlit as st
-from utils.db_utils import load_table
+from dashboard.utils.db_utils import load_table
 
 def show_cta_pagar():
     st.header("💰 Cuentas por Pagar — Dashboard")
@@ -1,5 +1,5 @@
 import streamlit as st
-from utils.db_utils import load_table
+from dashboard.utils.db_utils import load_table
 
 def show_inventario():
     st.header("📦 Inventario — Stock Overview")
@@ -1,13 +1,10 @@
 # === dashboard/tabs/cta_por_cobrar_analysis_tab.py ===
-import sqlite3
 from datetime import datetime
-from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
-# === Paths ===
-DB_PATH = Path(__file__).parent.parent.parent.parent / "data" / "vitroscience.db"
+from dashboard.utils.db_utils import DB_PATH, load_cuentas_por_cobrar, read_sql
 
 
 def show_cta_por_cobrar_analysis():
@@ -19,21 +16,12 @@ def show_cta_por_cobrar_analysis():
         st.error("❌ Database not found. Please run the data pipeline first.")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql("SELECT * FROM cuentas_por_cobrar;", conn)
+    # Cached until the DB changes; numeric and date columns already converted
+    df = load_cuentas_por_cobrar()
     if df.empty:
         st.warning("⚠️ No outstanding data found.")
-        conn.close()
         return
 
-    # Convert numeric and date columns
-    for col in ["Saldo", "Total", "TotalCP"]:
-        df[col] = (
-            df[col].astype(str).str.replace(",", "").replace("", "0").astype(float)
-        )
-    for col in ["Fecha", "FechaVencimiento"]:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
-
     # === Filters ===
     st.sidebar.header("🔍 Filtros")
     vendedores = ["Todos"] + sorted(df["NombreVendedor"].dropna().unique().tolist())
@@ -116,14 +104,11 @@ def show_cta_por_cobrar_analysis():
     st.subheader("🏆 Ranking Histórico por Tiempo de Pago")
 
     try:
-        df_hist = pd.read_sql(
-            "SELECT * FROM cuentas_por_cobrar_history WHERE status='paid';", conn
+        df_hist = read_sql(
+            "SELECT * FROM cuentas_por_cobrar_history WHERE status='paid';",
+            parse_dates=["Fecha", "last_updated"],
         )
         if not df_hist.empty:
-            df_hist["Fecha"] = pd.to_datetime(df_hist["Fecha"], errors="coerce")
-            df_hist["last_updated"] = pd.to_datetime(
-                df_hist["last_updated"], errors="coerce"
-            )
             df_hist["dias_pago"] = (df_hist["last_updated"] - df_hist["Fecha"]).dt.days
 
             ranking = (
@@ -165,9 +150,6 @@ def show_cta_por_cobrar_analysis():
     except Exception as e:
         st.error(f"❌ Wheeler section error: {e}")
 
-    finally:
-        conn.close()
-
     st.markdown("---")
     st.caption(
         "📊 Data source: `cuentas_por_cobrar` and `cuentas_por_cobrar_history` in vitroscience.db."
@@ -1,5 +1,4 @@
 # === dashboard/tabs/sales_analysis_tab.py ===
-import sqlite3
 import subprocess
 import sys
 from calendar import monthrange
@@ -10,6 +9,7 @@ import pandas as pd
 import streamlit as st
 
 from dashboard.tabs.statistics.sales_wheeler_analysis import show_sales_wheeler_analysis
+from dashboard.utils.db_utils import read_sql
 
 # === PATH SETUP ===
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent  # points to VS_KAME_APP
@@ -95,21 +95,24 @@ def _previous_period_for_comparison(start, end, label):
     return prev_start, prev_end, compare_label
 
 
-def _query_sum(conn, start, end, column):
+def _query_sum(start, end, column):
     effective_start = max(start, MIN_ALLOWED_DATE)
     if end < effective_start:
         return 0.0
+    # Daily rollup (pipeline/ventas_rollups.py): PK range scan on FechaISO
     q = f"""
         SELECT SUM({column}) AS total_val
-        FROM ventas_enriched_product
-        WHERE DATE(Fecha) BETWEEN DATE(?) AND DATE(?)
-          AND DATE(Fecha) >= DATE(?)
+        FROM ventas_daily_rollup
+        WHERE FechaISO BETWEEN ? AND ?
     """
-    df = pd.read_sql(q, conn, params=(
-        effective_start.strftime("%Y-%m-%d"),
-        end.strftime("%Y-%m-%d"),
-        MIN_ALLOWED_DATE.strftime("%Y-%m-%d"),
-    ))
+    try:
+        df = read_sql(q, params=(
+            effective_start.strftime("%Y-%m-%d"),
+            end.strftime("%Y-%m-%d"),
+        ))
+    except pd.errors.DatabaseError:
+        st.warning("⚠️ Sales rollups not found — run the sales pipeline once to build them.")
+        return 0.0
     val = df["total_val"].iloc[0]
     return float(val) if pd.notna(val) else 0.0
 
@@ -198,15 +201,11 @@ def show_sales_analysis():
     ytd_start = pd.Timestamp(year, 1, 1)
     ytd_end = sel_end
 
-    # === Query Data ===
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        curr_total = _query_sum(conn, sel_start, sel_end, "Total")
-        prev_total = _query_sum(conn, prev_start, prev_end, "Total") if prev_start is not None else None
-        curr_gross_rev = _query_sum(conn, sel_start, sel_end, "MargenContrib")
-        ytd_sales = _query_sum(conn, ytd_start, ytd_end, "Total")
-    finally:
-        conn.close()
+    # === Query Data (cached until the DB changes) ===
+    curr_total = _query_sum(sel_start, sel_end, "Total")
+    prev_total = _query_sum(prev_start, prev_end, "Total") if prev_start is not None else None
+    curr_gross_rev = _query_sum(sel_start, sel_end, "MargenContrib")
+    ytd_sales = _query_sum(ytd_start, ytd_end, "Total")
 
     with col_sales:
         st.subheader("💰 Total Sales")
@@ -1,12 +1,9 @@
 # === dashboard/tabs/statistics/cta_por_cobrar_wheeler_analysis.py ===
-import sqlite3
-from pathlib import Path
 import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
 
-# === Path ===
-DB_PATH = Path(__file__).parent.parent.parent.parent / "data" / "vitroscience.db"
+from dashboard.utils.db_utils import DB_PATH, read_sql
 
 
 def get_monthly_cta_por_cobrar():
@@ -14,47 +11,32 @@ def get_monthly_cta_por_cobrar():
     Aggregate monthly:
     - Total pending balance (sum of Saldo)
     - Count of outstanding invoices
-    using cuentas_por_cobrar_history snapshots.
+    as of the last CxC run of each month, reconstructed from the change
+    events (view cuentas_por_cobrar_monthly).
     """
     if not DB_PATH.exists():
         st.error(f"❌ Database not found at {DB_PATH}")
         return pd.DataFrame()
 
     try:
-        conn = sqlite3.connect(DB_PATH)
         query = """
-            SELECT snapshot_date, Saldo
-            FROM cuentas_por_cobrar_history
-            WHERE Saldo IS NOT NULL AND TRIM(Saldo) != '';
+            SELECT Mes, TotalPendiente, FacturasPendientes
+            FROM cuentas_por_cobrar_monthly
+            ORDER BY Mes;
         """
-        df = pd.read_sql(query, conn)
-        conn.close()
+        df_monthly = read_sql(query)
     except Exception as e:
         st.error(f"❌ SQL read error: {e}")
         return pd.DataFrame()
 
-    if df.empty:
-        st.warning("⚠️ No data retrieved from cuentas_por_cobrar_history.")
+    if df_monthly.empty:
+        st.warning("⚠️ No data retrieved from cuentas_por_cobrar_monthly.")
         return pd.DataFrame()
 
-    # Clean and convert
-    df["Saldo"] = (
-        df["Saldo"].astype(str).str.replace(",", "").replace("", "0").astype(float)
-    )
-    df["snapshot_date"] = pd.to_datetime(df["snapshot_date"], errors="coerce")
-
-    # Aggregate by month
-    df_monthly = (
-        df.groupby(df["snapshot_date"].dt.to_period("M"))
-        .agg(
-            TotalPendiente=("Saldo", "sum"),
-            FacturasPendientes=("Saldo", "count"),
-        )
-        .reset_index()
-    )
-    df_monthly["Fecha"] = df_monthly["snapshot_date"].dt.to_timestamp()
+    df_monthly["TotalPendiente"] = df_monthly["TotalPendiente"].astype(float)
+    df_monthly["Fecha"] = pd.to_datetime(df_monthly["Mes"] + "-01")
 
-    st.caption(f"📦 Loaded {len(df):,} invoice records from history for Wheeler analysis.")
+    st.caption(f"📦 Loaded {len(df_monthly):,} monthly CxC snapshots for Wheeler analysis.")
     st.dataframe(df_monthly.head(), use_container_width=True)
     return df_monthly
 
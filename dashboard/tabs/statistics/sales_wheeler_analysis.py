@@ -1,13 +1,9 @@
 # === dashboard/tabs/statistics/sales_wheeler_analysis.py ===
-import sqlite3
-from pathlib import Path
-
 import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
 
-# === Path ===
-DB_PATH = Path(__file__).parent.parent.parent.parent / "data" / "vitroscience.db"
+from dashboard.utils.db_utils import DB_PATH, read_sql
 
 
 def get_monthly_sales():
@@ -16,21 +12,21 @@ def get_monthly_sales():
         st.error(f"❌ Database not found at {DB_PATH}")
         return pd.DataFrame()
 
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql(
-        "SELECT Fecha, Total, MargenContrib FROM ventas_enriched_product;", conn
-    )
-    conn.close()
-
-    df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-    df = df.dropna(subset=["Fecha"])
+    # Monthly rollup (pipeline/ventas_rollups.py): one row per month × Unegocio
+    try:
+        df_monthly = read_sql(
+            """
+            SELECT Mes, SUM(Total) AS Total, SUM(MargenContrib) AS MargenContrib
+            FROM ventas_monthly_rollup
+            GROUP BY Mes
+            ORDER BY Mes;
+            """
+        )
+    except pd.errors.DatabaseError:
+        st.warning("⚠️ Sales rollups not found — run the sales pipeline once to build them.")
+        return pd.DataFrame()
 
-    df_monthly = (
-        df.groupby(df["Fecha"].dt.to_period("M"))
-        .agg({"Total": "sum", "MargenContrib": "sum"})
-        .reset_index()
-    )
-    df_monthly["Fecha"] = df_monthly["Fecha"].dt.to_timestamp()
+    df_monthly.insert(0, "Fecha", pd.to_datetime(df_monthly.pop("Mes") + "-01"))
     return df_monthly
 
 
@@ -1,15 +1,103 @@
-import sqlite3
-import pandas as pd
+# === dashboard/utils/db_utils.py ===
+"""
+Shared, cached data-access layer for the dashboard.
+
+- Every read goes through `read_sql`, cached with `st.cache_data`.
+- The cache key includes `db_version()` (mtime + size of the DB and its
+  -wal file), so widget reruns never touch SQLite, and the first rerun
+  after the pipeline writes picks up the new data automatically.
+- Connections are read-only (db.connect), so reads never wait on a job.
+- Loaders that post-process a table (e.g. `load_cuentas_por_cobrar`)
+  cache the converted frame too, keyed the same way.
+- `db_path=None` means the module-level DB_PATH, read at call time (so a
+  caller such as the benchmarks can point the whole layer elsewhere).
+"""
+
 from pathlib import Path
 
-DB_PATH = Path(__file__).parent.parent / "data" / "vitroscience.db"
+import pandas as pd
+import streamlit as st
+
+from db import connect
+from pipeline.dtypes import apply_category_dtypes
+
+DB_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "vitroscience.db"
+
+
+def _stat_key(path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def db_version(db_path=None):
+    """
+    Cheap change marker for the DB: (mtime_ns, size) of the file and of its
+    -wal file (in WAL mode commits land there until a checkpoint), or None
+    if the DB is missing.
+    """
+    path = Path(db_path or DB_PATH)
+    main = _stat_key(path)
+    if main is None:
+        return None
+    return main + (_stat_key(path.with_name(path.name + "-wal")) or ())
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
 
-def load_table(table_name: str):
-    conn = get_connection()
-    df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-    conn.close()
+def get_connection(db_path=None):
+    """Read-only connection (see db.py): never blocks or is blocked by pipeline writes."""
+    return connect(db_path or DB_PATH, read_only=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _read_sql_cached(query, params, parse_dates, db_path, version):
+    # `version` is only part of the cache key.
+    conn = get_connection(db_path)
+    try:
+        df = pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+    for col in parse_dates or ():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return apply_category_dtypes(df)
+
+
+def read_sql(query, params=(), parse_dates=None, db_path=None):
+    """
+    Run a read-only query through the cache.
+    - `params` are bound parameters (tuple), part of the cache key.
+    - `parse_dates` lists columns converted with pd.to_datetime once, at load.
+    """
+    db_path = db_path or DB_PATH
+    return _read_sql_cached(
+        query,
+        tuple(params),
+        tuple(parse_dates) if parse_dates else None,
+        str(db_path),
+        db_version(db_path),
+    )
+
+
+def load_table(table_name: str, parse_dates=None):
+    return read_sql(f"SELECT * FROM {table_name}", parse_dates=parse_dates)
+
+
+@st.cache_data(show_spinner=False)
+def _load_cuentas_por_cobrar_cached(db_path, version):
+    df = _read_sql_cached(
+        "SELECT * FROM cuentas_por_cobrar;", (), ("Fecha", "FechaVencimiento"), db_path, version
+    )
+    for col in ["Saldo", "Total", "TotalCP"]:
+        df[col] = (
+            df[col].astype(str).str.replace(",", "").replace("", "0").astype(float)
+        )
     return df
-# End of file dashboard/utils/db_utils.py
\ No newline at end of file
+
+
+def load_cuentas_por_cobrar(db_path=None):
+    """cuentas_por_cobrar with numeric amounts and parsed dates (shared by the CxC views)."""
+    db_path = db_path or DB_PATH
+    return _load_cuentas_por_cobrar_cached(str(db_path), db_version(db_path))
+# End of file dashboard/utils/db_utils.py
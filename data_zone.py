@@ -0,0 +1,250 @@
+# === data_zone.py ===
+"""
+Columnar Parquet data zone for pipeline intermediates.
+
+Layout: data/lake/{zone}/{dataset}/{partition}.parquet
+- zone:      "raw" (API output, json_normalize'd) or "clean" (cleaned/enriched)
+- dataset:   e.g. "ventas", "ventas_enriched_product", "cuentas_por_cobrar"
+- partition: the date window or period the file covers, e.g.
+             "2024-01-01_to_2024-01-31", "2024", "2025-10-16"
+
+Parquet keeps dtypes (no Folio ".0" repairs on re-read), compresses with
+zstd and lets readers pull only the columns they need.
+ZoneWriter streams record batches into a partition with a fixed schema,
+so large fetches never have to be held in memory.
+Set VS_DATA_LAKE to move the lake elsewhere.
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+LAKE_DIR = Path(os.getenv("VS_DATA_LAKE", "data/lake"))
+COMPRESSION = "zstd"
+
+
+def zone_path(zone, dataset, partition):
+    """Path of one partition file."""
+    return LAKE_DIR / zone / dataset / f"{partition}.parquet"
+
+
+def _arrow_safe(df):
+    """
+    Raw API columns can mix ints and strings across pages; Arrow needs one
+    type per column, so such object columns are stored as strings (nulls kept).
+    """
+    mixed = [
+        col
+        for col in df.columns
+        if df[col].dtype == object
+        and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed")
+    ]
+    if not mixed:
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def write_zone(df, zone, dataset, partition):
+    """Write `df` as one Parquet partition (atomic replace). Returns the path."""
+    path = zone_path(zone, dataset, partition)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    _arrow_safe(df).to_parquet(tmp, index=False, compression=COMPRESSION)
+    os.replace(tmp, path)
+    print(f"💾 Saved {len(df):,} rows → {path}")
+    return path
+
+
+def arrow_schema(df):
+    """
+    Arrow schema for streaming frames shaped like `df` (e.g. its first chunk).
+    All-null columns become strings so later chunks with values still fit.
+    Categoricals become dictionary<int32, string> (any number of categories).
+    """
+    schema = pa.Schema.from_pandas(_arrow_safe(df), preserve_index=False)
+    fields = []
+    for f in schema:
+        if pa.types.is_null(f.type):
+            f = pa.field(f.name, pa.string())
+        elif pa.types.is_dictionary(f.type):
+            f = pa.field(f.name, pa.dictionary(pa.int32(), pa.string()))
+        fields.append(f)
+    return pa.schema(fields)
+
+
+class ZoneWriter:
+    """
+    Append record batches to one partition with a fixed Arrow schema.
+
+    - write() takes a list of dicts (API items), a DataFrame or Arrow batch; fields missing
+      from a batch are null, fields not in the schema are dropped (reported once)
+    - dedupe=True skips rows whose content hash was already written
+    - The file is written to a .tmp and moved into place on close(); on an
+      exception inside `with` (or abort()) the partial file is discarded
+    """
+
+    def __init__(self, zone, dataset, partition, schema, dedupe=False):
+        self.path = zone_path(zone, dataset, partition)
+        self.schema = schema
+        self.rows = 0
+        self.duplicates = 0
+        self._seen = set() if dedupe else None
+        self._dropped = set()
+        self._done = False
+        self._tmp = self.path.with_suffix(".parquet.tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = pq.ParquetWriter(self._tmp, schema, compression=COMPRESSION)
+
+    def _to_table(self, batch):
+        if isinstance(batch, (pa.RecordBatch, pa.Table)):
+            if batch.schema.equals(self.schema):
+                return pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+            df = batch.to_pandas()
+        elif isinstance(batch, pd.DataFrame):
+            df = batch
+        else:
+            try:
+                return pa.Table.from_pylist(batch, schema=self.schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df = pd.DataFrame(batch)
+        # Mixed-type batch: coerce column by column to the schema
+        df = df.reindex(columns=self.schema.names)
+        for field in self.schema:
+            col = df[field.name]
+            if pa.types.is_dictionary(field.type):
+                df[field.name] = col.astype(str).where(col.notna()).astype("category")
+            elif isinstance(col.dtype, pd.CategoricalDtype):
+                df[field.name] = col.astype(object)
+                col = df[field.name]
+            if pa.types.is_string(field.type):
+                df[field.name] = col.where(col.isna(), col.astype(str))
+            elif pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+                df[field.name] = pd.to_numeric(col, errors="coerce")
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False, safe=False)
+
+    def _warn_extra(self, batch):
+        if not len(batch):
+            return
+        if isinstance(batch, (pa.RecordBatch, pa.Table)):
+            columns = batch.schema.names
+        elif isinstance(batch, pd.DataFrame):
+            columns = batch.columns
+        else:
+            columns = batch[0].keys()
+        extra = set(columns) - set(self.schema.names) - self._dropped
+        if extra:
+            self._dropped |= extra
+            print(f"⚠️ {self.path.name}: fields not in schema dropped → {', '.join(sorted(extra))}")
+
+    def write(self, batch):
+        """Append one batch. Returns the number of rows written."""
+        if batch is None or not len(batch):
+            return 0
+        self._warn_extra(batch)
+        table = self._to_table(batch)
+        if self._seen is not None:
+            hashes = pd.util.hash_pandas_object(table.to_pandas(), index=False).to_numpy()
+            keep = []
+            for i, h in enumerate(hashes.tolist()):
+                if h not in self._seen:
+                    self._seen.add(h)
+                    keep.append(i)
+            self.duplicates += len(hashes) - len(keep)
+            if len(keep) < len(hashes):
+                table = table.take(keep)
+        if table.num_rows:
+            self._writer.write_table(table)
+            self.rows += table.num_rows
+        return table.num_rows
+
+    def close(self):
+        """Finish the file and move it into place. Returns the path."""
+        if self._done:
+            return self.path
+        self._done = True
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+        print(f"💾 Streamed {self.rows:,} rows → {self.path}")
+        return self.path
+
+    def abort(self):
+        """Discard the partial file (nothing is moved into place)."""
+        if self._done:
+            return
+        self._done = True
+        self._writer.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def iter_zone_batches(zone, dataset, partition, batch_size=65_536, columns=None):
+    """Yield one partition as Arrow record batches (bounded memory)."""
+    path = zone_path(zone, dataset, partition)
+    if path.exists():
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+
+
+def list_partitions(zone, dataset):
+    """Partition names present for a dataset, sorted."""
+    folder = LAKE_DIR / zone / dataset
+    if not folder.exists():
+        return []
+    return sorted(p.stem for p in folder.glob("*.parquet"))
+
+
+def read_zone(zone, dataset, partition=None, columns=None):
+    """
+    Read one partition, or every partition of the dataset (in name order)
+    when `partition` is None. Returns None if nothing is stored.
+    """
+    partitions = [partition] if partition else list_partitions(zone, dataset)
+    frames = [
+        pd.read_parquet(zone_path(zone, dataset, p), columns=columns)
+        for p in partitions
+        if zone_path(zone, dataset, p).exists()
+    ]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def read_table(path, dtype=None):
+    """
+    Read a .parquet or .csv file by extension (for CLI/override paths).
+    dtype=str mirrors pd.read_csv(dtype=str) for Parquet too: values become
+    strings, nulls stay NaN.
+    """
+    path = Path(path)
+    if path.suffix != ".parquet":
+        return pd.read_csv(path, dtype=dtype)
+    df = pd.read_parquet(path)
+    if dtype is str:
+        df = df.astype(object).where(df.isna(), df.astype(str))
+    return df
+
+
+def write_table(df, path, encoding="utf-8-sig"):
+    """Write a .parquet or .csv file by extension (`encoding` is CSV-only)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.name.endswith((".parquet", ".parquet.tmp")):
+        _arrow_safe(df).to_parquet(path, index=False, compression=COMPRESSION)
+    else:
+        df.to_csv(path, index=False, encoding=encoding)
+    return path
+# === END data_zone.py ===
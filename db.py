@@ -0,0 +1,58 @@
+# === db.py ===
+"""
+Single SQLite connection factory for data/vitroscience.db.
+
+Every writer (pipeline, CxC jobs, fetch ledger) and reader (dashboard,
+notifications) opens the database through `connect()` so they all share
+the same settings:
+- journal_mode=WAL: readers keep reading their snapshot while a job writes
+  (only writers wait for each other)
+- synchronous=NORMAL: safe under WAL, one fsync per checkpoint instead of
+  per commit
+- mmap_size / cache_size: larger page cache, memory-mapped reads
+- busy_timeout: wait for a concurrent writer instead of failing
+  with "database is locked"
+- read_only=True opens a `file:...?mode=ro` URI (dashboard / reports),
+  so a reader can never take a write lock
+
+Tune with VS_DB_PATH, VS_DB_BUSY_TIMEOUT_MS, VS_DB_MMAP_MB, VS_DB_CACHE_MB.
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(os.getenv("VS_DB_PATH", "data/vitroscience.db"))
+BUSY_TIMEOUT_MS = int(os.getenv("VS_DB_BUSY_TIMEOUT_MS", "30000"))
+MMAP_MB = int(os.getenv("VS_DB_MMAP_MB", "256"))
+CACHE_MB = int(os.getenv("VS_DB_CACHE_MB", "64"))
+
+
+def _apply_pragmas(conn, read_only):
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+    if not read_only:
+        # Persistent in the file; only a writer can switch the journal mode.
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute(f"PRAGMA mmap_size={MMAP_MB * 1024 * 1024};")
+    # Negative cache_size = KiB instead of pages
+    conn.execute(f"PRAGMA cache_size={-CACHE_MB * 1024};")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+
+
+def connect(db_path=DB_PATH, read_only=False):
+    """
+    Open the database with the shared pragmas.
+    - read_only=False: creates the parent directory (and the file) if needed
+    - read_only=True: the file must exist (sqlite3.OperationalError otherwise)
+    """
+    path = Path(db_path)
+    timeout = BUSY_TIMEOUT_MS / 1000
+    if read_only:
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=timeout)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=timeout)
+    _apply_pragmas(conn, read_only)
+    return conn
+# === END db.py ===
@@ -0,0 +1,118 @@
+# === fetch_ledger.py ===
+"""
+Progress ledger for windowed KAME fetches (table `fetch_ledger`).
+
+One row per (endpoint, window_start, window_end, page):
+- page >= 1: an individual API page
+- page 0 (WINDOW_PAGE): the window as a whole — `done` only once every page
+  succeeded and the rows were stored
+Status is 'pending', 'done' or 'failed', with row counts and the last error.
+Resume mode reads this to re-fetch only windows that are missing or failed.
+"""
+
+from datetime import datetime
+from pathlib import Path
+
+from db import connect
+
+DB_PATH = Path("data/vitroscience.db")
+LEDGER_TABLE = "fetch_ledger"
+WINDOW_PAGE = 0
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+    endpoint TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('pending', 'done', 'failed')),
+    rows INTEGER,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (endpoint, window_start, window_end, page)
+) WITHOUT ROWID;
+"""
+
+
+def _connect(db_path=DB_PATH):
+    # Worker processes write here concurrently with the pipeline writer.
+    conn = connect(db_path)
+    conn.execute(DDL)
+    return conn
+
+
+def record(endpoint, window_start, window_end, entries, db_path=DB_PATH):
+    """
+    Upsert ledger rows for one window.
+    `entries` is an iterable of (page, status, rows, error).
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [
+        (endpoint, window_start, window_end, page, status, n_rows, error, now)
+        for page, status, n_rows, error in entries
+    ]
+    if not rows:
+        return
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                f"""
+                INSERT INTO {LEDGER_TABLE}
+                    (endpoint, window_start, window_end, page, status, rows, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (endpoint, window_start, window_end, page) DO UPDATE SET
+                    status = excluded.status,
+                    rows = excluded.rows,
+                    error = excluded.error,
+                    attempts = attempts + 1,
+                    updated_at = excluded.updated_at;
+                """,
+                rows,
+            )
+    finally:
+        conn.close()
+
+
+def mark_window(endpoint, window_start, window_end, status, rows=None, error=None, db_path=DB_PATH):
+    """Set the window-level (page 0) status."""
+    record(endpoint, window_start, window_end, [(WINDOW_PAGE, status, rows, error)], db_path)
+
+
+def window_state(endpoint, window_start, window_end, db_path=DB_PATH):
+    """
+    Return (status, rows, updated_at) of a window, or (None, None, None) if
+    never attempted.
+    """
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            f"""
+            SELECT status, rows, updated_at FROM {LEDGER_TABLE}
+            WHERE endpoint = ? AND window_start = ? AND window_end = ? AND page = ?;
+            """,
+            (endpoint, window_start, window_end, WINDOW_PAGE),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row if row else (None, None, None)
+
+
+def failed_windows(endpoint, db_path=DB_PATH):
+    """(window_start, window_end, error) of windows not completed, oldest first."""
+    conn = _connect(db_path)
+    try:
+        return conn.execute(
+            f"""
+            SELECT window_start, window_end, error FROM {LEDGER_TABLE}
+            WHERE endpoint = ? AND page = ? AND status != 'done'
+            ORDER BY window_start;
+            """,
+            (endpoint, WINDOW_PAGE),
+        ).fetchall()
+    finally:
+        conn.close()
+# === END fetch_ledger.py ===
@@ -1,14 +1,13 @@
 # === cta por pagar.py (date-windowed final version) ===
 import hashlib
 import os
-import time
 import warnings
 from datetime import datetime, timedelta
 
 import pandas as pd
-import requests
 
-from kame_api import get_token as get_access_token
+from kame_async import fetch_windows, resolve_async_mode
+from kame_client import IncompleteFetchError, get_client
 
 warnings.filterwarnings("ignore", category=UserWarning, module="urllib3")
 
@@ -25,8 +24,58 @@ def daterange_chunks(start_date, end_date, days=31):
         start = chunk_end + timedelta(days=1)
 
 
+def _record_id(rec):
+    return rec.get("Id") or rec.get("NumeroDocumento") or hash(frozenset(rec.items()))
+
+
+def fetch_window(start, end, per_page=100):
+    """
+    Fetch every page of one CxP window. Returns the raw records in page order.
+    Raises IncompleteFetchError if a page still fails after the client's
+    retries (a partial window is never returned as if complete).
+    """
+    client = get_client()
+    records, window_ids = [], set()
+    page = 1
+    while True:
+        params = {
+            "page": page,
+            "per_page": per_page,
+            "fechaVencimientoDesde": start,
+            "fechaVencimientoHasta": end,
+        }
+
+        resp = client.get(BASE_URL, params=params)
+        print(f"  🔍 {start} → {end} | Page {page} | HTTP {resp.status_code}")
+
+        if resp.status_code != 200:
+            print(f"  ❌ Error {resp.status_code}: {resp.text}")
+            raise IncompleteFetchError(f"{start} → {end} page {page}: HTTP {resp.status_code}")
+
+        data = resp.json()
+        items = data.get("items") or data.get("data") or []
+        if not items:
+            break
+
+        new_in_page = [rec for rec in items if _record_id(rec) not in window_ids]
+        window_ids.update(_record_id(rec) for rec in new_in_page)
+        records.extend(items)
+
+        # stop if no new data in this window
+        if not new_in_page:
+            break
+
+        page += 1
+
+    return records
+
+
 def get_cuentas_por_pagar(
-    fecha_desde="2020-01-01", fecha_hasta="2025-10-18", per_page=100, chunk_days=31
+    fecha_desde="2020-01-01",
+    fecha_hasta="2025-10-18",
+    per_page=100,
+    chunk_days=31,
+    async_mode=None,
 ):
     """
     ✅ Robust method to fetch *all* CxC using rolling date windows.
@@ -35,59 +84,33 @@ def get_cuentas_por_pagar(
       - Fetches data month by month (or custom days)
       - Deduplicates globally by Id/NumeroDocumento
       - Handles API rate limits and retries
+      - async_mode=True (or KAME_ASYNC_FETCH=1) fetches windows concurrently
+      - Raises IncompleteFetchError if any window failed (never a partial set)
     """
 
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
     all_rows, seen_ids = [], set()
 
-    for start, end in daterange_chunks(fecha_desde, fecha_hasta, chunk_days):
-        print(f"\n🗓️ Fetching CxP for window {start} → {end}")
-        page = 1
-        while True:
-            params = {
-                "page": page,
-                "per_page": per_page,
-                "fechaVencimientoDesde": start,
-                "fechaVencimientoHasta": end,
-            }
-
-            resp = requests.get(BASE_URL, headers=headers, params=params)
-            print(f"  🔍 Page {page} | HTTP {resp.status_code}")
-
-            if resp.status_code == 429:
-                print("  ⚠️ Rate limit hit, waiting 15s...")
-                time.sleep(15)
-                continue
-            if resp.status_code != 200:
-                print(f"  ❌ Error {resp.status_code}: {resp.text}")
-                break
-
-            data = resp.json()
-            items = data.get("items") or data.get("data") or []
-            if not items:
-                break
-
-            new_count = 0
-            for rec in items:
-                rec_id = (
-                    rec.get("Id")
-                    or rec.get("NumeroDocumento")
-                    or hash(frozenset(rec.items()))
-                )
-                if rec_id not in seen_ids:
-                    seen_ids.add(rec_id)
-                    all_rows.append(rec)
-                    new_count += 1
-
-            print(f"  ✅ Added {new_count} new unique records (Total: {len(all_rows)})")
-
-            # stop if no new data in this window
-            if new_count == 0:
-                break
-
-            page += 1
-            time.sleep(0.3)
+    windows = list(daterange_chunks(fecha_desde, fecha_hasta, chunk_days))
+    if resolve_async_mode(async_mode):
+        results = fetch_windows(
+            windows, lambda start, end: fetch_window(start, end, per_page)
+        )
+    else:
+        results = (fetch_window(start, end, per_page) for start, end in windows)
+
+    for (start, end), items in zip(windows, results, strict=True):
+        new_count = 0
+        for rec in items:
+            rec_id = _record_id(rec)
+            if rec_id not in seen_ids:
+                seen_ids.add(rec_id)
+                all_rows.append(rec)
+                new_count += 1
+
+        print(
+            f"🗓️ CxP window {start} → {end}: added {new_count} new unique records "
+            f"(Total: {len(all_rows)})"
+        )
 
     df = pd.DataFrame(all_rows)
     print(f"\n📦 Finished: total unique records = {len(df)}")
@@ -117,7 +140,10 @@ def save_if_changed(df, output_path):
 
 # 🧪 Standalone run
 if __name__ == "__main__":
-    df = get_cuentas_por_pagar()
+    try:
+        df = get_cuentas_por_pagar()
+    except IncompleteFetchError as e:
+        raise SystemExit(f"❌ Incomplete fetch, nothing saved ({e}).") from e
     if not df.empty:
         save_if_changed(df, "test/pagar/raw/cuentas_por_pagar_full.csv")
         print(df.head())
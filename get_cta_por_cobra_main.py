@@ -4,32 +4,41 @@ VitroScience – Automated 'Cuentas por Cobrar' Pipeline
 
 Workflow:
 1️⃣ Fetch all outstanding invoices from KAME API (2023-01-01 → today)
-2️⃣ Save raw data to /test/cobranza/raw
-3️⃣ Clean and format → /test/cobranza/clean
+2️⃣ Save raw data to data/lake/raw/cuentas_por_cobrar (Parquet)
+3️⃣ Clean and format → data/lake/clean/cuentas_por_cobrar (Parquet)
 4️⃣ Save both snapshot + history into SQLite → data/vitroscience.db
+
+An incomplete fetch aborts the run before any file or table is written.
 """
 
 import os
+import sys
 from datetime import datetime
 
 from cobrar.clean_cta_por_cobrar import clean_cta_por_cobrar
 from cobrar.cta_por_cobrar_save_db import save_cta_por_cobrar_to_db
 
 # === Local imports ===
+from data_zone import zone_path
 from get_cta_por_cobrar import get_cuentas_por_cobrar, save_if_changed
+from kame_client import IncompleteFetchError
 
 # === PATHS ===
-RAW_PATH = "test/cobranza/raw/cuentas_por_cobrar_monthly_from_Jan_023.csv"
-CLEAN_PATH = "test/cobranza/clean/cuentas_por_cobrar_clean.csv"
+RAW_PATH = str(zone_path("raw", "cuentas_por_cobrar", "from_2023-01-01"))
+CLEAN_PATH = str(zone_path("clean", "cuentas_por_cobrar", "latest"))
 DB_PATH = "data/vitroscience.db"
 
 
-def run_cta_por_cobrar_pipeline():
+def run_cta_por_cobrar_pipeline(async_mode=None):
     """Run the full CxC baseline + update pipeline."""
     print("🚀 Starting 'Cuentas por Cobrar' pipeline...")
 
     # --- Step 1: Fetch from API ---
-    df_raw = get_cuentas_por_cobrar(fecha_desde="2023-01-01")
+    try:
+        df_raw = get_cuentas_por_cobrar(fecha_desde="2023-01-01", async_mode=async_mode)
+    except IncompleteFetchError as e:
+        print(f"❌ Incomplete fetch ({e}). Exiting without saving.")
+        return
     if df_raw.empty:
         print("⚠️ No data retrieved from API. Exiting.")
         return
@@ -52,5 +61,5 @@ def run_cta_por_cobrar_pipeline():
 
 # === Run directly ===
 if __name__ == "__main__":
-    run_cta_por_cobrar_pipeline()
+    run_cta_por_cobrar_pipeline(async_mode=True if "--async" in sys.argv else None)
 # === END get_cta_cobrar_main.py ===
@@ -1,14 +1,14 @@
 # === get_cta_por_cobrar.py (month-by-month outstanding invoices) ===
 import hashlib
 import os
-import time
 import warnings
 from datetime import datetime, timedelta
 
 import pandas as pd
-import requests
 
-from kame_api import get_token as get_access_token
+from data_zone import write_table, zone_path
+from kame_async import fetch_windows, resolve_async_mode
+from kame_client import IncompleteFetchError, get_client
 
 warnings.filterwarnings("ignore", category=UserWarning, module="urllib3")
 
@@ -26,19 +26,59 @@ def month_range(start_date, end_date):
         start = next_month
 
 
+def fetch_window(start, end, per_page=200):
+    """
+    Fetch every page of one vencimiento window. Returns the raw records in page order.
+    Raises IncompleteFetchError if a page still fails after the client's
+    retries (a partial window is never returned as if complete).
+    """
+    client = get_client()
+    records = []
+    page = 1
+    while True:
+        params = {
+            "page": page,
+            "per_page": per_page,
+            "fechaVencimientoDesde": start,
+            "fechaVencimientoHasta": end,
+        }
+
+        resp = client.get(BASE_URL, params=params)
+        print(f"  🔍 {start} → {end} | Page {page} | HTTP {resp.status_code}")
+
+        if resp.status_code != 200:
+            print(f"  ❌ Error {resp.status_code}: {resp.text}")
+            raise IncompleteFetchError(f"{start} → {end} page {page}: HTTP {resp.status_code}")
+
+        data = resp.json()
+        items = data.get("items") or data.get("data") or []
+        if not items:
+            break
+
+        records.extend(items)
+        if len(items) < per_page:
+            break
+
+        page += 1
+
+    return records
+
+
 def get_cuentas_por_cobrar(
     fecha_desde="2023-01-01",
     fecha_hasta=datetime.today().strftime("%Y-%m-%d"),
     per_page=200,
+    async_mode=None,
 ):
     """
     Fetch all 'Cuentas por Cobrar' (outstanding invoices) month by month.
     ✅ Uses fechaVencimientoDesde/Hasta
     ✅ Deduplicates globally
     ✅ Adds MonthFetched + SnapshotDate
+    ✅ async_mode=True (or KAME_ASYNC_FETCH=1) fetches windows concurrently
+    ❌ Raises IncompleteFetchError if any window failed: a missing window
+       would turn its open invoices into false 'paid' events downstream
     """
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
     all_rows, seen_ids = [], set()
     today_str = datetime.today().strftime("%Y-%m-%d")
 
@@ -46,56 +86,33 @@ def get_cuentas_por_cobrar(
         f"📅 Fetching outstanding invoices month by month from {fecha_desde} → {fecha_hasta}"
     )
 
-    for start, end in month_range(fecha_desde, fecha_hasta):
-        print(f"\n🗓️ Fetching window {start} → {end}")
-        page = 1
-        while True:
-            params = {
-                "page": page,
-                "per_page": per_page,
-                "fechaVencimientoDesde": start,
-                "fechaVencimientoHasta": end,
-            }
-
-            resp = requests.get(BASE_URL, headers=headers, params=params)
-            print(f"  🔍 Page {page} | HTTP {resp.status_code}")
-
-            if resp.status_code == 429:
-                print("  ⚠️ Rate limit hit, waiting 15s...")
-                time.sleep(15)
-                continue
-            if resp.status_code != 200:
-                print(f"  ❌ Error {resp.status_code}: {resp.text}")
-                break
-
-            data = resp.json()
-            items = data.get("items") or data.get("data") or []
-            if not items:
-                break
-
-            new_count = 0
-            for rec in items:
-                rec_id = (
-                    rec.get("Id")
-                    or rec.get("NumeroDocumento")
-                    or hash(frozenset(rec.items()))
-                )
-                if rec_id not in seen_ids:
-                    seen_ids.add(rec_id)
-                    rec["MonthFetched"] = start[:7]
-                    rec["SnapshotDate"] = today_str
-                    all_rows.append(rec)
-                    new_count += 1
-
-            print(
-                f"  ✅ Added {new_count} new unique records (Total so far: {len(all_rows)})"
+    windows = list(month_range(fecha_desde, fecha_hasta))
+    if resolve_async_mode(async_mode):
+        results = fetch_windows(
+            windows, lambda start, end: fetch_window(start, end, per_page)
+        )
+    else:
+        results = (fetch_window(start, end, per_page) for start, end in windows)
+
+    for (start, end), items in zip(windows, results, strict=True):
+        new_count = 0
+        for rec in items:
+            rec_id = (
+                rec.get("Id")
+                or rec.get("NumeroDocumento")
+                or hash(frozenset(rec.items()))
             )
-
-            if len(items) < per_page:
-                break
-
-            page += 1
-            time.sleep(0.3)
+            if rec_id not in seen_ids:
+                seen_ids.add(rec_id)
+                rec["MonthFetched"] = start[:7]
+                rec["SnapshotDate"] = today_str
+                all_rows.append(rec)
+                new_count += 1
+
+        print(
+            f"🗓️ Window {start} → {end}: added {new_count} new unique records "
+            f"(Total so far: {len(all_rows)})"
+        )
 
     df = pd.DataFrame(all_rows)
     print(f"\n📦 Finished fetching {len(df)} total outstanding invoices (as of today).")
@@ -103,10 +120,11 @@ def get_cuentas_por_cobrar(
 
 
 def save_if_changed(df, output_path):
-    """Save CSV only if changed (by comparing SHA-256 hash)."""
+    """Save .parquet/.csv only if changed (by comparing SHA-256 hash)."""
+    output_path = str(output_path)
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     tmp = output_path + ".tmp"
-    df.to_csv(tmp, index=False, encoding="utf-8-sig")
+    write_table(df, tmp)
 
     def file_hash(p):
         with open(p, "rb") as f:
@@ -125,10 +143,12 @@ def save_if_changed(df, output_path):
 
 # === Run directly ===
 if __name__ == "__main__":
-    output_path = "test/cobranza/raw/cuentas_por_cobrar_monthly_from_Jan_023.csv"
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    output_path = zone_path("raw", "cuentas_por_cobrar", "from_2023-01-01")
 
-    df = get_cuentas_por_cobrar(fecha_desde="2023-01-01")
+    try:
+        df = get_cuentas_por_cobrar(fecha_desde="2023-01-01")
+    except IncompleteFetchError as e:
+        raise SystemExit(f"❌ Incomplete fetch, nothing saved ({e}).") from e
     if not df.empty:
         save_if_changed(df, output_path)
         print(f"✅ Saved {len(df)} outstanding invoices → {output_path}")
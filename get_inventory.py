@@ -1,6 +1,5 @@
-import requests
 import pandas as pd
-from kame_api import get_token as get_access_token
+from kame_client import get_client
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="urllib3")
 
@@ -9,13 +8,10 @@ BASE_URL = "https://api.kameone.cl/api/Inventario/getStock"
 
 def get_stock_sample(per_page=100):
     """Fetch 100 stock records from Kame API."""
-    token = get_access_token()
     params = {"page": 1, "per_page": per_page}
-    headers = {"Authorization": f"Bearer {token}",
-               "Content-Type": "application/json"}
 
     print(f"🔍 Fetching {per_page} stock records...")
-    response = requests.get(BASE_URL, headers=headers, params=params)
+    response = get_client().get(BASE_URL, params=params)
     print(f"HTTP Status: {response.status_code}")
 
     if response.status_code != 200:
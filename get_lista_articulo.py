@@ -1,10 +1,9 @@
 # === get_list_articulo.py (final integrated + optimized version) ===
 import os
-import time
 import hashlib
 import pandas as pd
 import requests
-from kame_api import get_token
+from kame_client import get_client
 import clean_list_articulo  # ✅ import the cleaner module
 
 
@@ -55,17 +54,16 @@ def save_if_changed(df: pd.DataFrame, csv_file="data/lista_articulos_full.csv"):
 # -------------------------------------------------------------------
 # 🔁 Fetch, deduplicate, save, and clean full list from KAME API
 # -------------------------------------------------------------------
-def get_lista_articulos(per_page=100, pause_s=0.1, csv_file="data/lista_articulos_full.csv"):
+def get_lista_articulos(per_page=100, csv_file="data/lista_articulos_full.csv"):
     """
     Fetch and clean all artículos from KAME API in one go.
     - per_page: KAME API max = 100
-    - Fetches all pages based on total count
+    - Fetches all pages based on total count (paced by the shared rate limiter)
     - Deduplicates by CodigoArticulo
     - Saves only if data changed
     - Automatically runs cleaner from clean_list_articulo.py
     """
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    client = get_client()
 
     all_rows = []
     page = 1
@@ -76,7 +74,7 @@ def get_lista_articulos(per_page=100, pause_s=0.1, csv_file="data/lista_articulo
         print(f"🔍 Fetching artículos page {page} (per_page={per_page}) ...")
 
         try:
-            resp = requests.get(BASE_URL, headers=headers, params=params, timeout=15)
+            resp = client.get(BASE_URL, params=params)
             resp.raise_for_status()
         except requests.exceptions.RequestException as e:
             print(f"❌ Request failed on page {page}: {e}")
@@ -102,7 +100,6 @@ def get_lista_articulos(per_page=100, pause_s=0.1, csv_file="data/lista_articulo
             break
 
         page += 1
-        time.sleep(pause_s)
 
         if page > 1000:
             print("⚠️ Pagination limit reached — aborting.")
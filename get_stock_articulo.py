@@ -1,4 +1,4 @@
-from kame_api import get_token
+from kame_client import get_client
 import requests
 import pandas as pd
 import os
@@ -10,17 +10,11 @@ def get_stock_articulo(nombre_articulo, csv_file="stock_articulo.csv"):
     and save (or append) to a CSV file.
     """
 
-    token = get_token()
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-
     nombre_articulo_encoded = requests.utils.quote(nombre_articulo, safe='')
     url = f"https://api.kameone.cl/api/Inventario/getStockArticulo/{nombre_articulo_encoded}"
 
     print(f"🔍 Fetching stock for artículo: '{nombre_articulo}' ...")
-    response = requests.get(url, headers=headers)
+    response = get_client().get(url)
 
     if response.status_code != 200:
         print(f"❌ Error {response.status_code}: {response.text}")
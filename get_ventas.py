@@ -1,56 +1,298 @@
-import json
+import math
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
 
 import pandas as pd
+import pyarrow as pa
 import requests
 
-from kame_api import get_token
+import fetch_ledger
+import kame_cache
+from data_zone import ZoneWriter, iter_zone_batches, read_zone, zone_path
+from kame_async import fetch_windows, resolve_async_mode
+from kame_client import IncompleteFetchError, get_client
 
+INFORME_VENTAS_PATH = "Documento/getInformeVentas"
 
-def get_informe_ventas_json(fecha_desde, fecha_hasta, page=1, per_page=100):
+# Upper bound on simultaneous page requests per date window
+MAX_CONCURRENT_PAGES = int(os.getenv("KAME_MAX_CONCURRENT_PAGES", "4"))
+
+# Fixed Arrow schema of the raw zone: one flat record per sales line, in API
+# field order. Amounts/quantities are float64 as the API returns them; the
+# rest is text.
+RAW_VENTAS_NUMERIC = {
+    "Folio",
+    "FactorUnidadEquivalente",
+    "Cantidad",
+    "PrecioUnitario",
+    "Descuento",
+    "PorcDescuento",
+    "Total",
+    "CostoVentaUnitario",
+    "CostoVentaTotal",
+    "MargenContrib",
+    "PorcMargenContrib",
+    "MargenVentasSobreCosto",
+}
+RAW_VENTAS_FIELDS = [
+    "Rut",
+    "RznSocial",
+    "Fecha",
+    "NombreDocumento",
+    "Folio",
+    "NombreSucursal",
+    "MultiDirNombre",
+    "MultiDirDireccion",
+    "MultiDirCiudad",
+    "MultiDirComuna",
+    "MultiDirContacto",
+    "Direccion",
+    "Comuna",
+    "Ciudad",
+    "NombreVendedor",
+    "EsInventariable",
+    "Descripcion",
+    "DescripcionDetallada",
+    "NombreUNegocio",
+    "FamiliaNombre",
+    "SKU",
+    "UnidadMedida",
+    "UnidadEquivalente",
+    "FactorUnidadEquivalente",
+    "Cantidad",
+    "Lote",
+    "FechaVencimientoLote",
+    "Comentario",
+    "PrecioUnitario",
+    "Descuento",
+    "PorcDescuento",
+    "Total",
+    "CostoVentaUnitario",
+    "CostoVentaTotal",
+    "MargenContrib",
+    "PorcMargenContrib",
+    "MargenVentasSobreCosto",
+    "NombreRef1",
+    "FechaRef1",
+    "FolioRef1",
+    "RazonRef1",
+    "NombreRef2",
+    "FechaRef2",
+    "FolioRef2",
+    "RazonRef2",
+    "NombreRef3",
+    "FechaRef3",
+    "FolioRef3",
+    "RazonRef3",
+]
+RAW_VENTAS_SCHEMA = pa.schema(
+    [
+        (name, pa.float64() if name in RAW_VENTAS_NUMERIC else pa.string())
+        for name in RAW_VENTAS_FIELDS
+    ]
+)
+
+
+def _fetch_ventas_page(fecha_desde, fecha_hasta, page, per_page, log=None):
     """
-    Fetch Informe de Ventas from Kame API and return JSON + save raw files for inspection.
+    Fetch a single page of Informe de Ventas. Returns the JSON payload or None.
+    Network errors that survive the client's retries count as a failed page.
+    The outcome is appended to `log` as a ledger entry (page, status, rows, error).
     """
-    token = get_token()
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    params = {
+        "page": page,
+        "per_page": per_page,
+        "fechaDesde": fecha_desde,
+        "fechaHasta": fecha_hasta,
+    }
+    log = log if log is not None else []
+    try:
+        response = get_client().get(INFORME_VENTAS_PATH, params=params)
+    except requests.RequestException as e:
+        print(f"❌ Error on page {page}: {e}")
+        log.append((page, fetch_ledger.FAILED, None, str(e)))
+        return None
+    if response.status_code != 200:
+        print(f"❌ Error on page {page}:", response.status_code, response.text)
+        log.append((page, fetch_ledger.FAILED, None, f"HTTP {response.status_code}"))
+        return None
+    payload = response.json()
+    log.append((page, fetch_ledger.DONE, len(payload.get("items", [])), None))
+    return payload
 
-    url = (
-        "https://api.kameone.cl/api/Documento/getInformeVentas"
-        f"?page={page}&per_page={per_page}"
-        f"&fechaDesde={fecha_desde}&fechaHasta={fecha_hasta}"
-    )
 
-    print(f"🔍 Fetching ventas from {fecha_desde} to {fecha_hasta} ...")
-    response = requests.get(url, headers=headers, timeout=15)
+def _ordered(pool, fetch, pages, max_in_flight):
+    """
+    Submit pages lazily with at most `max_in_flight` outstanding and yield
+    (page, payload) in page order. Pending futures are cancelled on early exit.
+    """
+    pages = iter(pages)
+    pending = deque((p, pool.submit(fetch, p)) for p in islice(pages, max_in_flight))
+    try:
+        while pending:
+            page, future = pending.popleft()
+            payload = future.result()
+            for p in islice(pages, 1):
+                pending.append((p, pool.submit(fetch, p)))
+            yield page, payload
+    finally:
+        for _, future in pending:
+            future.cancel()
 
-    if response.status_code != 200:
-        print("❌ Error:", response.status_code, response.text)
+
+def iter_informe_ventas_pages(
+    fecha_desde, fecha_hasta, per_page=100, max_workers=MAX_CONCURRENT_PAGES
+):
+    """
+    Yield the items of every page of Informe de Ventas for a date window,
+    one page at a time and in page order.
+
+    - Page 1 is fetched first; if it reports `total`, pages 2..last are
+      requested concurrently, otherwise pages are requested until a short
+      page marks the end of the window.
+    - At most 2 × `max_workers` pages are in flight (or buffered) at once,
+      so memory does not grow with the window size.
+    - Raises IncompleteFetchError if any page failed.
+    - Every page outcome is recorded in the fetch ledger.
+    """
+    max_workers = max(1, int(max_workers))
+    log = []
+
+    def fetch(page):
+        return _fetch_ventas_page(fecha_desde, fecha_hasta, page, per_page, log)
+
+    try:
+        first = fetch(1)
+        if first is None:
+            raise IncompleteFetchError(f"page 1 of {fecha_desde} → {fecha_hasta}")
+        items = first.get("items", [])
+        yield items
+        if len(items) < per_page:
+            return
+
+        total = first.get("total")
+        if total:
+            last_page = math.ceil(int(total) / per_page)
+            pages = range(2, last_page + 1)
+            print(f"📑 {total} rows reported → fetching {len(pages)} more page(s)")
+        else:
+            pages = count(2)
+            print(f"📑 Fetching pages until a short page ({max_workers} in parallel)")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for page, payload in _ordered(pool, fetch, pages, 2 * max_workers):
+                if payload is None:
+                    raise IncompleteFetchError(f"page {page} of {fecha_desde} → {fecha_hasta}")
+                items = payload.get("items", [])
+                yield items
+                if not total and len(items) < per_page:
+                    return
+    finally:
+        fetch_ledger.record(INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, log)
+
+
+def fetch_informe_ventas_items(
+    fecha_desde, fecha_hasta, per_page=100, max_workers=MAX_CONCURRENT_PAGES
+):
+    """
+    Fetch every page of a window into one list (in page order), or None if
+    any page failed (a partial window is never returned as if complete).
+    """
+    try:
+        return [
+            item
+            for items in iter_informe_ventas_pages(fecha_desde, fecha_hasta, per_page, max_workers)
+            for item in items
+        ]
+    except IncompleteFetchError:
+        return None
+
+
+def stream_informe_ventas_to_zone(
+    fecha_desde, fecha_hasta, per_page=100, max_workers=MAX_CONCURRENT_PAGES
+):
+    """
+    Stream a window page by page into the raw zone
+    (data/lake/raw/ventas/<desde>_to_<hasta>.parquet) without holding it in
+    memory. Marks the window done/failed in the fetch ledger (page 0).
+    Returns the row count, or None if the fetch was incomplete (nothing kept).
+    """
+    print(f"🔍 Fetching ventas from {fecha_desde} to {fecha_hasta} ...")
+    fetch_ledger.mark_window(
+        INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, fetch_ledger.PENDING
+    )
+    partition = f"{fecha_desde}_to_{fecha_hasta}"
+    try:
+        with ZoneWriter("raw", "ventas", partition, RAW_VENTAS_SCHEMA) as writer:
+            for items in iter_informe_ventas_pages(
+                fecha_desde, fecha_hasta, per_page, max_workers
+            ):
+                writer.write(items)
+            rows = writer.rows
+            if not rows:
+                writer.abort()
+    except IncompleteFetchError as e:
+        print(f"❌ Incomplete fetch for {fecha_desde} → {fecha_hasta}; window skipped ({e}).")
+        fetch_ledger.mark_window(
+            INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, fetch_ledger.FAILED, error=str(e)
+        )
         return None
 
-    data = response.json()
+    if not rows:
+        # Drop the partition of an earlier fetch so its rows are not reused
+        zone_path("raw", "ventas", partition).unlink(missing_ok=True)
+        print(f"⚠️ No sales data found for {fecha_desde} → {fecha_hasta}")
+    fetch_ledger.mark_window(
+        INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, fetch_ledger.DONE, rows=rows
+    )
+    return rows
+
 
-    # Save raw JSON
-    os.makedirs("test/ventas/raw", exist_ok=True)
-    json_path = f"test/ventas/raw/ventas_raw_{fecha_desde}_to_{fecha_hasta}.json"
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Saved raw JSON to {json_path}")
+def get_informe_ventas_json(
+    fecha_desde,
+    fecha_hasta,
+    per_page=100,
+    max_workers=MAX_CONCURRENT_PAGES,
+    save_raw=True,
+):
+    """
+    Fetch Informe de Ventas from Kame API (all pages) and return a DataFrame.
+    With save_raw=True the pages are streamed to the raw Parquet zone
+    (data/lake/raw/ventas/<desde>_to_<hasta>.parquet) and read back.
+    The window is marked done/failed in the fetch ledger (page 0).
+    """
+    if save_raw:
+        rows = stream_informe_ventas_to_zone(fecha_desde, fecha_hasta, per_page, max_workers)
+        if not rows:
+            return None
+        return read_zone("raw", "ventas", f"{fecha_desde}_to_{fecha_hasta}")
 
-    # Convert to DataFrame and save as CSV
-    ventas = data.get("items", [])
+    print(f"🔍 Fetching ventas from {fecha_desde} to {fecha_hasta} ...")
+    fetch_ledger.mark_window(
+        INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, fetch_ledger.PENDING
+    )
+    ventas = fetch_informe_ventas_items(
+        fecha_desde, fecha_hasta, per_page=per_page, max_workers=max_workers
+    )
+    if ventas is None:
+        print(f"❌ Incomplete fetch for {fecha_desde} → {fecha_hasta}; window skipped.")
+        fetch_ledger.mark_window(
+            INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, fetch_ledger.FAILED,
+            error="incomplete fetch (see page rows)",
+        )
+        return None
+
+    fetch_ledger.mark_window(
+        INFORME_VENTAS_PATH, fecha_desde, fecha_hasta, fetch_ledger.DONE, rows=len(ventas)
+    )
     if not ventas:
         print(f"⚠️ No sales data found for {fecha_desde} → {fecha_hasta}")
         return None
 
     df = pd.json_normalize(ventas)
-    csv_path = f"test/ventas/raw/ventas_raw_{fecha_desde}_to_{fecha_hasta}.csv"
-    df.to_csv(csv_path, index=False)
-    print(f"💾 Saved normalized CSV to {csv_path} ({len(df)} rows)")
-
-    print("\n🧩 Columns returned by API:")
-    for col in df.columns:
-        print("  -", col)
-
+    print(f"✅ Fetched {len(df)} rows ({fecha_desde} → {fecha_hasta})")
     return df
 
 
@@ -62,15 +304,8 @@ if __name__ == "__main__":
 from datetime import datetime, timedelta
 
 
-def get_ventas_full_year(year):
-    """
-    Fetch all sales for a given year by looping monthly (31-day chunks).
-    Keeps existing get_informe_ventas_json() intact.
-    """
-    import pandas as pd
-
-    all_dfs = []
-
+def year_windows(year):
+    """Yield the (fecha_desde, fecha_hasta) 31-day chunks covering a year."""
     start = datetime(year, 1, 1)
     end_of_year = datetime(year, 12, 31)
 
@@ -79,24 +314,96 @@ def get_ventas_full_year(year):
         fecha_hasta = (start + timedelta(days=30)).strftime("%Y-%m-%d")
         if datetime.strptime(fecha_hasta, "%Y-%m-%d") > end_of_year:
             fecha_hasta = end_of_year.strftime("%Y-%m-%d")
+        yield fecha_desde, fecha_hasta
+        start += timedelta(days=31)  # move to next month
 
-        print(f"📅 Fetching chunk {fecha_desde} → {fecha_hasta}")
-        df_chunk = get_informe_ventas_json(fecha_desde, fecha_hasta)
-        if df_chunk is not None and not df_chunk.empty:
-            all_dfs.append(df_chunk)
 
-        start += timedelta(days=31)  # move to next month
+def _window_done(fecha_desde, fecha_hasta, final=False):
+    """
+    True if the fetch ledger marks the window done and its rows are on disk
+    (a done window with 0 rows has no partition and needs nothing).
+    - final=True (resume): also require the fetch to have happened on or
+      after the period's close (first day of the month after fecha_hasta);
+      a window fetched while its month was still open may have gained rows
+    """
+    status, rows, updated_at = fetch_ledger.window_state(
+        INFORME_VENTAS_PATH, fecha_desde, fecha_hasta
+    )
+    if status != fetch_ledger.DONE:
+        return False
+    if final:
+        close = kame_cache.period_close({"fechaHasta": fecha_hasta})
+        if close is None or datetime.strptime(updated_at[:10], "%Y-%m-%d").date() < close:
+            return False
+    return rows == 0 or zone_path("raw", "ventas", f"{fecha_desde}_to_{fecha_hasta}").exists()
 
-    if not all_dfs:
-        print(f"⚠️ No sales data found for {year}.")
-        return None
 
-    df_all = pd.concat(all_dfs, ignore_index=True).drop_duplicates()
-    os.makedirs("test/ventas/raw", exist_ok=True)
-    out_path = f"test/ventas/raw/ventas_raw_{year}_full.csv"
-    df_all.to_csv(out_path, index=False)
-    print(f"✅ Combined all chunks — saved {len(df_all)} rows to {out_path}")
-    return df_all
+def _report_failed(year, windows):
+    failed = [window for window in windows if not _window_done(*window)]
+    if failed:
+        print(f"❌ {len(failed)} window(s) of {year} failed and are missing from this run:")
+        for desde, hasta in failed:
+            print(f"   - {desde} → {hasta}")
+        print("   Re-run with resume=True (backfill: --resume) to fetch only these.")
+
+
+def get_ventas_full_year(
+    year,
+    max_workers=MAX_CONCURRENT_PAGES,
+    async_mode=None,
+    resume=False,
+    as_frame=True,
+):
+    """
+    Fetch all sales for a given year by looping monthly (31-day chunks).
+
+    - Each chunk is streamed page by page into its raw zone partition, with
+      up to `max_workers` pages in flight; with async_mode=True (or
+      KAME_ASYNC_FETCH=1) the monthly chunks themselves run concurrently.
+    - The chunk partitions are then streamed, in window order and de-duplicated
+      by row hash, into data/lake/raw/ventas_year/<year>.parquet.
+      Peak memory is a few pages/batches, not the year.
+    - resume=True skips windows the fetch ledger marks done after their
+      period closed; missing, failed or still-open windows are re-fetched.
+    - Returns the year as a DataFrame, or its partition path with
+      as_frame=False (for chunked consumers); None if there is no data.
+    """
+    all_windows = list(year_windows(year))
+    windows = all_windows
+    if resume:
+        windows = [window for window in all_windows if not _window_done(*window, final=True)]
+        print(
+            f"⏩ Resume {year}: {len(all_windows) - len(windows)} window(s) already final, "
+            f"{len(windows)} to fetch"
+        )
+
+    def fetch_chunk(fecha_desde, fecha_hasta):
+        print(f"📅 Fetching chunk {fecha_desde} → {fecha_hasta}")
+        return stream_informe_ventas_to_zone(fecha_desde, fecha_hasta, max_workers=max_workers)
+
+    if resolve_async_mode(async_mode):
+        fetch_windows(windows, fetch_chunk)
+    else:
+        for desde, hasta in windows:
+            fetch_chunk(desde, hasta)
+    _report_failed(year, windows)
+
+    with ZoneWriter("raw", "ventas_year", str(year), RAW_VENTAS_SCHEMA, dedupe=True) as writer:
+        for desde, hasta in all_windows:
+            status, rows, _ = fetch_ledger.window_state(INFORME_VENTAS_PATH, desde, hasta)
+            # Only windows done with rows; a done 0-row window has no partition
+            if status == fetch_ledger.DONE and rows:
+                for batch in iter_zone_batches("raw", "ventas", f"{desde}_to_{hasta}"):
+                    writer.write(batch)
+        if not writer.rows:
+            writer.abort()
+            print(f"⚠️ No sales data found for {year}.")
+            return None
+    print(
+        f"✅ Combined all chunks — {writer.rows} rows "
+        f"({writer.duplicates} duplicate rows dropped)"
+    )
+    return read_zone("raw", "ventas_year", str(year)) if as_frame else writer.path
 
 
 # === END ADDED ===
@@ -1,61 +1,138 @@
 # === get_ventas_full_backfill.py ===
+"""
+Full ventas backfill (2023 → today), one year at a time.
+
+Usage:
+    python get_ventas_full_backfill.py [--workers N|auto] [--resume]
+
+With --workers N > 1, years are fetched, cleaned and enriched in a pool of
+N processes (the pandas/unidecode work scales with cores). Each worker gets
+1/N of the API rate budget. The main process is the only SQLite writer and
+commits the years in order as they become ready.
+
+Years are cleaned/enriched in chunks of whole documents (VENTAS_CLEAN_CHUNK_ROWS),
+so a year is never fully resident; with one worker each chunk is saved as
+soon as it is ready.
+
+Every fetched window is recorded in the fetch ledger (fetch_ledger.py).
+After a crash or failed windows, --resume reloads the windows already done
+from the raw zone and re-fetches only the missing/failed ones, plus any
+window fetched before its month closed; re-saving a year is idempotent
+(line-level unique key).
+"""
+
 import datetime
 import os
-import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from data_zone import ZoneWriter, arrow_schema
+from db import connect
 from get_ventas import get_ventas_full_year
+from kame_client import set_rate_share
 from pipeline import (
-    run_clean_sales_pipeline,
+    iter_clean_sales_chunks,
+    iter_sales_chunks,
     add_location_info,
     add_product_info,
     save_to_sqlite,
 )
+from pipeline.enrich_product import save_unmatched_skus, unmatched_skus
 
+FIRST_YEAR = 2023
 
-def run_backfill():
-    print("🧱 Starting full backfill (2023 → today)\n")
 
-    raw_dir = "test/ventas/raw"
-    clean_dir = "test/ventas/clean"
-    current_year = datetime.date.today().year
+def _init_worker(rate_share):
+    """Pool initializer: split the API budget between worker processes."""
+    set_rate_share(rate_share)
+
 
-    for year in range(2023, current_year + 1):
-        print(f"\n📅 Processing year {year}...")
+def transform_year(year, resume=False, on_chunk=None):
+    """
+    Fetch + clean + enrich one year (runs in a worker process when parallel).
+    The raw year is cleaned and enriched in chunks of whole documents, each
+    streamed to the enriched partition (and handed to `on_chunk`, if given)
+    as soon as it is ready. Returns (partition path or None if no data,
+    set of unmatched SKUs) so the caller writes the audit file once.
+    """
+    print(f"\n📅 Processing year {year}...")
 
-        # === STEP 1: Fetch full-year raw data ===
-        df_raw = get_ventas_full_year(year)
-        if df_raw is None or df_raw.empty:
-            print(f"⚠️ No data for {year}. Skipping.")
-            continue
+    # === STEP 1: Fetch full-year raw data (streamed to the raw Parquet zone) ===
+    raw_path = get_ventas_full_year(year, resume=resume, as_frame=False)
+    if raw_path is None:
+        print(f"⚠️ No data for {year}. Skipping.")
+        return None, set()
 
-        raw_path = os.path.join(raw_dir, f"ventas_raw_{year}_full.csv")
-        os.makedirs(os.path.dirname(raw_path), exist_ok=True)
-        df_raw.to_csv(raw_path, index=False)
-        print(f"💾 Saved raw file → {raw_path}")
+    # === STEP 2-4: Clean → enrich (location + product) → enriched partition ===
+    print(f"🧹 Cleaning {year} data in chunks...")
+    writer = None
+    unmatched = set()
+    try:
+        for df_clean in iter_clean_sales_chunks(source_path=str(raw_path)):
+            df_prod = add_product_info(add_location_info(df_clean), save_unmatched=False)
+            unmatched.update(unmatched_skus(df_prod))
+            if writer is None:
+                writer = ZoneWriter(
+                    "clean", "ventas_enriched_product", str(year), arrow_schema(df_prod)
+                )
+            writer.write(df_prod)
+            if on_chunk is not None:
+                on_chunk(df_prod)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    return (writer.close() if writer is not None else None), unmatched
 
-        # === STEP 2: Clean ===
-        print(f"🧹 Cleaning {year} data...")
-        df_clean = run_clean_sales_pipeline(source_path=raw_path)
 
-        # === STEP 3: Enrich (location + product) ===
-        df_loc = add_location_info(df_clean)
-        df_prod = add_product_info(df_loc)
+def _save_year(year, path):
+    """STEP 5: Append one year to SQLite, chunk by chunk (main process only)."""
+    if path is None:
+        return
+    print(f"🗄️ Appending {year} data to SQLite...")
+    for chunk in iter_sales_chunks(source_path=str(path)):
+        save_to_sqlite(df=chunk)
 
-        # === STEP 4: Save enriched file ===
-        enriched_path = os.path.join(clean_dir, f"ventas_enriched_product_{year}.csv")
-        os.makedirs(os.path.dirname(enriched_path), exist_ok=True)
-        df_prod.to_csv(enriched_path, index=False)
-        print(f"💾 Cleaned + enriched file saved → {enriched_path}")
 
-        # === STEP 5: Append to SQLite ===
-        print(f"🗄️ Appending {year} data to SQLite...")
-        save_to_sqlite(csv_path=enriched_path)
+def run_backfill(workers=1, resume=False):
+    print(f"🧱 Starting full backfill (2023 → today){' — resuming' if resume else ''}\n")
+
+    current_year = datetime.date.today().year
+    years = list(range(FIRST_YEAR, current_year + 1))
+    workers = max(1, min(workers, len(years)))
+    unmatched = set()
+
+    if workers == 1:
+        # Each chunk is saved as soon as it is cleaned and enriched
+        for year in years:
+            _, year_unmatched = transform_year(
+                year, resume, on_chunk=lambda df: save_to_sqlite(df=df)
+            )
+            unmatched |= year_unmatched
+    else:
+        print(f"⚙️ Parallel backfill: {len(years)} years on {workers} worker processes")
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(1 / workers,)
+        ) as pool:
+            futures = [pool.submit(transform_year, year, resume) for year in years]
+            # Single writer: commit strictly in year order
+            for year, future in zip(years, futures, strict=True):
+                try:
+                    path, year_unmatched = future.result()
+                except Exception as e:
+                    print(f"❌ Year {year} failed in worker: {e}")
+                    continue
+                _save_year(year, path)
+                unmatched |= year_unmatched
+
+    if unmatched:
+        save_unmatched_skus(unmatched)
 
     # === STEP 6: Verify DB ===
     print("\n✅ Full backfill completed — verifying database contents...")
-    conn = sqlite3.connect("data/vitroscience.db")
+    conn = connect(read_only=True)
     cur = conn.cursor()
-    cur.execute("SELECT MIN(Fecha), MAX(Fecha), COUNT(*) FROM ventas_enriched_product;")
+    cur.execute("SELECT MIN(FechaISO), MAX(FechaISO), COUNT(*) FROM ventas_enriched_product;")
     result = cur.fetchone()
     conn.close()
 
@@ -68,6 +145,13 @@ def run_backfill():
         print("⚠️ Verification failed or DB is empty.")
 
 
+def _parse_workers(argv):
+    if "--workers" in argv:
+        value = argv[argv.index("--workers") + 1]
+        return (os.cpu_count() or 1) if value == "auto" else int(value)
+    return int(os.getenv("VENTAS_BACKFILL_WORKERS", "1"))
+
+
 if __name__ == "__main__":
-    run_backfill()
-# === End of get_ventas_full_backfill.py ===
\ No newline at end of file
+    run_backfill(workers=_parse_workers(sys.argv), resume="--resume" in sys.argv)
+# === End of get_ventas_full_backfill.py ===
@@ -7,9 +7,10 @@ then cleans, enriches, and appends to the database.
 
 import datetime
 import os
-import sqlite3
 import pandas as pd
 
+from data_zone import write_zone
+from db import connect
 from get_ventas import get_informe_ventas_json
 from pipeline import (
     run_clean_sales_pipeline,
@@ -20,9 +21,9 @@ from pipeline import (
 
 
 def get_last_date_from_db(db_path="data/vitroscience.db"):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, read_only=True)
     cur = conn.cursor()
-    cur.execute("SELECT MAX(Fecha) FROM ventas_enriched_product;")
+    cur.execute("SELECT MAX(FechaISO) FROM ventas_enriched_product;")
     last = cur.fetchone()[0]
     conn.close()
     if not last:
@@ -50,25 +51,19 @@ def run_incremental_update():
         print("⚠️ No new ventas found.")
         return
 
-    raw_path = f"test/ventas/raw/ventas_raw_{start_date}_to_{end_date}.csv"
-    os.makedirs(os.path.dirname(raw_path), exist_ok=True)
-    df_new.to_csv(raw_path, index=False)
-    print(f"💾 Saved raw incremental file → {raw_path}")
+    # Raw rows were saved to data/lake/raw/ventas by get_informe_ventas_json
 
     # === STEP 2: Clean + enrich ===
     print("🧹 Cleaning new data...")
-    df_clean = run_clean_sales_pipeline(source_path=raw_path)
+    df_clean = run_clean_sales_pipeline(df=df_new, save_output=False)
     df_loc = add_location_info(df_clean)
     df_prod = add_product_info(df_loc)
 
     # === STEP 3: Save to DB ===
-    enriched_path = f"test/ventas/clean/ventas_enriched_product_incremental_{start_date}_to_{end_date}.csv"
-    os.makedirs(os.path.dirname(enriched_path), exist_ok=True)
-    df_prod.to_csv(enriched_path, index=False)
-    print(f"💾 Cleaned + enriched incremental file saved → {enriched_path}")
+    write_zone(df_prod, "clean", "ventas_enriched_product", f"{start_date}_to_{end_date}")
 
     print("🗄️ Appending new ventas to SQLite...")
-    save_to_sqlite(csv_path=enriched_path)
+    save_to_sqlite(df=df_prod)
 
     print("\n✅ Incremental update complete.\n")
     # === Log completion timestamp ===
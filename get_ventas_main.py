@@ -10,16 +10,20 @@ Execution order:
 5. pipeline/save_to_sqlite.py   — Save final data into SQLite DB
 
 Usage:
-    python get_ventas_main.py [fecha_desde] [fecha_hasta]
+    python get_ventas_main.py [fecha_desde] [fecha_hasta] [--debug-artifacts]
 Example:
     python get_ventas_main.py 2024-02-01 2024-02-29
 
 New:
     python get_ventas_main.py 2023   # fetches full year in monthly chunks and runs full pipeline
+
+Stages pass DataFrames in memory; add --debug-artifacts to also write the
+intermediate raw/clean/enriched Parquet partitions under data/lake.
+Year mode streams: the year is fetched into the raw zone and cleaned,
+enriched and saved in chunks of whole documents, never held in memory.
 """
 
 import os
-import shutil
 import sys
 
 import pandas as pd
@@ -33,55 +37,58 @@ from get_ventas import get_informe_ventas_json, get_ventas_full_year
 from pipeline import (
     add_location_info,
     add_product_info,
+    iter_clean_sales_chunks,
     run_clean_sales_pipeline,
 )
+from pipeline.enrich_product import save_unmatched_skus, unmatched_skus
 from pipeline.save_to_sqlite import save_to_sqlite
-
+from data_zone import ZoneWriter, arrow_schema, read_table, write_zone
 
 
 def run_full_pipeline(
-    fecha_desde: str, fecha_hasta: str, raw_override: str | None = None
+    fecha_desde: str,
+    fecha_hasta: str,
+    raw_override: str | None = None,
+    df_raw: pd.DataFrame | None = None,
+    debug_artifacts: bool = False,
 ):
     """
     Run the entire VS_KAME_APP sales data pipeline.
 
-    If raw_override is provided and exists, we skip the API fetch
-    and use that CSV as the raw input (e.g., full-year combined file).
+    Stages hand DataFrames to each other in memory. Intermediate Parquet
+    partitions (raw, clean preview, enriched, enriched_product) are only
+    written when debug_artifacts=True.
+
+    If df_raw is provided we skip the API fetch and use it as the raw input
+    (e.g., the full-year combined data). If raw_override is provided and
+    exists, that .parquet/.csv file is used instead.
     """
     print("\n🧪 Starting VS_KAME_APP pipeline...\n")
 
-    # Where the step-1 fetch would normally save its CSV
-    raw_path_default = f"test/ventas/raw/ventas_raw_{fecha_desde}_to_{fecha_hasta}.csv"
-    enriched_path = "test/ventas/clean/ventas_enriched.csv"
-    product_enriched_path = "test/ventas/clean/ventas_enriched_product.csv"
+    partition = f"{fecha_desde}_to_{fecha_hasta}"
 
     # === STEP 1: Raw data source resolution ===
-    if raw_override and os.path.exists(raw_override):
+    if df_raw is not None:
+        print(f"🚀 STEP 1: Using pre-fetched raw data ({len(df_raw)} rows)")
+    elif raw_override and os.path.exists(raw_override):
         print(f"🚀 STEP 1: Using pre-fetched raw file → {raw_override}")
-        raw_path = raw_override
-        df_raw = pd.read_csv(raw_path)
+        df_raw = read_table(raw_override)
     else:
         print("🚀 STEP 1: Fetching ventas from Kame API")
-        df_raw = get_informe_ventas_json(fecha_desde, fecha_hasta)
+        df_raw = get_informe_ventas_json(
+            fecha_desde, fecha_hasta, save_raw=debug_artifacts
+        )
         if df_raw is None or df_raw.empty:
             print("❌ No data fetched. Exiting pipeline.")
             return
         print(f"✅ Raw data fetched ({len(df_raw)} rows)")
-        raw_path = raw_path_default
 
-    # Ensure cleaner sees the expected input path (non-breaking)
-    os.makedirs("test/ventas/raw", exist_ok=True)
-    cleaner_input = "test/ventas/raw/ventas_raw.csv"
-    try:
-        if os.path.abspath(raw_path) != os.path.abspath(cleaner_input):
-            shutil.copy(raw_path, cleaner_input)
-            print(f"📦 Copied raw file to cleaner input → {cleaner_input}")
-    except Exception as e:
-        print(f"⚠️ Could not copy raw file to {cleaner_input}: {e}")
+    if debug_artifacts:
+        write_zone(df_raw, "raw", "ventas", partition)
 
     # === STEP 2: Clean sales data ===
     print("\n🧹 STEP 2: Cleaning sales data")
-    df_clean = run_clean_sales_pipeline(source_path=cleaner_input)
+    df_clean = run_clean_sales_pipeline(df=df_raw, save_output=debug_artifacts)
     if df_clean is None or df_clean.empty:
         print("❌ Cleaning produced no rows. Exiting pipeline.")
         return
@@ -90,58 +97,80 @@ def run_full_pipeline(
     # === STEP 3: Enrich with location ===
     print("\n🌎 STEP 3: Adding location info")
     df_loc = add_location_info(df_clean)
-    os.makedirs(os.path.dirname(enriched_path), exist_ok=True)
-    df_loc.to_csv(enriched_path, index=False)
-    print(f"💾 Saved → {enriched_path}")
+    if debug_artifacts:
+        write_zone(df_loc, "clean", "ventas_enriched", partition)
 
     # === STEP 4: Enrich with product info ===
     print("\n🧩 STEP 4: Adding product info")
     df_prod = add_product_info(df_loc)
-    os.makedirs(os.path.dirname(product_enriched_path), exist_ok=True)
-    df_prod.to_csv(product_enriched_path, index=False)
-    print(f"💾 Saved → {product_enriched_path}")
+    if debug_artifacts:
+        write_zone(df_prod, "clean", "ventas_enriched_product", partition)
 
     # === STEP 5: Save to SQLite ===
     print("\n🗄️ STEP 5: Saving to SQLite database")
-    save_to_sqlite()
+    save_to_sqlite(df=df_prod)
 
     print("\n✅ Pipeline completed successfully!\n")
 
 
-def run_full_year_pipeline(year: int):
+def run_full_year_pipeline(year: int, debug_artifacts: bool = False):
     """
-    Year mode: fetch all ventas for a given year (month-by-month),
-    combine to a single CSV, and run the full pipeline using that CSV.
+    Year mode: fetch all ventas for a given year (month-by-month, streamed to
+    the raw zone), then clean → enrich → save it chunk by chunk (whole
+    documents, VENTAS_CLEAN_CHUNK_ROWS) so the year is never fully resident.
+    debug_artifacts=True also streams the enriched chunks into their
+    clean-zone partitions.
     """
     print(f"\n🗓️ Starting full-year pipeline for {year}...")
 
-    df_all = get_ventas_full_year(year)
-    if df_all is None or df_all.empty:
+    raw_path = get_ventas_full_year(year, as_frame=False)
+    if raw_path is None:
         print(f"❌ No data fetched for {year}. Aborting pipeline.")
         return
 
-    combined_path = f"test/ventas/raw/ventas_raw_{year}_full.csv"
-    if not os.path.exists(combined_path):
-        os.makedirs("test/ventas/raw", exist_ok=True)
-        df_all.to_csv(combined_path, index=False)
-
-    print(f"✅ Combined file ready: {combined_path}")
-
-    # Run the standard pipeline but point it to the combined CSV
-    run_full_pipeline(f"{year}-01-01", f"{year}-12-31", raw_override=combined_path)
+    partition = f"{year}-01-01_to_{year}-12-31"
+    writers = {}
+    unmatched = set()
+    rows = 0
+    print(f"\n🧹 Cleaning → enriching → saving {year} in chunks...")
+    try:
+        for df_clean in iter_clean_sales_chunks(source_path=str(raw_path)):
+            df_loc = add_location_info(df_clean)
+            df_prod = add_product_info(df_loc, save_unmatched=False)
+            unmatched.update(unmatched_skus(df_prod))
+            if debug_artifacts:
+                for table, df in (("ventas_enriched", df_loc), ("ventas_enriched_product", df_prod)):
+                    if table not in writers:
+                        writers[table] = ZoneWriter("clean", table, partition, arrow_schema(df))
+                    writers[table].write(df)
+            save_to_sqlite(df=df_prod)
+            rows += len(df_prod)
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.close()
+    if unmatched:
+        save_unmatched_skus(unmatched)
+
+    print(f"\n✅ Full-year pipeline completed: {rows} rows saved for {year}\n")
 
 
 if __name__ == "__main__":
     # === CLI arguments ===
-    if len(sys.argv) == 2 and sys.argv[1].isdigit():
-        YEAR = int(sys.argv[1])
-        run_full_year_pipeline(YEAR)
-    elif len(sys.argv) == 3:
-        DATE_FROM, DATE_TO = sys.argv[1], sys.argv[2]
-        run_full_pipeline(DATE_FROM, DATE_TO)
+    DEBUG_ARTIFACTS = "--debug-artifacts" in sys.argv
+    args = [a for a in sys.argv[1:] if a != "--debug-artifacts"]
+
+    if len(args) == 1 and args[0].isdigit():
+        YEAR = int(args[0])
+        run_full_year_pipeline(YEAR, debug_artifacts=DEBUG_ARTIFACTS)
+    elif len(args) == 2:
+        DATE_FROM, DATE_TO = args
+        run_full_pipeline(DATE_FROM, DATE_TO, debug_artifacts=DEBUG_ARTIFACTS)
     else:
         DATE_FROM, DATE_TO = "2024-01-01", "2024-01-31"
         print(f"⚙️ No dates provided — defaulting to {DATE_FROM} → {DATE_TO}")
-        run_full_pipeline(DATE_FROM, DATE_TO)
+        run_full_pipeline(DATE_FROM, DATE_TO, debug_artifacts=DEBUG_ARTIFACTS)
 
 # === END get_ventas_main.py ===
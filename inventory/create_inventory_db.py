@@ -1,8 +1,9 @@
 import pandas as pd
-import sqlite3
 import os
 from datetime import datetime
 
+from db import connect
+
 # Paths
 DB_PATH = "data/vitroscience.db"
 CSV_PATH = "test/stock/clean/inventario_stock_clean.csv"
@@ -33,7 +34,7 @@ def create_inventory_table():
 
     try:
         # Connect to SQLite
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect(DB_PATH)
         cur = conn.cursor()
 
         # Create table dynamically
@@ -14,34 +14,40 @@ CLIENT_SECRET = os.getenv("KAME_CLIENT_SECRET")
 CACHE_FILE = "token_cache.json"
 
 
-def get_cached_token():
-    """Check if a valid token exists in the cache file."""
+def read_cached_token():
+    """Return (access_token, expires_at) from the cache file, or (None, 0)."""
     if not os.path.exists(CACHE_FILE):
-        return None
+        return None, 0
 
     with open(CACHE_FILE, "r") as f:
         data = json.load(f)
 
-    expires_at = data.get("expires_at", 0)
-    if time.time() < expires_at:
+    return data.get("access_token"), data.get("expires_at", 0)
+
+
+def get_cached_token():
+    """Check if a valid token exists in the cache file."""
+    token, expires_at = read_cached_token()
+    if token and time.time() < expires_at:
         # Token still valid
-        return data["access_token"]
+        return token
 
     return None  # Expired
 
 
 def save_token(token, expires_in):
-    """Save the token and its expiration time."""
+    """Save the token and its expiration time. Returns the expiration timestamp."""
     data = {
         "access_token": token,
         "expires_at": time.time() + expires_in - 60  # 1-min buffer
     }
     with open(CACHE_FILE, "w") as f:
         json.dump(data, f)
+    return data["expires_at"]
 
 
-def request_new_token():
-    """Request a new token from Kame API."""
+def request_new_token_with_expiry(session=None):
+    """Request a new token from Kame API. Returns (access_token, expires_at)."""
     payload = {
         "client_id": CLIENT_ID,
         "client_secret": CLIENT_SECRET,
@@ -50,12 +56,19 @@ def request_new_token():
     }
     headers = {"Content-Type": "application/json"}
 
-    response = requests.post(API_URL, json=payload, headers=headers)
+    http = session or requests
+    response = http.post(API_URL, json=payload, headers=headers)
     response.raise_for_status()
     data = response.json()
     token = data["access_token"]
     expires_in = data.get("expires_in", 86400)  # default 24h
-    save_token(token, expires_in)
+    expires_at = save_token(token, expires_in)
+    return token, expires_at
+
+
+def request_new_token():
+    """Request a new token from Kame API."""
+    token, _ = request_new_token_with_expiry()
     return token
 
 
@@ -0,0 +1,47 @@
+# === kame_async.py ===
+"""
+Opt-in asyncio fetch mode for KAME date-window loops.
+
+Windows run concurrently under a semaphore; each window's blocking fetch is
+executed in a worker thread and shares the pooled KameClient session and
+rate limiter. Results always come back in window order, so callers keep
+their existing (first window wins) deduplication.
+
+Enable with KAME_ASYNC_FETCH=1 or the `async_mode=True` argument.
+"""
+
+import asyncio
+import os
+
+ASYNC_FETCH = os.getenv("KAME_ASYNC_FETCH", "0") == "1"
+MAX_CONCURRENT_WINDOWS = int(os.getenv("KAME_MAX_CONCURRENT_WINDOWS", "4"))
+
+
+async def _gather_windows(windows, fetch_window, max_concurrency):
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(window):
+        async with semaphore:
+            return await asyncio.to_thread(fetch_window, *window)
+
+    return await asyncio.gather(*(run(w) for w in windows))
+
+
+def fetch_windows(windows, fetch_window, max_concurrency=MAX_CONCURRENT_WINDOWS):
+    """
+    Call fetch_window(start, end) for every (start, end) window concurrently.
+    Returns the results as a list aligned with `windows`.
+    """
+    windows = list(windows)
+    print(
+        f"⚡ Async mode: {len(windows)} windows, up to {max_concurrency} in flight"
+    )
+    return asyncio.run(_gather_windows(windows, fetch_window, max_concurrency))
+
+
+def resolve_async_mode(async_mode):
+    """None → use the KAME_ASYNC_FETCH default."""
+    return ASYNC_FETCH if async_mode is None else bool(async_mode)
+
+
+# === END kame_async.py ===
@@ -0,0 +1,159 @@
+# === kame_cache.py ===
+"""
+On-disk cache of raw KAME API page responses.
+
+- Content-addressed: one gzip JSON file per sha256(endpoint + sorted params),
+  holding the payload and the fetched_at timestamp
+- TTL policy from the request's date window: entries fetched after their
+  period closed (first day of the month after fechaHasta) never expire;
+  anything else — including a closed period cached while it was still
+  open — expires after KAME_CACHE_TTL_S (default 15 min)
+- Only endpoints in CACHED_ENDPOINTS are cached (sales by default; CxC/CxP
+  are live balances)
+- KAME_OFFLINE=1 serves every request from the cache regardless of age,
+  so whole-pipeline replays run without network
+
+Disable with KAME_CACHE=0.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("KAME_CACHE_DIR", "data/cache/kame"))
+CACHE_ENABLED = os.getenv("KAME_CACHE", "1") == "1"
+OFFLINE = os.getenv("KAME_OFFLINE", "0") == "1"
+OPEN_PERIOD_TTL_S = int(os.getenv("KAME_CACHE_TTL_S", "900"))
+
+CACHED_ENDPOINTS = set(
+    filter(None, os.getenv("KAME_CACHED_ENDPOINTS", "Documento/getInformeVentas").split(","))
+)
+
+# Query params that carry the end of the requested date window.
+WINDOW_END_PARAMS = ("fechaHasta", "FechaHasta", "fecha_hasta", "fechaTermino")
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response built from a cache entry."""
+
+    from_cache = True
+
+    def __init__(self, payload, url, status_code=200):
+        self.status_code = status_code
+        self.url = url
+        self.headers = {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    @property
+    def text(self):
+        return json.dumps(self._payload, ensure_ascii=False)
+
+
+def cache_key(endpoint, params):
+    raw = endpoint + "?" + json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    return CACHE_DIR / key[:2] / f"{key}.json.gz"
+
+
+def period_close(params):
+    """
+    First day of the month after the request's window end (from then on the
+    period's data is final), or None if the window end is missing/unparseable.
+    """
+    for name in WINDOW_END_PARAMS:
+        value = (params or {}).get(name)
+        if value:
+            try:
+                end = datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+            except ValueError:
+                return None
+            return date(end.year + end.month // 12, end.month % 12 + 1, 1)
+    return None
+
+
+def is_closed_period(params, fetched_at=None, today=None):
+    """
+    True if the request's window is in a closed month *and* the entry was
+    fetched after that month closed (`fetched_at`: epoch seconds). A copy
+    fetched while the month was still open is never treated as final.
+    """
+    close = period_close(params)
+    if close is None:
+        return False
+    today = today or date.today()
+    if today < close:
+        return False
+    return fetched_at is None or date.fromtimestamp(fetched_at) >= close
+
+
+def is_cacheable(endpoint):
+    return CACHE_ENABLED and endpoint in CACHED_ENDPOINTS
+
+
+def load(endpoint, params, url=None):
+    """
+    Return a CachedResponse for (endpoint, params), or None on a miss.
+    Stale entries are misses unless running offline.
+    """
+    path = _entry_path(cache_key(endpoint, params))
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+    fetched_at = entry.get("fetched_at", 0)
+    age = time.time() - fetched_at
+    if not OFFLINE and not is_closed_period(params, fetched_at) and age > OPEN_PERIOD_TTL_S:
+        return None
+    return CachedResponse(entry["payload"], url or entry.get("url"))
+
+
+def offline_miss(url):
+    """Response returned in offline mode when a request was never cached."""
+    return CachedResponse({"error": "not cached (KAME_OFFLINE=1)"}, url, status_code=504)
+
+
+def store(endpoint, params, payload, url=None):
+    """Write a successful payload (atomic replace)."""
+    path = _entry_path(cache_key(endpoint, params))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "endpoint": endpoint,
+        "params": params or {},
+        "url": url,
+        "fetched_at": time.time(),
+        "payload": payload,
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def clear(endpoint=None):
+    """Delete cached entries (all, or only one endpoint's). Returns the count."""
+    removed = 0
+    for path in CACHE_DIR.glob("*/*.json.gz"):
+        if endpoint is not None:
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    if json.load(f).get("endpoint") != endpoint:
+                        continue
+            except (OSError, ValueError):
+                pass
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+# === END kame_cache.py ===
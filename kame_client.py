@@ -0,0 +1,181 @@
+# === kame_client.py ===
+"""
+Shared HTTP client for the KAME API.
+
+- One pooled requests.Session (keep-alive) reused by every fetcher
+- Access token kept in memory and refreshed ahead of expiry
+- Safe to share across the page-fetch worker threads
+- Requests paced by kame_rate_limit; 429/503 retried with backoff
+- Page responses of cached endpoints served from kame_cache when fresh
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import kame_api
+import kame_cache
+from kame_rate_limit import RateLimiter, backoff_delay, endpoint_key
+
+BASE_URL = "https://api.kameone.cl/api"
+DEFAULT_TIMEOUT = 15
+POOL_SIZE = int(os.getenv("KAME_HTTP_POOL_SIZE", "16"))  # windows × pages in flight
+TOKEN_REFRESH_MARGIN_S = 300  # refresh 5 min before the token expires
+MAX_RETRIES = int(os.getenv("KAME_MAX_RETRIES", "5"))
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class IncompleteFetchError(RuntimeError):
+    """A page of the window failed; the window must not be used as complete."""
+
+
+class KameClient:
+    """Pooled, token-aware session for KAME API requests."""
+
+    def __init__(self, base_url=BASE_URL, pool_size=POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._token = None
+        self._expires_at = 0.0
+        self._token_lock = threading.Lock()
+        self.limiter = RateLimiter()
+
+    # -------------------------------------------------------------------
+    # 🔑 Token handling (disk cache is read once, then kept in memory)
+    # -------------------------------------------------------------------
+    def _token_fresh(self):
+        return self._token and time.time() < self._expires_at - TOKEN_REFRESH_MARGIN_S
+
+    def get_token(self, force_refresh=False):
+        """Return a valid access token, refreshing it ahead of expiry."""
+        if self._token_fresh() and not force_refresh:
+            return self._token
+
+        with self._token_lock:
+            if self._token_fresh() and not force_refresh:
+                return self._token
+
+            token, expires_at = (None, 0) if force_refresh else kame_api.read_cached_token()
+            if not token or time.time() >= expires_at - TOKEN_REFRESH_MARGIN_S:
+                print("🔄 Requesting new token...")
+                token, expires_at = kame_api.request_new_token_with_expiry(
+                    session=self.session
+                )
+            self._token, self._expires_at = token, expires_at
+            return self._token
+
+    # -------------------------------------------------------------------
+    # 🌐 Requests
+    # -------------------------------------------------------------------
+    def _url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _send(self, url, params, timeout):
+        response = self.session.get(
+            url,
+            params=params,
+            headers={"Authorization": f"Bearer {self.get_token()}"},
+            timeout=timeout,
+        )
+        if response.status_code == 401:
+            response = self.session.get(
+                url,
+                params=params,
+                headers={"Authorization": f"Bearer {self.get_token(force_refresh=True)}"},
+                timeout=timeout,
+            )
+        return response
+
+    def get(self, path, params=None, timeout=None, max_retries=MAX_RETRIES):
+        """
+        GET an API path (or absolute URL) with auth.
+
+        - Paced by the endpoint's token bucket
+        - 429/5xx gateway errors and connection errors are retried with
+          exponential backoff + jitter (Retry-After honoured)
+        - Returns the last response once retries are exhausted
+        - Cached endpoints (kame_cache) return a fresh cached page without
+          touching the network; KAME_OFFLINE=1 never touches the network
+        """
+        url = self._url(path)
+        key = endpoint_key(url)
+        timeout = timeout or self.timeout
+
+        cacheable = kame_cache.is_cacheable(key)
+        if cacheable or kame_cache.OFFLINE:
+            cached = kame_cache.load(key, params, url)
+            if cached is not None:
+                return cached
+            if kame_cache.OFFLINE:
+                print(f"  📴 {key}: not in cache (offline mode)")
+                return kame_cache.offline_miss(url)
+
+        response = self._get_with_retries(url, key, params, timeout, max_retries)
+        if cacheable and response.status_code == 200:
+            try:
+                kame_cache.store(key, params, response.json(), url)
+            except ValueError:
+                pass  # not JSON — nothing worth caching
+        return response
+
+    def _get_with_retries(self, url, key, params, timeout, max_retries):
+        """Network GET with rate limiting and retry/backoff (see get())."""
+        attempt = 0
+        while True:
+            self.limiter.acquire(key)
+            try:
+                response = self._send(url, params, timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"  ⚠️ {key}: {type(e).__name__}, retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if response.status_code not in RETRY_STATUS or attempt >= max_retries:
+                if response.status_code < 400:
+                    self.limiter.succeed(key)
+                return response
+
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            print(
+                f"  ⚠️ {key}: HTTP {response.status_code}, "
+                f"backing off {delay:.1f}s (attempt {attempt + 1}/{max_retries})"
+            )
+            self.limiter.throttle(key, delay)
+            attempt += 1
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide KameClient (created on first use)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = KameClient()
+    return _client
+
+
+def set_rate_share(share):
+    """Give this process `share` of the API budget (e.g. 1/N for N workers)."""
+    get_client().limiter = RateLimiter(share=share)
+
+
+# === END kame_client.py ===
@@ -0,0 +1,143 @@
+# === kame_rate_limit.py ===
+"""
+Adaptive rate limiting for KAME API requests.
+
+- Token bucket per endpoint (plus a global bucket for the whole API)
+- AIMD adaptation: halve the rate on HTTP 429, creep back up on success
+- Exponential backoff with full jitter that honours Retry-After
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Requests per second (rate, burst) for the whole API and for each endpoint.
+GLOBAL_BUDGET = (float(os.getenv("KAME_RATE_LIMIT", "8")), 8)
+DEFAULT_ENDPOINT_BUDGET = (4.0, 4)
+ENDPOINT_BUDGETS = {
+    "Documento/getInformeVentas": (6.0, 6),
+    "Contabilidad/getCuentaxCobrar": (4.0, 4),
+    "Contabilidad/getCuentaxPagar": (4.0, 4),
+    "Maestro/getListArticulo": (6.0, 6),
+    "Inventario/getStock": (4.0, 4),
+}
+
+MIN_RATE = 0.2  # never slow below one request every 5 s
+RATE_INCREASE_STEP = 0.1  # additive increase per successful request
+BACKOFF_BASE_S = 1.0
+BACKOFF_CAP_S = 60.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts to server throttling."""
+
+    def __init__(self, rate, burst):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, delay):
+        """Server pushed back: halve the rate and pause for `delay` seconds."""
+        with self._lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def succeed(self):
+        """Request accepted: recover the rate additively up to the budget."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE_STEP)
+
+
+def endpoint_key(url):
+    """Return the 'Module/method' part of a KAME API URL or path."""
+    path = url.split("?", 1)[0]
+    if "/api/" in path:
+        path = path.split("/api/", 1)[1]
+    parts = [p for p in path.strip("/").split("/") if p]
+    return "/".join(parts[:2])
+
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (seconds or HTTP date). Returns None if absent/invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Delay before retry `attempt` (0-based): Retry-After if given, else jittered exponential."""
+    server_delay = retry_after_seconds(retry_after)
+    if server_delay is not None:
+        return min(BACKOFF_CAP_S, server_delay) + random.uniform(0, BACKOFF_BASE_S)
+    return random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2**attempt))
+
+
+class RateLimiter:
+    """
+    Global + per-endpoint token buckets shared by every fetcher thread.
+    `share` scales every budget, so N worker processes each get 1/N of it.
+    """
+
+    def __init__(self, share=1.0):
+        self.share = share
+        self.global_bucket = TokenBucket(*self._scaled(GLOBAL_BUDGET))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _scaled(self, budget):
+        rate, burst = budget
+        return rate * self.share, max(1, int(burst * self.share))
+
+    def bucket(self, key):
+        with self._lock:
+            if key not in self._buckets:
+                budget = ENDPOINT_BUDGETS.get(key, DEFAULT_ENDPOINT_BUDGET)
+                self._buckets[key] = TokenBucket(*self._scaled(budget))
+            return self._buckets[key]
+
+    def acquire(self, key):
+        self.bucket(key).acquire()
+        self.global_bucket.acquire()
+
+    def throttle(self, key, delay):
+        self.bucket(key).throttle(delay)
+
+    def succeed(self, key):
+        self.bucket(key).succeed()
+
+
+# === END kame_rate_limit.py ===
@@ -9,12 +9,13 @@ VitroScience Database Maintenance Script
 """
 
 import os
-import shutil
 import sqlite3
 from datetime import datetime
 
 from tabulate import tabulate
 
+from db import connect
+
 DB_PATH = "data/vitroscience.db"
 BACKUP_DIR = "data/backups"
 
@@ -29,7 +30,14 @@ def backup_database(db_path=DB_PATH, backup_dir=BACKUP_DIR):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_path = os.path.join(backup_dir, f"vitroscience_backup_{timestamp}.db")
 
-    shutil.copy2(db_path, backup_path)
+    # Online backup: includes commits still in the -wal file (WAL mode),
+    # consistent even while a pipeline job is writing
+    src = connect(db_path, read_only=True)
+    dst = sqlite3.connect(backup_path)
+    with dst:
+        src.backup(dst)
+    dst.close()
+    src.close()
     print(f"🧾 Backup created: {backup_path}")
     return backup_path
 
@@ -43,7 +51,7 @@ def maintain_database(db_path=DB_PATH):
     backup_database(db_path)
 
     # --- Step 2: Connect to DB ---
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor()
     print(f"🗃️ Connected to database: {db_path}")
 
@@ -78,6 +86,8 @@ def maintain_database(db_path=DB_PATH):
     print("\n🧼 Running VACUUM to optimize DB...")
     cur.execute("VACUUM;")
     conn.commit()
+    # Fold the WAL back into the main file and reset it
+    cur.execute("PRAGMA wal_checkpoint(TRUNCATE);")
     conn.close()
 
     print("\n✅ Maintenance completed successfully.")
@@ -1,9 +1,10 @@
 import os
-import sqlite3
 from datetime import datetime
 
 import pandas as pd
 
+from db import connect
+
 # Paths
 DB_PATH = "data/vitroscience.db"
 CSV_PATH = "test/pagar/clean/cuentas_por_pagar_clean.csv"
@@ -37,7 +38,7 @@ def create_cta_por_pagar_table():
 
     try:
         # Connect to SQLite
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect(DB_PATH)
         cur = conn.cursor()
 
         # Create table dynamically
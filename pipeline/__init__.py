@@ -2,18 +2,28 @@
 get sales package for VitroScience.
 
 Modules:
-- clean_sales_main: Cleans raw stock data from KAME ERP.
+- clean_sales_main: Cleans raw stock data from KAME ERP (whole file or chunked).
 - enrich_location: add Region and SS to main file.
 - enrich_product: add Unegocio to main file.
+- dtypes: category dtype policy for low-cardinality text columns.
+- text_normalize: vectorized accent stripping shared by the cleaners.
+- ventas_schema: explicit typed schema + migrations for ventas_enriched_product.
+- ventas_rollups: daily/monthly sales rollups maintained by save_to_sqlite.
 """
 
-from .clean_sales_main import run_clean_sales_pipeline
+from .clean_sales_main import (
+    iter_clean_sales_chunks,
+    iter_sales_chunks,
+    run_clean_sales_pipeline,
+)
 from .enrich_location import add_location_info
 from .enrich_product import add_product_info
 from .save_to_sqlite import save_to_sqlite
 
 __all__ = [
     "run_clean_sales_pipeline",
+    "iter_clean_sales_chunks",
+    "iter_sales_chunks",
     "add_location_info",
     "add_product_info",
     "save_to_sqlite",
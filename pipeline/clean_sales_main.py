@@ -1,41 +1,98 @@
 # === pipeline/clean_sales_main.py ===
 import os
+from pathlib import Path
+
 import pandas as pd
-from unidecode import unidecode
+import pyarrow.parquet as pq
 
+from data_zone import ZoneWriter, arrow_schema, read_table, write_zone
+from pipeline.dtypes import apply_category_dtypes
+from pipeline.text_normalize import strip_accents
 
-def run_clean_sales_pipeline(source_path: str = None):
-    """
-    Clean and standardize KAME sales data.
-    - Drops only the specified unnecessary columns (keeping Rut)
-    - Rounds numeric values (keeps them as numeric types)
-    - Normalizes text columns: RznSocial, Direccion, Comuna, Ciudad, Region, ServicioSalud
-    - Removes accents from several key text fields
-    - Converts Folio to text and removes trailing '.0'
-    - Saves output to /test/ventas/clean/ventas_clean_preview.csv
-    """
+# Rows per batch in chunked mode (whole documents are kept together)
+CLEAN_CHUNK_ROWS = int(os.getenv("VENTAS_CLEAN_CHUNK_ROWS", "100000"))
+DOCUMENT_KEY = ["NombreDocumento", "Folio"]
 
-    # === Resolve file path safely ===
-    base_dir = os.path.dirname(os.path.abspath(__file__))
 
+def _load_raw_sales(base_dir: str, source_path: str = None):
+    """Read a raw sales .parquet/.csv (defaulting to test/ventas/raw/ventas_raw.csv)."""
+    source_path = _resolve_source(base_dir, source_path)
+
+    print(f"📂 Loading {source_path} ...")
+
+    if not os.path.exists(source_path):
+        print(f"❌ File not found: {source_path}")
+        return None
+
+    return read_table(source_path)
+
+
+def _resolve_source(base_dir: str, source_path: str = None):
     if source_path is None:
         candidate_full = os.path.join(base_dir, "../test/ventas/raw/ventas_raw.csv")
         candidate_fallback = os.path.join(
             base_dir, "../test/ventas/raw/ventas_raw_2024-01-01_to_2024-01-31.csv"
         )
+        source_path = candidate_full if os.path.exists(candidate_full) else candidate_fallback
+    return source_path
 
-        if os.path.exists(candidate_full):
-            source_path = candidate_full
-        else:
-            source_path = candidate_fallback
 
-    print(f"📂 Loading {source_path} ...")
+def _raw_batches(source_path, df, chunksize):
+    """Fixed-size DataFrame batches from a frame, a .parquet or a .csv file."""
+    if df is not None:
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start : start + chunksize]
+    elif Path(source_path).suffix == ".parquet":
+        for batch in pq.ParquetFile(source_path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source_path, chunksize=chunksize)
 
-    if not os.path.exists(source_path):
-        print(f"❌ File not found: {source_path}")
-        return None
 
-    df = pd.read_csv(source_path)
+def whole_document_chunks(frames, key=DOCUMENT_KEY):
+    """
+    Re-cut a stream of frames so no document is split across chunks: the
+    rows of each chunk's last document are carried into the next chunk.
+    Line numbers (Linea) are assigned per document at save time, so every
+    chunk can be cleaned, enriched and saved on its own.
+    """
+    carry = None
+    for df in frames:
+        if carry is not None:
+            df = pd.concat([carry, df], ignore_index=True)
+            carry = None
+        if df.empty:
+            continue
+        if not all(col in df.columns for col in key):
+            yield df
+            continue
+        doc = df[key].astype(str)
+        last = doc.iloc[-1]
+        in_last = (doc == last).all(axis=1)
+        carry = df[in_last]
+        if (~in_last).any():
+            yield df[~in_last].reset_index(drop=True)
+    if carry is not None and not carry.empty:
+        yield carry.reset_index(drop=True)
+
+
+def iter_sales_chunks(source_path: str = None, df: pd.DataFrame = None, chunksize=CLEAN_CHUNK_ROWS):
+    """Sales rows (raw or cleaned) in ~`chunksize` batches of whole documents."""
+    if df is None:
+        source_path = _resolve_source(os.path.dirname(os.path.abspath(__file__)), source_path)
+        print(f"📂 Streaming {source_path} in chunks of {chunksize:,} rows ...")
+        if not os.path.exists(source_path):
+            print(f"❌ File not found: {source_path}")
+            return
+    yield from whole_document_chunks(_raw_batches(source_path, df, chunksize))
+
+
+def clean_sales_frame(df: pd.DataFrame, verbose: bool = True):
+    """
+    Apply every cleaning transform to one frame (row-wise, so a frame can be
+    a whole file or one chunk of it).
+    """
+    df = df.copy()
 
     # === Normalize column names ===
     df.columns = df.columns.str.strip().str.replace("\ufeff", "", regex=True)
@@ -57,7 +114,8 @@ def run_clean_sales_pipeline(source_path: str = None):
     ]
 
     existing_to_drop = [c for c in drop_only if c in df.columns]
-    print(f"🗑️ Dropping columns: {existing_to_drop}")
+    if verbose:
+        print(f"🗑️ Dropping columns: {existing_to_drop}")
 
     df = df.drop(columns=existing_to_drop, errors="ignore")
 
@@ -109,7 +167,7 @@ def run_clean_sales_pipeline(source_path: str = None):
     ]
     for col in accent_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).apply(lambda x: unidecode(x))
+            df[col] = strip_accents(df[col].astype(str))
 
     # === Convert Folio to text and remove trailing ".0" ===
     if "Folio" in df.columns:
@@ -117,14 +175,64 @@ def run_clean_sales_pipeline(source_path: str = None):
             df["Folio"].astype(str).str.replace(r"\.0$", "", regex=True).str.strip()
         )
 
+    # === Low-cardinality text columns as categoricals ===
+    return apply_category_dtypes(df)
+
+
+def iter_clean_sales_chunks(
+    source_path: str = None, df: pd.DataFrame = None, chunksize=CLEAN_CHUNK_ROWS
+):
+    """
+    Chunked/iterator mode: yield cleaned batches of ~`chunksize` rows (whole
+    documents), reading the raw file incrementally. Concatenated with
+    pipeline.dtypes.concat_frames, the chunks equal run_clean_sales_pipeline's
+    output (each chunk has its own categories; plain pd.concat turns the
+    category columns back into object).
+    """
+    for chunk in iter_sales_chunks(source_path, df, chunksize):
+        yield clean_sales_frame(chunk, verbose=False)
+
+
+def run_clean_sales_pipeline(
+    source_path: str = None,
+    df: pd.DataFrame = None,
+    save_output: bool = True,
+    chunksize: int = None,
+):
+    """
+    Clean and standardize KAME sales data.
+    - Drops only the specified unnecessary columns (keeping Rut)
+    - Rounds numeric values (keeps them as numeric types)
+    - Normalizes text columns: RznSocial, Direccion, Comuna, Ciudad, Region, ServicioSalud
+    - Removes accents from several key text fields
+    - Converts Folio to text and removes trailing '.0'
+    - Saves output to data/lake/clean/ventas_clean/preview.parquet (if save_output)
+
+    Pass `df` to clean an in-memory raw DataFrame instead of reading source_path.
+    With `chunksize`, the input is cleaned in batches that are streamed to the
+    output partition as they are ready; the partition path is returned
+    instead of a DataFrame (the file is never fully resident).
+    """
+
+    # === Resolve file path safely ===
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if chunksize:
+        return _run_clean_sales_chunked(source_path, df, chunksize)
+
+    if df is not None:
+        print(f"🧠 Cleaning in-memory raw data ({len(df)} rows) ...")
+    else:
+        df = _load_raw_sales(base_dir, source_path)
+        if df is None:
+            return None
+
+    df = clean_sales_frame(df)
+
     # === Save output ===
-    output_path = os.path.join(
-        base_dir, "../test/ventas/clean/ventas_clean_preview.csv"
-    )
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
+    if save_output:
+        write_zone(df, "clean", "ventas_clean", "preview")
 
-    print(f"💾 Saved cleaned file to {output_path}")
     print("✅ Accents removed and numeric columns remain numeric.")
     print("🧾 Columns after cleaning:")
     print(df.columns.tolist())
@@ -132,6 +240,24 @@ def run_clean_sales_pipeline(source_path: str = None):
     return df
 
 
+def _run_clean_sales_chunked(source_path, df, chunksize, partition="preview"):
+    writer = None
+    try:
+        for chunk in iter_clean_sales_chunks(source_path, df, chunksize):
+            if writer is None:
+                writer = ZoneWriter("clean", "ventas_clean", partition, arrow_schema(chunk))
+            writer.write(chunk)
+            print(f"🧹 Cleaned {writer.rows:,} rows so far ...")
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is None:
+        print("❌ No rows to clean.")
+        return None
+    return writer.close()
+
+
 if __name__ == "__main__":
     run_clean_sales_pipeline()
 
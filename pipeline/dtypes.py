@@ -0,0 +1,63 @@
+# === pipeline/dtypes.py ===
+"""
+Shared dtype policy for low-cardinality text columns.
+
+Columns like Comuna, Region or NombreVendedor repeat a handful of values on
+every sales line; as pandas `category` each value is stored once plus a
+small integer code per row (Arrow/Parquet: dictionary encoding).
+Used by the cleaners/enrichers and by the dashboard's data layer.
+
+Categoricals must be grouped with observed=True (only the combinations that
+actually occur) and new values added with add_categories / after astype(str).
+Frames categorized separately (e.g. cleaned chunks) each carry their own
+categories; combine them with concat_frames, not pd.concat, to keep them.
+"""
+
+import pandas as pd
+
+CATEGORY_COLUMNS = [
+    # ventas
+    "NombreDocumento",
+    "NombreSucursal",
+    "Comuna",
+    "Ciudad",
+    "Region",
+    "ServicioSalud",
+    "NombreVendedor",
+    "EsInventariable",
+    "NombreUNegocio",
+    "Unegocio",
+    "UnidadMedida",
+    # cuentas por cobrar / pagar
+    "Documento",
+    "CondicionVenta",
+    "status",
+]
+
+
+def apply_category_dtypes(df: pd.DataFrame, columns=CATEGORY_COLUMNS) -> pd.DataFrame:
+    """Convert the listed text columns present in `df` to `category` (in place; returns df)."""
+    for col in columns:
+        if col in df.columns and pd.api.types.is_object_dtype(df[col]):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def concat_frames(frames, columns=CATEGORY_COLUMNS) -> pd.DataFrame:
+    """
+    pd.concat that keeps the listed categorical columns categorical.
+    - pd.concat falls back to object when the categories differ per frame
+    - Each such column is re-coded to the union of the frames' categories first
+    """
+    frames = list(frames)
+    for col in columns:
+        if not frames or not all(
+            col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames
+        ):
+            continue
+        categories = frames[0][col].cat.categories
+        for f in frames[1:]:
+            categories = categories.union(f[col].cat.categories)
+        frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+# === END pipeline/dtypes.py ===
@@ -2,11 +2,22 @@ import os
 
 import pandas as pd
 
+from pipeline.dtypes import apply_category_dtypes
+from pipeline.lookup_cache import load_lookup
+
 # Get the folder where this script lives
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+def _normalize_comuna(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.strip().str.title()
+
+
 def add_location_info(df: pd.DataFrame, mapping_path: str = None) -> pd.DataFrame:
+    """
+    Add Region and ServicioSalud (right after Ciudad) by looking up Comuna.
+    The comunas mapping is parsed once per process (see lookup_cache).
+    """
     if mapping_path is None:
         mapping_path = os.path.join(
             BASE_DIR, "../data/comunas_provincia_servicio_region(003).csv"
@@ -18,32 +29,23 @@ def add_location_info(df: pd.DataFrame, mapping_path: str = None) -> pd.DataFram
         print(f"❌ Mapping file not found: {mapping_path}")
         return df
 
-    mapping = pd.read_csv(mapping_path)
-    mapping.columns = mapping.columns.str.strip()
-
-    mapping["Comuna_norm"] = mapping["Comuna"].astype(str).str.strip().str.title()
-    df["Comuna_norm"] = df["Comuna"].astype(str).str.strip().str.title()
-
-    df_merged = df.merge(
-        mapping[["Comuna_norm", "Region", "ServicioSalud"]],
-        on="Comuna_norm",
-        how="left",
-    ).drop(columns=["Comuna_norm"])
+    lookups = load_lookup(
+        mapping_path, "Comuna", ["Region", "ServicioSalud"], _normalize_comuna
+    )
+    comuna_norm = _normalize_comuna(df["Comuna"])
 
-    if "Ciudad" in df_merged.columns:
-        cols = df_merged.columns.tolist()
-        insert_idx = cols.index("Ciudad") + 1
-        for new_col in ["Region", "ServicioSalud"]:
-            if new_col in cols:
-                cols.remove(new_col)
-                cols.insert(insert_idx, new_col)
-                insert_idx += 1
-        df_merged = df_merged[cols]
+    new_cols = ["Region", "ServicioSalud"]
+    df_merged = df.drop(columns=[c for c in new_cols if c in df.columns])
+    cols = df_merged.columns.tolist()
+    insert_idx = cols.index("Ciudad") + 1 if "Ciudad" in cols else len(cols)
+    for new_col in new_cols:
+        df_merged.insert(insert_idx, new_col, comuna_norm.map(lookups[new_col]))
+        insert_idx += 1
 
     matched = df_merged["Region"].notna().sum()
     total = len(df_merged)
     print(f"✅ Location enrichment complete — matched {matched} of {total} comunas.")
-    return df_merged
+    return apply_category_dtypes(df_merged)
 
 
 if __name__ == "__main__":
@@ -2,51 +2,64 @@ import os
 
 import pandas as pd
 
+from pipeline.dtypes import apply_category_dtypes
+from pipeline.lookup_cache import load_lookup
+
 # Get the folder where this script lives
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UNMATCHED_OUTPUT = os.path.join(BASE_DIR, "../test/ventas/unmatched/unmatched_skus.csv")
+
+
+def _normalize_sku(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.strip().str.upper()
+
+
+def unmatched_skus(df: pd.DataFrame):
+    """Distinct SKUs of an enriched frame that got no Unegocio."""
+    if "Unegocio" not in df.columns:
+        return []
+    return df.loc[df["Unegocio"].isna(), "SKU"].dropna().unique().tolist()
+
+
+def save_unmatched_skus(skus, unmatched_output: str = None):
+    """Write the unmatched SKUs (de-duplicated, sorted) for audit."""
+    unmatched_output = unmatched_output or UNMATCHED_OUTPUT
+    os.makedirs(os.path.dirname(os.path.abspath(unmatched_output)), exist_ok=True)
+    skus = sorted({str(sku) for sku in skus})
+    pd.DataFrame({"Unmatched_SKU": skus}).to_csv(unmatched_output, index=False)
+    print(f"💾 {len(skus)} unmatched SKUs saved to {unmatched_output}")
 
 
 def add_product_info(
-    df: pd.DataFrame, product_path: str = None, unmatched_output: str = None
+    df: pd.DataFrame,
+    product_path: str = None,
+    unmatched_output: str = None,
+    save_unmatched: bool = True,
 ) -> pd.DataFrame:
+    """
+    Add Unegocio (product Familia, right after SKU) by looking up SKU.
+    The product list is parsed once per process (see lookup_cache).
+    - Unmatched SKUs are written to `unmatched_output` for audit; chunked
+      callers pass save_unmatched=False, collect unmatched_skus() per chunk
+      and call save_unmatched_skus() once at the end
+    """
     if product_path is None:
         product_path = os.path.join(BASE_DIR, "../data/lista_articulos_clean.csv")
 
-    if unmatched_output is None:
-        unmatched_output = os.path.join(
-            BASE_DIR, "../test/ventas/unmatched/unmatched_skus.csv"
-        )
-
     print(f"🧩 Enriching with product info from {product_path} ...")
 
     if not os.path.exists(product_path):
         print(f"❌ Product file not found: {product_path}")
         return df
 
-    # === Load product mapping ===
-    product_map = pd.read_csv(product_path)
-    product_map.columns = product_map.columns.str.strip()
-
-    # Normalize SKU columns for merge
-    product_map["SKU_norm"] = product_map["SKU"].astype(str).str.strip().str.upper()
-    df["SKU_norm"] = df["SKU"].astype(str).str.strip().str.upper()
+    # === Load product mapping (cached) and look up Familia -> Unegocio ===
+    lookups = load_lookup(product_path, "SKU", ["Familia"], _normalize_sku)
+    unegocio = _normalize_sku(df["SKU"]).map(lookups["Familia"])
 
-    # Merge on normalized SKU
-    df_merged = df.merge(
-        product_map[["SKU_norm", "Familia"]], on="SKU_norm", how="left"
-    ).drop(columns=["SKU_norm"])
-
-    # Rename Familia -> Unegocio
-    df_merged = df_merged.rename(columns={"Familia": "Unegocio"})
-
-    # Move Unegocio right after SKU if SKU exists
-    if "SKU" in df_merged.columns:
-        cols = df_merged.columns.tolist()
-        insert_idx = cols.index("SKU") + 1
-        if "Unegocio" in cols:
-            cols.remove("Unegocio")
-            cols.insert(insert_idx, "Unegocio")
-        df_merged = df_merged[cols]
+    # Place Unegocio right after SKU
+    df_merged = df.drop(columns=["Unegocio"], errors="ignore")
+    cols = df_merged.columns.tolist()
+    df_merged.insert(cols.index("SKU") + 1, "Unegocio", unegocio)
 
     # === Assign default Unegocio for missing SKU ===
     df_merged.loc[df_merged["SKU"].astype(str).str.strip().eq(""), "Unegocio"] = (
@@ -59,20 +72,19 @@ def add_product_info(
     print(f"✅ Product enrichment complete — matched {matched} of {total} SKUs.")
 
     # === Show and save unmatched SKUs for debugging ===
-    unmatched = df_merged.loc[df_merged["Unegocio"].isna(), "SKU"].dropna().unique()
+    unmatched = unmatched_skus(df_merged)
     if len(unmatched) > 0:
         print(f"⚠️ {len(unmatched)} SKUs not found in product mapping. Example(s):")
         for sku in unmatched[:10]:
             print(f"   - {sku}")
 
         # Save unmatched SKUs for audit
-        unmatched_df = pd.DataFrame({"Unmatched_SKU": unmatched})
-        unmatched_df.to_csv(unmatched_output, index=False)
-        print(f"💾 Unmatched SKUs saved to {unmatched_output}")
+        if save_unmatched:
+            save_unmatched_skus(unmatched, unmatched_output)
     else:
         print("🎉 All SKUs matched successfully!")
 
-    return df_merged
+    return apply_category_dtypes(df_merged)
 
 
 if __name__ == "__main__":
@@ -82,9 +94,7 @@ if __name__ == "__main__":
         BASE_DIR, "../test/ventas/clean/ventas_enriched_product.csv"
     )
     product_path = os.path.join(BASE_DIR, "../data/lista_articulos_clean.csv")
-    unmatched_output = os.path.join(
-        BASE_DIR, "../test/ventas/unmatched/unmatched_skus.csv"
-    )
+    unmatched_output = UNMATCHED_OUTPUT
 
     if not os.path.exists(input_path):
         print(f"❌ Input file not found: {input_path}")
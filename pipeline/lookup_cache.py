@@ -0,0 +1,58 @@
+# === pipeline/lookup_cache.py ===
+import hashlib
+import os
+
+import pandas as pd
+
+# abs path + key/value columns → {"stat", "digest", "maps"}
+_CACHE = {}
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_lookup(path, key_col, value_cols, normalize):
+    """
+    Parse a CSV mapping once per process and return {value_col: pd.Series}
+    indexed by the normalized key, ready for Series.map().
+
+    - Cached on (mtime, size); if those change, the SHA-256 of the file decides
+      whether it really needs re-parsing
+    - Duplicate keys keep the first row (a merge would have duplicated sales lines)
+    """
+    abs_path = os.path.abspath(path)
+    st = os.stat(abs_path)
+    stat_key = (st.st_mtime_ns, st.st_size)
+    cache_key = (abs_path, key_col, tuple(value_cols))
+
+    entry = _CACHE.get(cache_key)
+    if entry and entry["stat"] == stat_key:
+        return entry["maps"]
+
+    digest = _file_digest(abs_path)
+    if entry and entry["digest"] == digest:
+        entry["stat"] = stat_key
+        return entry["maps"]
+
+    print(f"📖 Parsing lookup table {path} ...")
+    mapping = pd.read_csv(abs_path)
+    mapping.columns = mapping.columns.str.strip()
+    mapping["_key"] = normalize(mapping[key_col])
+    mapping = mapping.drop_duplicates(subset="_key", keep="first").set_index("_key")
+
+    maps = {col: mapping[col] for col in value_cols}
+    _CACHE[cache_key] = {"stat": stat_key, "digest": digest, "maps": maps}
+    return maps
+
+
+def clear_lookup_cache():
+    """Forget every parsed lookup table (mainly for tests/benchmarks)."""
+    _CACHE.clear()
+
+
+## === End of pipeline/lookup_cache.py ===
@@ -1,113 +1,139 @@
 # === pipeline/save_to_sqlite.py ===
-import sqlite3
 from pathlib import Path
-import pandas as pd
 
+from data_zone import read_table
+from db import connect
 
-def save_to_sqlite(csv_path):
+from .ventas_schema import (
+    VENTAS_TABLE,
+    add_iso_date,
+    add_missing_columns,
+    ensure_ventas_schema,
+)
+from .ventas_rollups import ensure_rollups, refresh_rollups
+
+
+def save_to_sqlite(csv_path=None, df=None):
     """
     Save cleaned & enriched sales data into SQLite.
-    - Creates the table if it doesn't exist.
-    - Appends only new rows (based on unique combo: NombreDocumento + Folio).
+    - Takes an in-memory DataFrame (`df`) or a .parquet/.csv file (`csv_path`).
+    - Creates the table with the explicit schema (pipeline/ventas_schema.py)
+      if it doesn't exist, or migrates an older one.
+    - Appends only new invoice lines (unique combo: NombreDocumento + Folio +
+      SKU + Linea), via a staged INSERT OR IGNORE against the unique index.
     - Keeps existing data intact.
+    - Refreshes the daily/monthly rollups for the dates in the batch.
     """
 
-    csv_path = Path(csv_path)
     db_path = Path("data/vitroscience.db")
-    table_name = "ventas_enriched_product"
+    table_name = VENTAS_TABLE
 
-    if not csv_path.exists():
-        print(f"❌ CSV not found: {csv_path}")
-        return
+    if df is not None:
+        df_new = df.copy()
+    else:
+        if csv_path is None:
+            print("❌ Nothing to save: pass a DataFrame or a CSV path.")
+            return
 
-    # === Load the cleaned file ===
-    print(f"📂 Loading data from {csv_path}...")
-    df_new = pd.read_csv(csv_path)
+        csv_path = Path(csv_path)
+        if not csv_path.exists():
+            print(f"❌ CSV not found: {csv_path}")
+            return
+
+        # === Load the cleaned file ===
+        print(f"📂 Loading data from {csv_path}...")
+        df_new = read_table(csv_path)
 
     if df_new.empty:
         print("⚠️ No data to save.")
         return
 
-    # === Normalize Folio and create UniqueKey ===
+    # === Normalize Folio / SKU and number invoice lines ===
     df_new["Folio"] = (
         df_new["Folio"].astype(str)
         .str.replace(r"\.0$", "", regex=True)
         .str.strip()
     )
-    df_new["UniqueKey"] = (
-        df_new["NombreDocumento"].astype(str).str.strip()
-        + "_"
-        + df_new["Folio"]
-    )
+    df_new = _assign_line_numbers(df_new)
+    df_new = add_iso_date(df_new)
 
     # === Connect to SQLite ===
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn = connect(db_path)
 
-    # === Check if table exists ===
-    cursor.execute(
-        f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';"
-    )
-    exists = cursor.fetchone() is not None
-
-    if not exists:
-        # Table does not exist — create it fresh
-        print(f"🆕 Creating new table '{table_name}'...")
-        df_new.to_sql(table_name, conn, if_exists="replace", index=False)
-        conn.commit()
-
-        # Add unique index
-        try:
-            cursor.execute(
-                f"CREATE UNIQUE INDEX idx_unique_doc_folio ON {table_name}(NombreDocumento, Folio);"
-            )
-            conn.commit()
-            print("🧱 Created unique index on (NombreDocumento, Folio).")
-        except Exception as e:
-            print(f"⚠️ Could not create unique index: {e}")
+    # === Create / migrate the table, then stage the batch in one transaction ===
+    has_index = ensure_ventas_schema(conn)
+    ensure_rollups(conn)
+    with conn:
+        add_missing_columns(conn, df_new.columns)
 
-        print(f"✅ Saved {len(df_new)} new rows into '{table_name}' (initial load).")
+    inserted = _insert_new_rows(conn, table_name, df_new, has_index)
 
+    if inserted == 0:
+        print("ℹ️ No new rows to add — database already up to date.")
     else:
-        # Table exists — append only new rows
-        print(f"🔎 Checking for existing records in '{table_name}'...")
-        try:
-            df_existing = pd.read_sql(
-                f"SELECT NombreDocumento, Folio FROM {table_name};", conn
-            )
-            df_existing["Folio"] = (
-                df_existing["Folio"].astype(str)
-                .str.replace(r"\.0$", "", regex=True)
-                .str.strip()
-            )
-            df_existing["UniqueKey"] = (
-                df_existing["NombreDocumento"].astype(str).str.strip()
-                + "_"
-                + df_existing["Folio"]
-            )
-        except Exception as e:
-            print(f"⚠️ Could not read existing data: {e}")
-            df_existing = pd.DataFrame(columns=["UniqueKey"])
+        print(f"✅ Appended {inserted} new rows into '{table_name}'.")
+        # === Refresh rollups only for the days this batch touched ===
+        refresh_rollups(conn, df_new["FechaISO"].dropna().unique())
+        print("🧮 Sales rollups refreshed.")
+
+    conn.close()
+    print("🗄️ Database update complete.\n")
 
-        # === Identify new rows using merge-based anti-join ===
-        merged = df_new.merge(
-            df_existing[["UniqueKey"]], how="left", on="UniqueKey", indicator=True
+
+def _assign_line_numbers(df):
+    """
+    Add the `Linea` column: 1, 2, ... for repeated (NombreDocumento, Folio, SKU)
+    lines, in the order the API returned them. Missing SKUs become "" so they
+    still take part in the unique index (SQLite treats NULLs as distinct).
+    """
+    if "SKU" not in df.columns:
+        df["SKU"] = ""
+    df["SKU"] = df["SKU"].fillna("").astype(str).str.replace(r"\.0$", "", regex=True).str.strip()
+    df["Linea"] = df.groupby(["NombreDocumento", "Folio", "SKU"], sort=False, observed=True).cumcount() + 1
+    return df
+
+
+def _insert_new_rows(conn, table_name, df, has_index):
+    """
+    Load `df` into a TEMP staging table and copy it into `table_name` with
+    INSERT OR IGNORE against the line-level unique index (cost grows with the batch,
+    not with the table). Returns the number of rows inserted.
+    """
+    col_list = ", ".join(f'"{c}"' for c in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp.ventas_batch;")
+        conn.execute(
+            f"CREATE TEMP TABLE ventas_batch AS SELECT {col_list} FROM {table_name} WHERE 0;"
+        )
+        conn.executemany(
+            f"INSERT INTO temp.ventas_batch ({col_list}) VALUES ({placeholders});", rows
         )
-        new_df = merged[merged["_merge"] == "left_only"].drop(columns=["_merge"])
 
-        if new_df.empty:
-            print("ℹ️ No new rows to add — database already up to date.")
+        before = conn.total_changes
+        if has_index:
+            conn.execute(
+                f"INSERT OR IGNORE INTO {table_name} ({col_list}) "
+                f"SELECT {col_list} FROM temp.ventas_batch;"
+            )
         else:
-            print(f"✅ Detected {len(new_df)} truly new rows to append.")
-            new_df.drop(columns=["UniqueKey"], inplace=True)
-            new_df.to_sql(table_name, conn, if_exists="append", index=False)
-            conn.commit()
-            print(f"✅ Appended {len(new_df)} new rows into '{table_name}'.")
-
+            conn.execute(
+                f"""
+                INSERT INTO {table_name} ({col_list})
+                SELECT {col_list} FROM temp.ventas_batch b
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {table_name} t
+                    WHERE t.NombreDocumento = b.NombreDocumento AND t.Folio = b.Folio
+                      AND t.SKU = b.SKU AND t.Linea = b.Linea
+                );
+                """
+            )
+        inserted = conn.total_changes - before
+        conn.execute("DROP TABLE temp.ventas_batch;")
 
-    conn.close()
-    print("🗄️ Database update complete.\n")
+    return inserted
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+# === pipeline/text_normalize.py ===
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+# Spanish accent set → ASCII (same output as unidecode for these characters)
+ACCENT_TABLE = str.maketrans(
+    "áéíóúüñÁÉÍÓÚÜÑàèìòùÀÈÌÒÙâêîôûÂÊÎÔÛäëïöÄËÏÖçÇ",
+    "aeiouunAEIOUUNaeiouAEIOUaeiouAEIOUaeioAEIOcC",
+)
+
+
+def _to_ascii(value):
+    """Transliterate one value: ASCII as-is, Spanish accents via table, rest via unidecode."""
+    if not isinstance(value, str) or value.isascii():
+        return value
+    translated = value.translate(ACCENT_TABLE)
+    return translated if translated.isascii() else unidecode(translated)
+
+
+def strip_accents(series: pd.Series) -> pd.Series:
+    """
+    Vectorized unidecode for a text column.
+    - Transliterates each unique value once (pd.factorize) and maps results back
+    - Common Spanish accents use a translation table; other non-ASCII falls back to unidecode
+    - Missing values stay missing
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    converted = np.empty(len(uniques) + 1, dtype=object)
+    converted[:-1] = [_to_ascii(v) for v in uniques]
+    converted[-1] = np.nan  # code -1 (missing) picks the last slot
+    return pd.Series(converted.take(codes), index=series.index, name=series.name)
+
+
+## === End of pipeline/text_normalize.py ===
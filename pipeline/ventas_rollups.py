@@ -0,0 +1,141 @@
+# === pipeline/ventas_rollups.py ===
+"""
+Pre-aggregated sales rollups kept next to `ventas_enriched_product`.
+
+- ventas_daily_rollup:   FechaISO × Unegocio × Rut
+- ventas_monthly_rollup: Mes (YYYY-MM) × Unegocio
+
+`refresh_rollups(conn, dates)` recomputes only the given days (and their
+months), so save_to_sqlite keeps them current without a full rebuild.
+Dashboards read these instead of scanning the fact table.
+"""
+
+from pathlib import Path
+
+from db import connect
+
+from .ventas_schema import VENTAS_TABLE
+
+DAILY_ROLLUP = "ventas_daily_rollup"
+MONTHLY_ROLLUP = "ventas_monthly_rollup"
+
+# Summed measures, identical in both rollups.
+MEASURES = ["Total", "MargenContrib", "CostoVentaTotal", "Cantidad"]
+
+_MEASURE_DEFS = ",\n    ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in MEASURES)
+
+DAILY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {DAILY_ROLLUP} (
+    FechaISO TEXT NOT NULL,
+    Unegocio TEXT NOT NULL DEFAULT '',
+    Rut TEXT NOT NULL DEFAULT '',
+    {_MEASURE_DEFS},
+    Lineas INTEGER NOT NULL DEFAULT 0,
+    Documentos INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (FechaISO, Unegocio, Rut)
+) WITHOUT ROWID;
+"""
+
+MONTHLY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {MONTHLY_ROLLUP} (
+    Mes TEXT NOT NULL,
+    Unegocio TEXT NOT NULL DEFAULT '',
+    {_MEASURE_DEFS},
+    Lineas INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (Mes, Unegocio)
+) WITHOUT ROWID;
+"""
+
+
+def _table_exists(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def ensure_rollups(conn):
+    """Create the rollup tables. Fills them from the fact table the first time."""
+    new = not (_table_exists(conn, DAILY_ROLLUP) and _table_exists(conn, MONTHLY_ROLLUP))
+    with conn:
+        conn.execute(DAILY_DDL)
+        conn.execute(MONTHLY_DDL)
+    if new:
+        rebuild_rollups(conn)
+
+
+def rebuild_rollups(conn):
+    """Recompute both rollups from scratch."""
+    dates = [
+        r[0]
+        for r in conn.execute(
+            f"SELECT DISTINCT FechaISO FROM {VENTAS_TABLE} WHERE FechaISO IS NOT NULL;"
+        )
+    ]
+    if dates:
+        print(f"🧮 Building sales rollups for {len(dates)} days...")
+    refresh_rollups(conn, dates)
+
+
+def refresh_rollups(conn, dates):
+    """
+    Recompute the rollup rows for `dates` (YYYY-MM-DD) in one transaction:
+    - daily rows for those days from the fact table (idx_ventas_fecha),
+    - monthly rows for the months they fall in, from the daily rollup.
+    """
+    dates = sorted({d for d in dates if d})
+    if not dates:
+        return
+    months = sorted({d[:7] for d in dates})
+    sums = ", ".join(f"COALESCE(SUM({m}), 0)" for m in MEASURES)
+    measure_cols = ", ".join(MEASURES)
+
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp.rollup_dates;")
+        conn.execute("CREATE TEMP TABLE rollup_dates (FechaISO TEXT PRIMARY KEY);")
+        conn.executemany(
+            "INSERT INTO temp.rollup_dates (FechaISO) VALUES (?);", [(d,) for d in dates]
+        )
+
+        conn.execute(
+            f"DELETE FROM {DAILY_ROLLUP} "
+            f"WHERE FechaISO IN (SELECT FechaISO FROM temp.rollup_dates);"
+        )
+        conn.execute(
+            f"""
+            INSERT INTO {DAILY_ROLLUP}
+                (FechaISO, Unegocio, Rut, {measure_cols}, Lineas, Documentos)
+            SELECT FechaISO, COALESCE(Unegocio, ''), COALESCE(Rut, ''), {sums},
+                   COUNT(*), COUNT(DISTINCT NombreDocumento || '|' || Folio)
+            FROM {VENTAS_TABLE}
+            WHERE FechaISO IN (SELECT FechaISO FROM temp.rollup_dates)
+            GROUP BY FechaISO, COALESCE(Unegocio, ''), COALESCE(Rut, '');
+            """
+        )
+
+        for mes in months:
+            conn.execute(f"DELETE FROM {MONTHLY_ROLLUP} WHERE Mes = ?;", (mes,))
+            conn.execute(
+                f"""
+                INSERT INTO {MONTHLY_ROLLUP} (Mes, Unegocio, {measure_cols}, Lineas)
+                SELECT ?, Unegocio, {sums}, SUM(Lineas)
+                FROM {DAILY_ROLLUP}
+                WHERE FechaISO BETWEEN ? AND ?
+                GROUP BY Unegocio;
+                """,
+                (mes, f"{mes}-01", f"{mes}-31"),
+            )
+        conn.execute("DROP TABLE temp.rollup_dates;")
+
+
+if __name__ == "__main__":
+    # Manual rebuild: python -m pipeline.ventas_rollups
+    db_path = Path("data/vitroscience.db")
+    conn = connect(db_path)
+    with conn:
+        conn.execute(DAILY_DDL)
+        conn.execute(MONTHLY_DDL)
+    rebuild_rollups(conn)
+    conn.close()
+    print("✅ Sales rollups rebuilt.")
+# === END pipeline/ventas_rollups.py ===
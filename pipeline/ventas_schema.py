@@ -0,0 +1,201 @@
+# === pipeline/ventas_schema.py ===
+"""
+Explicit SQLite schema for `ventas_enriched_product`.
+
+- Typed columns (REAL amounts, INTEGER line numbers) instead of whatever
+  `df.to_sql` inferred from the first batch.
+- `FechaISO` (YYYY-MM-DD) is the normalised sale date used by every date
+  filter, so period sums are index range scans instead of DATE(Fecha) scans.
+- `ensure_ventas_schema(conn)` creates the table or migrates an existing one.
+"""
+
+import sqlite3
+
+import pandas as pd
+
+VENTAS_TABLE = "ventas_enriched_product"
+
+# Line-level identity: one row per invoice line. Linea numbers repeated
+# (NombreDocumento, Folio, SKU) lines in API order, so a refetch of the same
+# window yields the same keys.
+LINE_KEY = ["NombreDocumento", "Folio", "SKU", "Linea"]
+LINE_INDEX = "idx_unique_doc_folio_line"
+
+# Column order follows the cleaned + enriched DataFrame.
+VENTAS_COLUMNS = [
+    ("Rut", "TEXT"),
+    ("RznSocial", "TEXT"),
+    ("Fecha", "TEXT"),
+    ("FechaISO", "TEXT"),
+    ("NombreDocumento", "TEXT NOT NULL"),
+    ("Folio", "TEXT NOT NULL"),
+    ("NombreSucursal", "TEXT"),
+    ("Direccion", "TEXT"),
+    ("Comuna", "TEXT"),
+    ("Ciudad", "TEXT"),
+    ("Region", "TEXT"),
+    ("ServicioSalud", "TEXT"),
+    ("NombreVendedor", "TEXT"),
+    ("EsInventariable", "TEXT"),
+    ("Descripcion", "TEXT"),
+    ("DescripcionDetallada", "TEXT"),
+    ("NombreUNegocio", "TEXT"),
+    ("SKU", "TEXT NOT NULL DEFAULT ''"),
+    ("Unegocio", "TEXT"),
+    ("UnidadMedida", "TEXT"),
+    ("Cantidad", "REAL"),
+    ("Comentario", "TEXT"),
+    ("PrecioUnitario", "REAL"),
+    ("Descuento", "REAL"),
+    ("PorcDescuento", "REAL"),
+    ("Total", "REAL"),
+    ("CostoVentaUnitario", "REAL"),
+    ("CostoVentaTotal", "REAL"),
+    ("MargenContrib", "REAL"),
+    ("NombreRef1", "TEXT"),
+    ("FechaRef1", "TEXT"),
+    ("FolioRef1", "TEXT"),
+    ("RazonRef1", "TEXT"),
+    ("NombreRef2", "TEXT"),
+    ("FechaRef2", "TEXT"),
+    ("FolioRef2", "TEXT"),
+    ("RazonRef2", "TEXT"),
+    ("NombreRef3", "TEXT"),
+    ("FechaRef3", "TEXT"),
+    ("FolioRef3", "TEXT"),
+    ("RazonRef3", "TEXT"),
+    ("Linea", "INTEGER NOT NULL DEFAULT 1"),
+]
+
+# Secondary indexes. The date index also carries the summed amounts so
+# dashboard period totals never touch the table itself.
+VENTAS_INDEXES = {
+    "idx_ventas_fecha": "FechaISO, Total, MargenContrib",
+    "idx_ventas_rut": "Rut, FechaISO",
+    "idx_ventas_sku": "SKU",
+    "idx_ventas_unegocio": "Unegocio, FechaISO",
+}
+
+# Columns written by older versions that carry no information anymore.
+LEGACY_COLUMNS = {"UniqueKey"}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_columns(conn, table_name):
+    return {r[1]: r[2] for r in conn.execute(f"PRAGMA table_info({_quote(table_name)});")}
+
+
+def _create_table_sql(table_name, extra_columns=()):
+    defs = [f"{_quote(c)} {t}" for c, t in VENTAS_COLUMNS]
+    defs += [f"{_quote(c)} {t}".rstrip() for c, t in extra_columns]
+    return f"CREATE TABLE {_quote(table_name)} (\n    " + ",\n    ".join(defs) + "\n);"
+
+
+def _create_indexes(conn):
+    for name, cols in VENTAS_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {VENTAS_TABLE}({cols});")
+
+
+def ensure_unique_index(conn):
+    """Make sure the line-level unique index exists. Returns True if it does."""
+    try:
+        conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {LINE_INDEX} "
+            f"ON {VENTAS_TABLE}({', '.join(LINE_KEY)});"
+        )
+        return True
+    except sqlite3.IntegrityError as e:
+        print(f"⚠️ Could not create unique index (existing duplicates?): {e}")
+        return False
+
+
+def _number_legacy_lines(conn, cols):
+    """Add and fill `Linea` on a table keyed on (NombreDocumento, Folio) only."""
+    print(f"🔧 Numbering invoice lines in '{VENTAS_TABLE}'...")
+    conn.execute(f"ALTER TABLE {VENTAS_TABLE} ADD COLUMN Linea INTEGER;")
+    if "SKU" not in cols:
+        conn.execute(f"ALTER TABLE {VENTAS_TABLE} ADD COLUMN SKU TEXT;")
+    conn.execute(f"UPDATE {VENTAS_TABLE} SET SKU = '' WHERE SKU IS NULL;")
+    conn.execute(
+        f"""
+        WITH numbered AS (
+            SELECT rowid AS rid,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY NombreDocumento, Folio, SKU ORDER BY rowid
+                   ) AS rn
+            FROM {VENTAS_TABLE}
+        )
+        UPDATE {VENTAS_TABLE}
+        SET Linea = (SELECT rn FROM numbered WHERE numbered.rid = {VENTAS_TABLE}.rowid);
+        """
+    )
+
+
+def _rebuild_typed(conn, cols):
+    """Copy an untyped (to_sql-created) table into the explicit schema."""
+    print(f"🔧 Rebuilding '{VENTAS_TABLE}' with the typed schema...")
+    known = {c for c, _ in VENTAS_COLUMNS}
+    extra = [(c, t) for c, t in cols.items() if c not in known and c not in LEGACY_COLUMNS]
+    tmp = f"{VENTAS_TABLE}__typed"
+
+    copy_cols = [c for c, _ in VENTAS_COLUMNS if c in cols and c != "FechaISO"]
+    copy_cols += [c for c, _ in extra]
+    select = [_quote(c) for c in copy_cols]
+    if "SKU" in copy_cols:
+        select[copy_cols.index("SKU")] = "COALESCE(SKU, '')"
+    if "Linea" in copy_cols:
+        select[copy_cols.index("Linea")] = "COALESCE(Linea, 1)"
+
+    conn.execute(f"DROP TABLE IF EXISTS {tmp};")
+    conn.execute(_create_table_sql(tmp, extra))
+    conn.execute(
+        f"INSERT INTO {tmp} ({', '.join(_quote(c) for c in copy_cols)}, FechaISO) "
+        f"SELECT {', '.join(select)}, substr(Fecha, 1, 10) FROM {VENTAS_TABLE} "
+        f"ORDER BY rowid;"
+    )
+    conn.execute(f"DROP TABLE {VENTAS_TABLE};")
+    conn.execute(f"ALTER TABLE {tmp} RENAME TO {VENTAS_TABLE};")
+
+
+def add_missing_columns(conn, columns):
+    """ALTER TABLE ADD COLUMN for batch columns the table does not have yet."""
+    existing = _table_columns(conn, VENTAS_TABLE)
+    for col in columns:
+        if col not in existing:
+            print(f"➕ Adding new column '{col}' to '{VENTAS_TABLE}'")
+            conn.execute(f"ALTER TABLE {VENTAS_TABLE} ADD COLUMN {_quote(col)};")
+
+
+def ensure_ventas_schema(conn):
+    """
+    Create `ventas_enriched_product` with the explicit schema, or migrate an
+    existing one in place:
+    - legacy document-level keys get a `Linea` sequence,
+    - to_sql-created tables are rebuilt typed, with `FechaISO` filled,
+    - secondary indexes are (re)created.
+    Returns True if the line-level unique index is in place.
+    """
+    cols = _table_columns(conn, VENTAS_TABLE)
+    with conn:
+        if not cols:
+            print(f"🆕 Creating new table '{VENTAS_TABLE}'...")
+            conn.execute(_create_table_sql(VENTAS_TABLE))
+        else:
+            if "Linea" not in cols:
+                _number_legacy_lines(conn, cols)
+                cols = _table_columns(conn, VENTAS_TABLE)
+            if "FechaISO" not in cols:
+                _rebuild_typed(conn, cols)
+            conn.execute("DROP INDEX IF EXISTS idx_unique_doc_folio;")
+        _create_indexes(conn)
+        return ensure_unique_index(conn)
+
+
+def add_iso_date(df):
+    """Add `FechaISO` (YYYY-MM-DD) from `Fecha`."""
+    df["FechaISO"] = pd.to_datetime(df["Fecha"], errors="coerce", format="ISO8601").dt.strftime("%Y-%m-%d")
+    return df
+# === END pipeline/ventas_schema.py ===
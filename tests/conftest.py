@@ -0,0 +1,9 @@
+# === tests/conftest.py ===
+import sys
+from pathlib import Path
+
+# Make the top-level modules (kame_cache, kame_client, ...) importable
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+# === END tests/conftest.py ===
@@ -0,0 +1,143 @@
+# === tests/test_kame_cache.py ===
+"""
+kame_cache: cache key, gzip round-trip, TTL expiry and the closed-period
+policy (fixed dates, so the results do not depend on today).
+
+Run: python -m pytest tests
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+
+import pytest
+
+import kame_cache
+
+ENDPOINT = "Documento/getInformeVentas"
+SEPTEMBER = {"fechaDesde": "2025-08-29", "fechaHasta": "2025-09-28", "page": 1}
+FETCHED_OPEN = datetime(2025, 9, 25, 12).timestamp()
+FETCHED_CLOSED = datetime(2025, 10, 2, 12).timestamp()
+OCT_15 = date(2025, 10, 15)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(kame_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(kame_cache, "OFFLINE", False)
+    monkeypatch.setattr(kame_cache, "OPEN_PERIOD_TTL_S", 900)
+    return tmp_path
+
+
+def _store_at(monkeypatch, params, fetched_at, payload=None):
+    monkeypatch.setattr(kame_cache.time, "time", lambda: fetched_at)
+    kame_cache.store(ENDPOINT, params, payload or {"items": [{"Folio": 1}]})
+
+
+def _now(monkeypatch, now):
+    monkeypatch.setattr(kame_cache.time, "time", lambda: now)
+
+
+# === cache key ===
+def test_cache_key_ignores_param_order():
+    reordered = dict(reversed(list(SEPTEMBER.items())))
+    assert kame_cache.cache_key(ENDPOINT, SEPTEMBER) == kame_cache.cache_key(ENDPOINT, reordered)
+
+
+def test_cache_key_depends_on_endpoint_and_params():
+    key = kame_cache.cache_key(ENDPOINT, SEPTEMBER)
+    assert key != kame_cache.cache_key("Contabilidad/getCuentaxCobrar", SEPTEMBER)
+    assert key != kame_cache.cache_key(ENDPOINT, {**SEPTEMBER, "page": 2})
+    assert kame_cache.cache_key(ENDPOINT, None) == kame_cache.cache_key(ENDPOINT, {})
+
+
+# === gzip round-trip ===
+def test_store_then_load_round_trips_through_gzip(cache_dir, monkeypatch):
+    payload = {"items": [{"Folio": 7, "RznSocial": "Clínica Ñuñoa"}], "total": 1}
+    _store_at(monkeypatch, SEPTEMBER, FETCHED_OPEN, payload)
+
+    key = kame_cache.cache_key(ENDPOINT, SEPTEMBER)
+    path = cache_dir / key[:2] / f"{key}.json.gz"
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        entry = json.load(f)
+    assert entry["payload"] == payload
+    assert entry["fetched_at"] == FETCHED_OPEN
+    assert not list(cache_dir.glob("*/*.tmp"))
+
+    _now(monkeypatch, FETCHED_OPEN + 1)
+    response = kame_cache.load(ENDPOINT, SEPTEMBER, url="https://example/x")
+    assert response.from_cache and response.status_code == 200
+    assert response.json() == payload
+    assert json.loads(response.text) == payload
+
+
+def test_load_miss_and_corrupt_entry(cache_dir):
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is None
+
+    key = kame_cache.cache_key(ENDPOINT, SEPTEMBER)
+    path = cache_dir / key[:2] / f"{key}.json.gz"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"not gzip")
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is None
+
+
+# === TTL expiry ===
+def test_open_period_entry_expires_after_ttl(cache_dir, monkeypatch):
+    _store_at(monkeypatch, SEPTEMBER, FETCHED_OPEN)
+
+    _now(monkeypatch, FETCHED_OPEN + 899)
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is not None
+    _now(monkeypatch, FETCHED_OPEN + 901)
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is None
+
+
+def test_offline_serves_expired_entries(cache_dir, monkeypatch):
+    _store_at(monkeypatch, SEPTEMBER, FETCHED_OPEN)
+    _now(monkeypatch, FETCHED_OPEN + 86_400)
+    monkeypatch.setattr(kame_cache, "OFFLINE", True)
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is not None
+
+
+def test_entry_fetched_after_close_never_expires(cache_dir, monkeypatch):
+    _store_at(monkeypatch, SEPTEMBER, FETCHED_CLOSED)
+    _now(monkeypatch, FETCHED_CLOSED + 365 * 86_400)
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is not None
+
+
+def test_closed_period_cached_while_open_still_expires(cache_dir, monkeypatch):
+    _store_at(monkeypatch, SEPTEMBER, FETCHED_OPEN)
+    _now(monkeypatch, datetime(2025, 10, 15, 12).timestamp())
+    assert kame_cache.load(ENDPOINT, SEPTEMBER) is None
+
+
+# === closed-period policy ===
+def test_is_closed_period_uses_fetch_time():
+    # Cached on Sep 25 while September was open: still TTL-bound in October
+    assert not kame_cache.is_closed_period(SEPTEMBER, FETCHED_OPEN, today=OCT_15)
+    # Re-fetched after Oct 1: permanent
+    assert kame_cache.is_closed_period(SEPTEMBER, FETCHED_CLOSED, today=OCT_15)
+    # Month not over yet: never permanent
+    assert not kame_cache.is_closed_period(SEPTEMBER, FETCHED_OPEN, today=date(2025, 9, 30))
+    # No window end: never permanent
+    assert not kame_cache.is_closed_period({"page": 1}, FETCHED_CLOSED, today=OCT_15)
+
+
+def test_period_close():
+    assert kame_cache.period_close(SEPTEMBER) == date(2025, 10, 1)
+    # December windows close on Jan 1 of the next year
+    assert kame_cache.period_close({"fechaHasta": "2024-12-31"}) == date(2025, 1, 1)
+    assert kame_cache.period_close({"fechaHasta": "2024-12-31T00:00:00"}) == date(2025, 1, 1)
+    assert kame_cache.period_close({"fechaHasta": "not-a-date"}) is None
+    assert kame_cache.period_close(None) is None
+
+
+# === clear ===
+def test_clear_by_endpoint(cache_dir, monkeypatch):
+    _store_at(monkeypatch, SEPTEMBER, FETCHED_OPEN)
+    monkeypatch.setattr(kame_cache.time, "time", lambda: FETCHED_OPEN)
+    kame_cache.store("Contabilidad/getCuentaxCobrar", SEPTEMBER, {"items": []})
+
+    assert kame_cache.clear("Contabilidad/getCuentaxCobrar") == 1
+    assert kame_cache.clear() == 1
+    assert not list(cache_dir.glob("*/*.json.gz"))
+# === END tests/test_kame_cache.py ===
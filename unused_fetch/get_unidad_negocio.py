@@ -1,9 +1,8 @@
 import warnings
 
 import pandas as pd
-import requests
 
-from kame_api import get_token as get_access_token
+from kame_client import get_client
 
 warnings.filterwarnings("ignore", category=UserWarning, module="urllib3")
 
@@ -12,11 +11,8 @@ BASE_URL = "https://api.kameone.cl/api/Maestro/getListUnidadNegocio"
 
 def get_unidades_negocio():
     """Fetch list of unidades de negocio from Kame API."""
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-
     print("🔍 Fetching unidades de negocio...")
-    response = requests.get(BASE_URL, headers=headers)
+    response = get_client().get(BASE_URL)
     print(f"HTTP Status: {response.status_code}")
 
     if response.status_code != 200:
@@ -1,11 +1,12 @@
 # === view_db.py ===
 import streamlit as st
 import pandas as pd
-import sqlite3
 from pathlib import Path
 import io
 from datetime import date
 
+from db import connect
+
 # === CONFIGURATION ===
 DB_PATH = Path("data/vitroscience.db")
 
@@ -17,7 +18,7 @@ if not DB_PATH.exists():
     st.error(f"❌ Database not found at {DB_PATH}. Run your data pipeline first.")
     st.stop()
 
-conn = sqlite3.connect(DB_PATH)
+conn = connect(DB_PATH, read_only=True)
 
 # === STEP 2: Show available tables ===
 tables = pd.read_sql(